@@ -152,9 +152,9 @@ async def login_with_password(request: LoginPasswordRequest):
     """Login with email and password for returning users - Optimized"""
     from firebase_admin import auth as firebase_auth
     from fastapi import HTTPException
-    import httpx
     import time
     from app.core.config import settings
+    from app.core.http import get_http_client
     
     start_time = time.time()
     
@@ -165,7 +165,7 @@ async def login_with_password(request: LoginPasswordRequest):
         print("CRITICAL ERROR: FIREBASE_API_KEY is not set.")
         raise HTTPException(status_code=500, detail="Server configuration error")
         
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={FIREBASE_API_KEY}"
+    url = f"{settings.IDENTITY_TOOLKIT_URL}/v1/accounts:signInWithPassword?key={FIREBASE_API_KEY}"
     
     payload = {
         "email": request.email.strip().lower(),
@@ -174,9 +174,8 @@ async def login_with_password(request: LoginPasswordRequest):
     }
     
     try:
-        # 1. Verify credentials via REST API (Async)
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, timeout=10.0)
+        # 1. Verify credentials via REST API (Async, pooled keep-alive connection)
+        response = await get_http_client().post(url, json=payload, timeout=10.0)
             
         data = response.json()
         
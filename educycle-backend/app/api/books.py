@@ -1,25 +1,68 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Request
 import json
 from app.api.deps import student_only, get_current_user
-from app.services.book_service import donate_book, search_books, get_book, get_my_books, delete_book
+from app.services.book_service import (
+    donate_book, search_books_page, search_books_text, get_book, get_my_books, delete_book,
+    SEARCH_CONTROL_PARAMS, DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE, InvalidSearchCursor,
+)
 from app.db.storage import upload_file
 from app.db.firestore import get_blocked_uids
+from app.db.query_planner import UnknownFilterField
 
 router = APIRouter()
 
 
 @router.get("/search")
 async def search(request: Request, user=Depends(get_current_user)):
-    filters = dict(request.query_params)
+    """Search available books.
+
+    Filters are equality matches on city, area, subject, class_level, board,
+    condition and is_set; any other param is rejected with 400. `q` switches to
+    free-text search ("NCERT phys") ranked by relevance. With `page_size` and/or
+    `cursor`, returns `{"items": [...], "next_cursor": ...}`; pass `next_cursor` back
+    as `cursor` to fetch the following page. Without either, older clients get a plain
+    list of the first MAX_SEARCH_PAGE_SIZE results only. Outside `q` mode the page
+    also carries `facets`: per-field value counts for the filter sidebar. `explain=true` wraps the response
+    as `{"plan": ..., "results": ...}` with the query plan and documents scanned.
+    """
+    filters = {k: v for k, v in request.query_params.items() if k not in SEARCH_CONTROL_PARAMS}
+    q = filters.pop("q", None)
     blocked_uids = []
     if user:
         blocked_uids = await get_blocked_uids(user["uid"])
-        
-    return await search_books(
-        filters, 
-        exclude_uid=user["uid"] if user else None,
-        blocked_uids=blocked_uids
-    )
+    exclude_uid = user["uid"] if user else None
+
+    page_size = request.query_params.get("page_size")
+    cursor = request.query_params.get("cursor") or None
+    paginated = page_size is not None or cursor is not None
+    try:
+        page_size = int(page_size) if page_size else DEFAULT_SEARCH_PAGE_SIZE
+    except ValueError:
+        raise HTTPException(status_code=400, detail="page_size must be an integer")
+    if not paginated:
+        page_size = MAX_SEARCH_PAGE_SIZE
+    explain = {} if request.query_params.get("explain", "").lower() == "true" else None
+
+    try:
+        if q:
+            # Answered from the in-process search index
+            results = await search_books_text(
+                q, filters, exclude_uid=exclude_uid, blocked_uids=blocked_uids,
+                page_size=page_size, cursor=cursor, explain=explain,
+            )
+        else:
+            results = await search_books_page(
+                filters, exclude_uid=exclude_uid, blocked_uids=blocked_uids,
+                page_size=page_size, cursor=cursor, explain=explain,
+            )
+    except (InvalidSearchCursor, UnknownFilterField) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not paginated:
+        results = results["items"]
+
+    if explain is not None:
+        return {"plan": explain, "results": results}
+    return results
 
 
 @router.get("/{book_id}")
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.core.security import verify_firebase_token
-from app.services.chat_service import send_message, get_chat, get_chat_messages
+from app.services.chat_service import (
+    send_message, get_chat, get_chat_messages, InvalidMessageCursor, DEFAULT_MESSAGE_PAGE_SIZE,
+)
 
 router = APIRouter()
 
@@ -15,10 +17,22 @@ async def get_chat_detail(chat_id: str, user=Depends(verify_firebase_token)):
 
 
 @router.get("/{chat_id}/messages")
-async def list_messages(chat_id: str, user=Depends(verify_firebase_token)):
-    """Get all messages in a chat"""
-    messages = await get_chat_messages(chat_id)
-    return messages
+async def list_messages(
+    chat_id: str,
+    since: str | None = None,
+    before: str | None = None,
+    page_size: int = DEFAULT_MESSAGE_PAGE_SIZE,
+    user=Depends(verify_firebase_token),
+):
+    """Get the newest messages in a chat, oldest first.
+
+    Pass the id of the last message seen as `since` to fetch only newer ones, or the
+    oldest one loaded as `before` to page back through history.
+    """
+    try:
+        return await get_chat_messages(chat_id, since=since, before=before, page_size=page_size)
+    except InvalidMessageCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/{chat_id}/message")
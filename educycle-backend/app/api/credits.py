@@ -1,19 +1,29 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from app.api.deps import get_current_user
-from app.services.credits_service import get_leaderboard
+from app.services.credits_service import get_leaderboard, get_edu_credits, get_rank
 
 router = APIRouter()
 
 @router.get("/leaderboard")
-async def leaderboard(limit: int = 10):
-    """Get the student leaderboard"""
-    return await get_leaderboard(limit)
+async def leaderboard(limit: int = 10, city: str | None = None, area: str | None = None):
+    """Get the student leaderboard; pass `city` (and `area`) for a local board"""
+    if area and not city:
+        raise HTTPException(status_code=400, detail="area requires city")
+    return await get_leaderboard(limit, city, area)
 
 @router.get("/me")
 async def get_my_credits(user=Depends(get_current_user)):
     """Get the current user's EduCredits"""
-    from app.db.firestore import get_user_by_uid
-    profile = await get_user_by_uid(user["uid"])
     return {
-        "edu_credits": profile.get("edu_credits", 0) if profile else 0
+        "edu_credits": await get_edu_credits(user["uid"])
     }
+
+@router.get("/me/rank")
+async def get_my_rank(scope: str = "global", user=Depends(get_current_user)):
+    """Get the current user's leaderboard rank: scope is global, city or area"""
+    if scope not in ("global", "city", "area"):
+        raise HTTPException(status_code=400, detail="scope must be global, city or area")
+    rank = await get_rank(user["uid"], scope)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="Only students are ranked")
+    return rank
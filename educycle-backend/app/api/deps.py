@@ -1,4 +1,5 @@
-from fastapi import Depends
+from fastapi import Depends, HTTPException, status
+from app.core.config import settings
 from app.core.security import verify_firebase_token
 from app.core.roles import require_role
 
@@ -13,3 +14,13 @@ async def student_only(user=Depends(get_current_user)):
 
 async def ngo_only(user=Depends(get_current_user)):
     return await require_role(user["uid"], ["ngo"])
+
+
+async def admin_only(user=Depends(get_current_user)):
+    admin_uids = {uid.strip() for uid in settings.ADMIN_UIDS.split(",") if uid.strip()}
+    if user["uid"] not in admin_uids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied",
+        )
+    return user
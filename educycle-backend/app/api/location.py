@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, Query
-from app.services.location_service import geocode_address, find_nearby_ngos, reverse_geocode_coordinates
+from app.services.location_service import geocode_address, find_nearest_ngos, reverse_geocode_coordinates
 
 router = APIRouter()
 
+# Largest `limit` a pickup-point search accepts
+MAX_PICKUP_POINTS = 100
+
 
 @router.get("/pickup-points")
 async def get_pickup_points(
@@ -10,7 +13,9 @@ async def get_pickup_points(
     area: str = Query(None), 
     lat: float = Query(None),
     lon: float = Query(None),
-    radius: float = Query(5.0, description="Search radius in km")
+    radius: float = Query(5.0, description="Search radius in km"),
+    limit: int = Query(None, ge=1, le=MAX_PICKUP_POINTS,
+                       description="Return at most this many of the closest pickup points")
 ):
     """
     Find safe NGO pickup points.
@@ -43,19 +48,10 @@ async def get_pickup_points(
         raise HTTPException(status_code=404, detail="Could not identify location")
         
     # Smart Search: Auto-expand radius if no NGOs found nearby
-    # Try requested radius first (default 5km)
-    ngos = await find_nearby_ngos(search_lat, search_lon, radius)
-    
-    expanded = False
-    if not ngos and radius < 20:
-        # Try 20km
-        ngos = await find_nearby_ngos(search_lat, search_lon, 20.0)
-        expanded = True
-        
-    if not ngos and radius < 50:
-        # Try 50km
-        ngos = await find_nearby_ngos(search_lat, search_lon, 50.0)
-        expanded = True
+    # Requested radius first (default 5km), then 20km, then 50km - all resolved in one pass
+    # NGOs still waiting for background geocoding are skipped rather than geocoded here
+    ngos, search_radius, pending_geocode = await find_nearest_ngos(search_lat, search_lon, radius, limit=limit)
+    expanded = search_radius != radius
 
     return {
         "user_location": {
@@ -64,5 +60,7 @@ async def get_pickup_points(
             "detected_address": detected_address
         },
         "pickup_points": ngos,
-        "search_expanded": expanded
+        "search_expanded": expanded,
+        "search_radius_km": search_radius,
+        "pending_geocode": pending_geocode
     }
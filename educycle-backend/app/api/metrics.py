@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends
+from app.api.deps import admin_only
+from app.core.http import http_client_stats
+from app.core.security import token_verifier
+from app.db.firestore import user_cache
+from app.db.request_scope import endpoint_stats_summary
+from app.services.location_service import geocode_backfill, geocode_cache, geocode_stats, nominatim_limiter
+from app.services.book_catalog import book_catalog
+from app.services.chat_service import chat_cache
+from app.services.credits_service import credit_ledger
+from app.services.leaderboard import leaderboard
+from app.services.ngo_index import ngo_index
+from app.services.notification_service import notification_outbox, unread_count_cache
+from app.services.realtime import realtime_hub
+from app.services.search_index import book_index, note_index
+
+router = APIRouter()
+
+
+@router.get("/")
+async def metrics(user=Depends(admin_only)):
+    """In-process cache and performance counters (admins listed in ADMIN_UIDS only)"""
+    return {
+        "user_cache": user_cache.stats(),
+        "http_client": http_client_stats(),
+        "token_cache": token_verifier.stats(),
+        "chat_cache": chat_cache.stats(),
+        "unread_count_cache": unread_count_cache.stats(),
+        "ngo_index": ngo_index.stats(),
+        "book_catalog": book_catalog.stats(),
+        "search_index": {"books": book_index.stats(), "notes": note_index.stats()},
+        "realtime": realtime_hub.stats(),
+        "notification_outbox": notification_outbox.stats(),
+        "credit_ledger": credit_ledger.stats(),
+        "leaderboard": leaderboard.stats(),
+        "geocoding": {
+            **geocode_stats,
+            "cache": geocode_cache.stats(),
+            "rate_limiter": nominatim_limiter.stats(),
+            "backfill_queue": geocode_backfill.stats(),
+        },
+        "endpoints": endpoint_stats_summary(),
+    }
@@ -28,7 +28,8 @@ async def upload(
 
 
 @router.get("/")
-async def list_all(subject: str = None, class_level: str = None, owner_uid: str = None):
+async def list_all(subject: str = None, class_level: str = None, owner_uid: str = None, q: str = None):
+    """List notes; `q` searches title, subject, board, class level and description."""
     filters = {}
     if subject:
         filters["subject"] = subject
@@ -36,7 +37,7 @@ async def list_all(subject: str = None, class_level: str = None, owner_uid: str
         filters["class_level"] = class_level
     if owner_uid:
         filters["owner_uid"] = owner_uid
-    return await list_notes(filters)
+    return await list_notes(filters, q=q)
 
 
 
@@ -1,44 +1,42 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.api.deps import get_current_user
 from app.db.firestore import db
-from datetime import datetime
-from google.cloud.firestore_v1.base_query import FieldFilter
+from app.services.notification_service import (
+    list_notifications as list_user_notifications,
+    get_unread_count,
+    mark_notifications_read,
+    unread_notifications,
+    InvalidNotificationCursor,
+    DEFAULT_NOTIFICATION_PAGE_SIZE,
+)
 
 router = APIRouter()
 
 @router.get("/")
-async def list_notifications(user=Depends(get_current_user)):
-    """Get notifications for the current user"""
+async def list_notifications(
+    before: str | None = None,
+    page_size: int = DEFAULT_NOTIFICATION_PAGE_SIZE,
+    user=Depends(get_current_user),
+):
+    """Get unread notifications for the current user, newest first.
+
+    Returns one page; pass the last notification's id as `before` for the next.
+    """
     try:
-        docs = db.collection("notifications")\
-                 .where(filter=FieldFilter("user_uid", "==", user["uid"]))\
-                 .where(filter=FieldFilter("read", "==", False))\
-                 .stream()
-        
-        results = []
-        for doc in docs:
-            data = doc.to_dict()
-            # Convert timestamp to ISO string
-            if "timestamp" in data:
-                if hasattr(data["timestamp"], "isoformat"):
-                    data["timestamp"] = data["timestamp"].isoformat()
-                elif isinstance(data["timestamp"], datetime):
-                    data["timestamp"] = data["timestamp"].isoformat()
-            
-            results.append({**data, "id": doc.id})
-        
-        # Sort by timestamp DESC in memory
-        results.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        return results
-    except Exception as e:
-        print(f"Error list_notifications: {e}")
-        return []
+        return await list_user_notifications(user["uid"], before=before, page_size=page_size)
+    except InvalidNotificationCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/unread-count")
+async def unread_count(user=Depends(get_current_user)):
+    """Number of unread notifications, for the badge"""
+    return {"unread_count": await get_unread_count(user["uid"])}
 
 @router.post("/{notification_id}/read")
 async def mark_read(notification_id: str, user=Depends(get_current_user)):
     """Mark a notification as read"""
     doc_ref = db.collection("notifications").document(notification_id)
-    doc = doc_ref.get()
+    doc = await doc_ref.get()
     
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Notification not found")
@@ -46,25 +44,23 @@ async def mark_read(notification_id: str, user=Depends(get_current_user)):
     if doc.to_dict()["user_uid"] != user["uid"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
     
-    doc_ref.update({"read": True})
+    if not doc.to_dict().get("read"):
+        await mark_notifications_read(user["uid"], [doc])
     return {"status": "success"}
 
+async def _mark_all_read(uid: str, related_id: str | None = None):
+    # Only references and update times are needed, so skip the notification bodies
+    docs = unread_notifications(uid, related_id).select(["read"]).stream()
+    counts = await mark_notifications_read(uid, [doc async for doc in docs])
+    status = "partial" if counts["failed"] else "success"
+    return {"status": status, "count": counts["updated"], "failed": counts["failed"]}
+
 @router.post("/read-all-chat/{chat_id}")
 async def mark_chat_read(chat_id: str, user=Depends(get_current_user)):
     """Mark all notifications for a specific chat as read"""
-    docs = db.collection("notifications")\
-             .where(filter=FieldFilter("user_uid", "==", user["uid"]))\
-             .where(filter=FieldFilter("related_id", "==", chat_id))\
-             .where(filter=FieldFilter("read", "==", False))\
-             .stream()
-    
-    batch = db.batch()
-    count = 0
-    for doc in docs:
-        batch.update(doc.reference, {"read": True})
-        count += 1
-    
-    if count > 0:
-        batch.commit()
-    
-    return {"status": "success", "count": count}
+    return await _mark_all_read(user["uid"], related_id=chat_id)
+
+@router.post("/read-all")
+async def mark_all_read(user=Depends(get_current_user)):
+    """Mark every notification of the current user as read"""
+    return await _mark_all_read(user["uid"])
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+
+from app.core.config import settings
+from app.core.security import decode_firebase_token
+from app.services.realtime import realtime_hub
+
+router = APIRouter()
+
+
+async def _send_events(websocket: WebSocket, queue: asyncio.Queue, expires_at: float):
+    while True:
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return  # token expired: the client reconnects with a fresh one
+        try:
+            event = await asyncio.wait_for(queue.get(), timeout=min(settings.REALTIME_PING_INTERVAL, remaining))
+        except asyncio.TimeoutError:
+            event = {"type": "ping"}
+        if event is None:
+            return  # fell too far behind; the client resyncs over REST on reconnect
+        await websocket.send_json(event)
+
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    # Clients have nothing to send; reading is how a closed socket is noticed
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/ws")
+async def realtime_socket(websocket: WebSocket, token: str = ""):
+    """Push channel for new chat messages and notifications.
+
+    Connect with `?token=<Firebase ID token>`. Events arrive as JSON
+    `{"type": "message" | "notification", "data": {...}}`, with `{"type": "ping"}`
+    keepalives in between. The server closes the socket when the token expires.
+    """
+    try:
+        user = await decode_firebase_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    queue = realtime_hub.subscribe(user["uid"])
+    tasks = [
+        asyncio.create_task(_send_events(websocket, queue, user.get("exp", time.time() + 3600))),
+        asyncio.create_task(_wait_for_disconnect(websocket)),
+    ]
+    try:
+        await websocket.send_json({"type": "ready"})
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        realtime_hub.unsubscribe(user["uid"], queue)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await websocket.close()
+        except RuntimeError:
+            pass  # already closed by the client
@@ -9,6 +9,7 @@ class Settings(BaseSettings):
     FIREBASE_STORAGE_BUCKET: str
     FIREBASE_SERVICE_ACCOUNT: str  # path to serviceAccountKey.json
     FIREBASE_API_KEY: str
+    IDENTITY_TOOLKIT_URL: str = "https://identitytoolkit.googleapis.com"
 
     # SMTP Settings
     SMTP_HOST: str = "smtp.gmail.com"
@@ -18,6 +19,71 @@ class Settings(BaseSettings):
     EMAILS_FROM_EMAIL: str = ""
     EMAILS_FROM_NAME: str = "EduCycle"
 
+    # Comma-separated Firebase uids allowed to read operational endpoints (/metrics)
+    ADMIN_UIDS: str = ""
+
+    # In-process user profile cache
+    USER_CACHE_SIZE: int = 2048
+    USER_CACHE_TTL: int = 60
+
+    # Verified Firebase ID tokens kept until their own expiry
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Follow NGO profile changes with a Firestore listener (keeps every worker's index fresh)
+    NGO_INDEX_WATCH: bool = True
+
+    # Available-books catalog: follow changes with a listener, and re-check against Firestore every N seconds
+    BOOK_CATALOG_WATCH: bool = True
+    BOOK_CATALOG_CHECK_INTERVAL: int = 300
+
+    # Follow notes with a listener, so `q` search sees notes uploaded or deleted on other workers
+    NOTE_INDEX_WATCH: bool = True
+
+    # Chat documents (membership, book title) cached by chat id
+    CHAT_CACHE_SIZE: int = 4096
+    CHAT_CACHE_TTL: int = 3600
+
+    # notification_counters/{uid} reads behind the unread badge
+    NOTIFICATION_COUNT_CACHE_SIZE: int = 4096
+    NOTIFICATION_COUNT_CACHE_TTL: int = 300
+
+    # Notifications for the same user and subject within this many seconds are merged into one write
+    NOTIFICATION_COALESCE_WINDOW: float = 5.0
+
+    # EduCredits: users credited more than this many times a second spread increments over shards,
+    # which are folded back into users.edu_credits every CREDIT_ROLLUP_INTERVAL seconds
+    CREDIT_HOT_WRITES_PER_SECOND: int = 5
+    CREDIT_SHARD_COUNT: int = 10
+    CREDIT_ROLLUP_INTERVAL: int = 10
+    # Per-user totals of not-yet-rolled-up shards, so balance reads skip the shard query
+    CREDIT_SHARD_CACHE_SIZE: int = 4096
+    CREDIT_SHARD_CACHE_TTL: int = 60
+
+    # In-memory leaderboard: snapshot (top N students) when changed, full reload from users for profile edits
+    LEADERBOARD_SNAPSHOT_INTERVAL: int = 60
+    LEADERBOARD_SNAPSHOT_SIZE: int = 10000
+    LEADERBOARD_RELOAD_INTERVAL: int = 900
+    # Apply other workers' grants to this worker's board via a listener on new ledger entries
+    LEADERBOARD_WATCH: bool = True
+
+    # WebSocket push: events buffered per connection before a slow client is dropped, and keepalive ping interval
+    REALTIME_QUEUE_SIZE: int = 100
+    REALTIME_PING_INTERVAL: int = 25
+
+    # Nominatim geocoding (public instance allows 1 request/second)
+    NOMINATIM_BASE_URL: str = "https://nominatim.openstreetmap.org"
+    NOMINATIM_RATE_PER_SECOND: float = 1.0
+    GEOCODE_CACHE_SIZE: int = 4096
+    GEOCODE_CACHE_TTL: int = 30 * 24 * 3600
+
+    # Shared outbound HTTP client pool
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 40
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    HTTP_TIMEOUT: float = 10.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".env"),
         env_file_encoding="utf-8",
@@ -1,7 +1,7 @@
 import json
 import os
 import firebase_admin
-from firebase_admin import credentials, firestore, storage
+from firebase_admin import credentials, firestore, firestore_async, storage
 from app.core.config import settings
 
 _firebase_app = None
@@ -42,6 +42,11 @@ def get_firestore():
     return firestore.client()
 
 
+def get_async_firestore():
+    init_firebase()
+    return firestore_async.client()
+
+
 def get_storage_bucket():
     init_firebase()
     return storage.bucket()
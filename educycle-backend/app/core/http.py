@@ -0,0 +1,118 @@
+import asyncio
+
+import httpx
+
+from app.core.config import settings
+
+# Process-wide counters; new_connections vs requests shows how often keep-alive is reused
+http_stats = {"requests": 0, "new_connections": 0, "hosts": {}}
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body wrapper that frees the per-host slot once the body is closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _PerHostLimitTransport(httpx.AsyncBaseTransport):
+    """Pooled HTTP/2-capable transport that caps concurrent requests per host and counts connection reuse."""
+
+    def __init__(self, per_host_limit: int, **transport_kwargs):
+        self._transport = httpx.AsyncHTTPTransport(**transport_kwargs)
+        self._per_host_limit = per_host_limit
+        self._host_slots = {}
+
+    def _host_stats(self, host: str):
+        return http_stats["hosts"].setdefault(host, {"requests": 0, "new_connections": 0})
+
+    async def handle_async_request(self, request: httpx.Request):
+        host = request.url.host
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self._per_host_limit))
+        host_stats = self._host_stats(host)
+
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                http_stats["new_connections"] += 1
+                host_stats["new_connections"] += 1
+
+        request.extensions = {**request.extensions, "trace": trace}
+        http_stats["requests"] += 1
+        host_stats["requests"] += 1
+
+        await slots.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                slots.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+_client: httpx.AsyncClient | None = None
+
+
+def _build_client():
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    transport = _PerHostLimitTransport(
+        per_host_limit=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+        http2=True,
+        limits=limits,
+        retries=1,
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared pooled client for every outbound call (Nominatim, identity toolkit, Resend, Google certs)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def http_client_stats():
+    reused = http_stats["requests"] - http_stats["new_connections"]
+    return {
+        **http_stats,
+        "reused_connections": max(reused, 0),
+        "reuse_rate": round(reused / http_stats["requests"], 4) if http_stats["requests"] else 0.0,
+    }
@@ -1,21 +1,168 @@
+import asyncio
+import hashlib
+import re
+import time
+
+import jwt
+from cryptography import x509
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth
 
+from app.core.config import settings
+from app.core.http import get_http_client
+from app.db.cache import TTLCache
+
 security = HTTPBearer()
 
+ID_TOKEN_CERT_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
 
-async def verify_firebase_token(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-):
-    token = credentials.credentials
 
+class SigningKeysNotLoaded(Exception):
+    """Raised when a token's signing key isn't in the local key set yet."""
+
+
+class FirebaseTokenVerifier:
+    """Verifies Firebase ID tokens locally against Google's signing certs.
+
+    Verified claims are cached by token hash until the token's own `exp`, and the
+    certs are refreshed by a background task, so the request path never waits on
+    the network.
+    """
+
+    def __init__(self, project_id: str, cert_url: str = ID_TOKEN_CERT_URL, cache_size: int = 10000):
+        self.project_id = project_id
+        self.cert_url = cert_url
+        self._public_keys = {}  # kid -> RSA public key
+        self._keys_max_age = 0
+        self.cache = TTLCache(maxsize=cache_size, ttl=3600)
+        self.key_refreshes = 0
+        self.key_refresh_failures = 0
+        self._refresh_requested = asyncio.Event()
+
+    def set_public_keys(self, certs: dict, max_age: int = 3600):
+        """Install signing keys from a {kid: PEM certificate} mapping."""
+        self._public_keys = {
+            kid: x509.load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+            for kid, pem in certs.items()
+        }
+        self._keys_max_age = max_age
+
+    async def refresh_public_keys(self):
+        res = await get_http_client().get(self.cert_url)
+        res.raise_for_status()
+
+        max_age = 3600
+        match = re.search(r"max-age=(\d+)", res.headers.get("cache-control", ""))
+        if match:
+            max_age = int(match.group(1))
+
+        self.set_public_keys(res.json(), max_age)
+        self.key_refreshes += 1
+
+    async def run_key_refresher(self):
+        """Keep the signing keys fresh; refresh a few minutes before Google rotates them."""
+        while True:
+            try:
+                await self.refresh_public_keys()
+                delay = max(60, self._keys_max_age - 300)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.key_refresh_failures += 1
+                print(f"ID token cert refresh failed: {e}")
+                delay = 30
+            # Sleep until the next scheduled refresh, or wake early when an unknown kid shows up
+            try:
+                await asyncio.wait_for(self._refresh_requested.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._refresh_requested.clear()
+
+    def request_refresh(self):
+        self._refresh_requested.set()
+
+    @staticmethod
+    def _cache_key(token: str):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get_cached(self, token: str):
+        claims = self.cache.get(self._cache_key(token))
+        if claims is None or claims["exp"] <= time.time():
+            return None
+        return dict(claims)
+
+    def remember(self, token: str, claims: dict):
+        ttl = claims["exp"] - time.time()
+        if ttl > 0:
+            self.cache.set(self._cache_key(token), claims, ttl=ttl)
+
+    def verify(self, token: str):
+        """Return the decoded claims (with `uid`) or raise on an invalid token."""
+        cached = self.get_cached(token)
+        if cached is not None:
+            return cached
+
+        header = jwt.get_unverified_header(token)
+        key = self._public_keys.get(header.get("kid"))
+        if key is None:
+            raise SigningKeysNotLoaded(header.get("kid"))
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=self.project_id,
+            issuer=ID_TOKEN_ISSUER_PREFIX + self.project_id,
+            options={"require": ["exp", "iat", "sub"]},
+        )
+
+        subject = claims["sub"]
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise jwt.InvalidTokenError("Invalid sub claim")
+        if claims.get("auth_time", 0) > time.time():
+            raise jwt.InvalidTokenError("auth_time is in the future")
+
+        claims["uid"] = subject
+        self.remember(token, claims)
+        return dict(claims)
+
+    def stats(self):
+        return {
+            **self.cache.stats(),
+            "signing_keys": len(self._public_keys),
+            "key_refreshes": self.key_refreshes,
+            "key_refresh_failures": self.key_refresh_failures,
+        }
+
+
+token_verifier = FirebaseTokenVerifier(settings.FIREBASE_PROJECT_ID, cache_size=settings.TOKEN_CACHE_SIZE)
+
+
+async def decode_firebase_token(token: str):
+    """Claims for a Firebase ID token; raises 401 HTTPException if it doesn't verify."""
     try:
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token
+        return token_verifier.verify(token)
+    except SigningKeysNotLoaded:
+        # Keys not fetched yet (cold start) or just rotated: let the Admin SDK verify it off the loop
+        token_verifier.request_refresh()
+        try:
+            decoded_token = await asyncio.to_thread(auth.verify_id_token, token)
+            token_verifier.remember(token, decoded_token)
+            return decoded_token
+        except Exception:
+            pass
     except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired Firebase token",
-        )
+        pass
+
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired Firebase token",
+    )
 
+
+async def verify_firebase_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    return await decode_firebase_token(credentials.credentials)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import random
+
+from google.api_core import exceptions as gexc
+
+from app.db.firestore import db
+
+logger = logging.getLogger(__name__)
+
+# Firestore rejects a batch with more writes than this
+MAX_BATCH_WRITES = 500
+
+# Errors worth retrying. After these the commit was certainly not applied
+REJECTED_ERRORS = (
+    gexc.Aborted,
+    gexc.ResourceExhausted,
+)
+# ...while after these it may have been, so a retry can apply the writes twice
+AMBIGUOUS_ERRORS = (
+    gexc.DeadlineExceeded,
+    gexc.InternalServerError,
+    gexc.ServiceUnavailable,
+)
+
+
+async def _commit_chunk(chunk: list, per_batch, on_commit, retries: int, counts: dict):
+    # Plain field updates are idempotent; per_batch writes (e.g. an Increment) may not be
+    retryable = REJECTED_ERRORS if per_batch is not None else REJECTED_ERRORS + AMBIGUOUS_ERRORS
+    # A fresh batch per attempt: a batch isn't reusable after a failed commit
+    for attempt in range(retries + 1):
+        batch = db.batch()
+        for ref, fields, *option in chunk:
+            batch.update(ref, fields, *option)
+        if per_batch is not None:
+            per_batch(batch, chunk)
+        try:
+            await batch.commit()
+            counts["updated"] += len(chunk)
+            counts["batches"] += 1
+            if on_commit is not None:
+                on_commit(chunk)
+            return
+        except retryable as e:
+            if attempt == retries:
+                logger.warning(f"Bulk update gave up on a batch of {len(chunk)} after {retries} retries: {e}")
+                break
+            counts["retries"] += 1
+            await asyncio.sleep(0.2 * 2 ** attempt + random.random() * 0.1)
+        except Exception as e:
+            logger.warning(f"Bulk update failed for a batch of {len(chunk)}: {e}")
+            break
+    counts["failed"] += len(chunk)
+
+
+async def bulk_update(updates: list, per_batch=None, extra_writes_per_batch: int = 0,
+                      on_commit=None, concurrency: int = 4, retries: int = 3):
+    """Apply (ref, fields) updates in batches of at most MAX_BATCH_WRITES writes.
+
+    An update may carry a third element, a write option such as
+    db.write_option(last_update_time=...); if its precondition fails the whole
+    batch is rejected and counted as failed.
+
+    Batches commit concurrently (`concurrency` at a time) and each is retried with
+    backoff on transient errors. `per_batch(batch, chunk)` may add writes that must
+    land atomically with a chunk, e.g. a counter adjustment; declare how many with
+    `extra_writes_per_batch`. Such writes need not be idempotent, so those batches
+    are retried only after errors that guarantee nothing was applied. After a
+    timeout or server error the chunk fails and the caller decides what to do (see
+    mark_notifications_read).
+
+    `on_commit(chunk)` runs for each chunk once it has committed, e.g. to mirror
+    exactly those updates into an in-memory view. A chunk that still fails is
+    skipped, logged and counted, so callers get {"updated", "failed", "batches",
+    "retries"} instead of an exception.
+    """
+    chunk_size = MAX_BATCH_WRITES - extra_writes_per_batch
+    chunks = [updates[i:i + chunk_size] for i in range(0, len(updates), chunk_size)]
+    counts = {"updated": 0, "failed": 0, "batches": 0, "retries": 0}
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def commit(chunk):
+        async with semaphore:
+            await _commit_chunk(chunk, per_batch, on_commit, retries, counts)
+
+    await asyncio.gather(*(commit(chunk) for chunk in chunks))
+    return counts
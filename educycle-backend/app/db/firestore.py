@@ -1,20 +1,100 @@
-from app.core.firebase import get_firestore
+import asyncio
+import copy
+from app.core.config import settings
+from app.core.firebase import get_async_firestore
+from app.db.cache import TTLCache
+from app.db.request_scope import current_scope, record_user_doc_reads
 
-db = get_firestore()
+# Async client: every read/write must be awaited so handlers never block the event loop.
+db = get_async_firestore()
+
+# Documents per multi-document read in get_users_by_uids
+USER_BATCH_SIZE = 100
+
+# Process-wide cache of users/{uid} documents (None is cached for missing users).
+# Callers always get a deep copy, so mutating a returned profile never touches the cache.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+_NOT_CACHED = object()
+
+
+def invalidate_user(uid: str):
+    """Drop a cached profile. Call after every write to users/{uid}."""
+    user_cache.invalidate(uid)
+    scope = current_scope()
+    if scope is not None:
+        scope.users.pop(uid, None)
+
+
+def _lookup_cached_user(uid: str):
+    # The request's identity map wins, so one request always sees one version of a profile
+    scope = current_scope()
+    if scope is not None and uid in scope.users:
+        return scope.users[uid]
+
+    cached = user_cache.get(uid, _NOT_CACHED)
+    if cached is not _NOT_CACHED and scope is not None:
+        scope.users[uid] = cached
+    return cached
+
+
+def _remember_user(uid: str, user):
+    user_cache.set(uid, user)
+    scope = current_scope()
+    if scope is not None:
+        scope.users[uid] = user
 
 
 async def get_user_by_uid(uid: str):
-    doc = db.collection("users").document(uid).get()
-    if doc.exists:
-        return doc.to_dict()
-    return None
+    cached = _lookup_cached_user(uid)
+    if cached is not _NOT_CACHED:
+        return copy.deepcopy(cached)
+
+    doc = await db.collection("users").document(uid).get()
+    record_user_doc_reads()
+    user = doc.to_dict() if doc.exists else None
+    _remember_user(uid, user)
+    return copy.deepcopy(user)
+
+
+async def get_users_by_uids(uids):
+    """Fetch many user profiles at once. Returns {uid: profile} for the users that exist."""
+    users = {}
+    missing_uids = []
+    for uid in dict.fromkeys(uid for uid in uids if uid):
+        cached = _lookup_cached_user(uid)
+        if cached is _NOT_CACHED:
+            missing_uids.append(uid)
+        elif cached is not None:
+            users[uid] = copy.deepcopy(cached)
+
+    chunks = [missing_uids[i:i + USER_BATCH_SIZE] for i in range(0, len(missing_uids), USER_BATCH_SIZE)]
+
+    async def fetch_chunk(chunk):
+        refs = [db.collection("users").document(uid) for uid in chunk]
+        return [doc async for doc in db.get_all(refs)]
+
+    # One get_all round-trip per chunk, all chunks in flight together
+    snapshots = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))
+
+    record_user_doc_reads(len(missing_uids))
+
+    for chunk in snapshots:
+        for doc in chunk:
+            user = doc.to_dict() if doc.exists else None
+            _remember_user(doc.id, user)
+            if user is not None:
+                users[doc.id] = copy.deepcopy(user)
+
+    return users
 
 
 async def create_user_if_not_exists(uid: str, data: dict):
     ref = db.collection("users").document(uid)
-    doc = ref.get()
+    doc = await ref.get()
+    record_user_doc_reads()
     if not doc.exists:
-        ref.set(data)
+        await ref.set(data)
+        invalidate_user(uid)
     else:
         # Update existing user, but preserve existing fields that aren't being updated
         # For NGO, always update organization_name, city, and area if provided (to fix missing data)
@@ -31,7 +111,8 @@ async def create_user_if_not_exists(uid: str, data: dict):
                         update_data[k] = v
         
         if update_data:
-            ref.update(update_data)
+            await ref.update(update_data)
+            invalidate_user(uid)
 
 
 async def get_user_display_info(uid: str):
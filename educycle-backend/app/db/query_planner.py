@@ -0,0 +1,130 @@
+import json
+from pathlib import Path
+
+# Composite indexes deployed with `firebase deploy --only firestore:indexes`
+INDEXES_FILE = Path(__file__).resolve().parents[2] / "firestore.indexes.json"
+
+# Rough number of distinct values per field, used to rank filters by selectivity
+CARDINALITY = {
+    "area": 500,
+    "city": 100,
+    "subject": 20,
+    "class_level": 8,
+    "condition": 4,
+    "board": 3,
+    "is_set": 2,
+}
+
+
+class UnknownFilterField(ValueError):
+    pass
+
+
+class QueryPlan:
+    """Which equality filters Firestore evaluates (through `index`) and which run in memory."""
+
+    def __init__(self, collection: str, pushed: dict, residual: dict, index: list | None):
+        self.collection = collection
+        self.pushed = pushed
+        self.residual = residual
+        self.index = index
+
+    def explain(self):
+        return {
+            "collection": self.collection,
+            "firestore_filters": self.pushed,
+            "memory_filters": self.residual,
+            "index": self.index,
+        }
+
+
+def _with_implicit_name(order: list):
+    """(field, direction) pairs with Firestore's implicit trailing __name__ spelled out.
+
+    A query or index that doesn't order by __name__ last orders by it in the
+    direction of its last ordered field.
+    """
+    if order and order[-1][0] != "__name__":
+        return [*order, ("__name__", order[-1][1])]
+    return list(order)
+
+
+class QueryPlanner:
+    """Chooses, for a set of equality filters, the subset Firestore can serve.
+
+    A composite index covers a query when its equality fields are exactly the pushed
+    filters plus the query's fixed equality fields, followed by the query's `order`
+    ((field, direction) pairs) in the same directions, including the __name__
+    tie-break whether the index spells it out or leaves it implicit. The planner
+    picks the covering index with the most selective pushed filters and leaves the
+    remaining filters for an in-memory pass over the results.
+    """
+
+    def __init__(self, collection: str, filterable: tuple, fixed_equality: tuple = (),
+                 order: tuple = (), indexes_file: Path = INDEXES_FILE):
+        self.collection = collection
+        self.filterable = tuple(filterable)
+        self.fixed_equality = frozenset(fixed_equality)
+        self.order = tuple(order)
+        self._candidates = self._load_candidates(indexes_file)
+
+    def _load_candidates(self, indexes_file: Path):
+        """[(filter fields beyond the fixed ones, index field paths)] for every usable index."""
+        try:
+            declared = json.loads(indexes_file.read_text()).get("indexes", [])
+        except FileNotFoundError:
+            declared = []
+
+        order = _with_implicit_name(self.order)
+        candidates = []
+        for index in declared:
+            if index.get("collectionGroup") != self.collection:
+                continue
+            fields = [(f["fieldPath"], f.get("order", "ASCENDING")) for f in index.get("fields", [])]
+            if order:
+                fields = _with_implicit_name(fields)
+                if len(fields) < len(order) or fields[-len(order):] != order:
+                    continue
+                fields = fields[:-len(order)]
+            elif fields and fields[-1][0] == "__name__":
+                fields = fields[:-1]
+            equality = frozenset(path for path, _ in fields)
+            if self.fixed_equality <= equality and equality - self.fixed_equality <= set(self.filterable):
+                candidates.append((equality - self.fixed_equality, [f["fieldPath"] for f in index["fields"]]))
+
+        if not order:
+            # Single-field equality filters are always served by Firestore's automatic indexes
+            candidates.extend((frozenset([name]), [name]) for name in self.filterable)
+        elif not self.fixed_equality and len(order) == 2 and order[0][1] == order[1][1]:
+            # Ordering by one field, __name__ following its direction, needs only the automatic index
+            candidates.append((frozenset(), [order[0][0]]))
+        if not any(not fields for fields, _ in candidates):
+            # Nothing pushed beyond the fixed filters: an unordered, or no-filter, query
+            candidates.append((frozenset(), None))
+        return candidates
+
+    def validate(self, filters: dict):
+        unknown = sorted(set(filters) - set(self.filterable))
+        if unknown:
+            raise UnknownFilterField(
+                f"Unsupported filter(s): {', '.join(unknown)}. Allowed: {', '.join(self.filterable)}"
+            )
+
+    def plan(self, filters: dict) -> QueryPlan:
+        """Plan for field -> value equality filters; call validate() first."""
+        def selectivity(fields):
+            # Expected fraction of documents a combination keeps: smaller is better
+            fraction = 1.0
+            for name in fields:
+                fraction /= CARDINALITY.get(name, 1)
+            return fraction
+
+        usable = [(fields, index) for fields, index in self._candidates if fields <= filters.keys()]
+        best, index = min(usable, key=lambda c: (selectivity(c[0]), -len(c[0]), sorted(c[0])))
+
+        return QueryPlan(
+            collection=self.collection,
+            pushed={k: v for k, v in filters.items() if k in best},
+            residual={k: v for k, v in filters.items() if k not in best},
+            index=index,
+        )
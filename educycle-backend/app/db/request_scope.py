@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class RequestScope:
+    """Per-request identity map of users/{uid} documents plus read counters."""
+
+    def __init__(self):
+        self.users = {}  # uid -> profile dict (None if the user doesn't exist)
+        self.user_doc_reads = 0  # users/{uid} documents fetched from Firestore
+
+
+_current_scope: ContextVar[RequestScope | None] = ContextVar("request_scope", default=None)
+
+# "METHOD /route/path" -> aggregated counters across requests
+endpoint_stats = {}
+
+
+def current_scope():
+    """The active request scope, or None outside an HTTP request (scripts, background tasks)."""
+    return _current_scope.get()
+
+
+@contextmanager
+def request_scope():
+    scope = RequestScope()
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def record_user_doc_reads(count: int = 1):
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.user_doc_reads += count
+
+
+def record_endpoint(endpoint: str, scope: RequestScope):
+    stats = endpoint_stats.setdefault(endpoint, {"requests": 0, "user_doc_reads": 0, "max_user_doc_reads": 0})
+    stats["requests"] += 1
+    stats["user_doc_reads"] += scope.user_doc_reads
+    stats["max_user_doc_reads"] = max(stats["max_user_doc_reads"], scope.user_doc_reads)
+
+
+def endpoint_stats_summary():
+    return {
+        endpoint: {**stats, "avg_user_doc_reads": round(stats["user_doc_reads"] / stats["requests"], 3)}
+        for endpoint, stats in sorted(endpoint_stats.items())
+    }
@@ -1,4 +1,5 @@
 from app.core.firebase import get_storage_bucket
+import asyncio
 import uuid
 
 
@@ -8,8 +9,9 @@ async def upload_file(file_bytes: bytes, path: str, content_type: str):
         filename = f"{path}/{uuid.uuid4()}"
         blob = bucket.blob(filename)
     
-        blob.upload_from_string(file_bytes, content_type=content_type)
-        blob.make_public()
+        # The storage SDK is sync-only, so run the upload off the event loop
+        await asyncio.to_thread(blob.upload_from_string, file_bytes, content_type=content_type)
+        await asyncio.to_thread(blob.make_public)
     
         return blob.public_url
     except Exception as e:
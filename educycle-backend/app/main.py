@@ -1,9 +1,82 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import auth, books, requests, chats, notes, ngo, feedback, impact, notifications, credits, location, distribution
+from app.api import auth, books, requests, chats, notes, ngo, feedback, impact, notifications, credits, location, distribution, metrics, realtime
+from app.db.request_scope import request_scope, record_endpoint
+from app.core.config import settings
+from app.core.http import get_http_client, close_http_client
+from app.core.security import token_verifier
+from app.services.book_catalog import book_catalog
+from app.services.credits_service import credit_ledger
+from app.services.leaderboard import leaderboard
+from app.services.location_service import geocode_backfill
+from app.services.ngo_index import ngo_index
+from app.services.notification_service import notification_outbox
+from app.services.search_index import note_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled outbound HTTP client for the app's lifetime
+    get_http_client()
+
+    # Background jobs that keep hot-path data fresh without blocking requests
+    background_tasks = [
+        asyncio.create_task(token_verifier.run_key_refresher()),
+        asyncio.create_task(geocode_backfill.run()),
+        asyncio.create_task(book_catalog.run_consistency_checks()),
+        asyncio.create_task(notification_outbox.run()),
+        asyncio.create_task(credit_ledger.run_rollups()),
+        asyncio.create_task(leaderboard.run()),
+    ]
+    # With a listener, its first snapshot is the initial load; otherwise read everything once
+    ngo_watching = book_watching = note_watching = False
+    if settings.NGO_INDEX_WATCH:
+        try:
+            ngo_index.start_watch(asyncio.get_running_loop())
+            ngo_watching = True
+        except Exception as e:
+            print(f"NGO index listener not started: {e}")
+    if not ngo_watching:
+        background_tasks.append(asyncio.create_task(ngo_index.load()))
+    if settings.BOOK_CATALOG_WATCH:
+        try:
+            book_catalog.start_watch(asyncio.get_running_loop())
+            book_watching = True
+        except Exception as e:
+            print(f"Book catalog listener not started: {e}")
+    if not book_watching:
+        background_tasks.append(asyncio.create_task(book_catalog.load()))
+    if settings.NOTE_INDEX_WATCH:
+        try:
+            note_index.start_watch(asyncio.get_running_loop())
+            note_watching = True
+        except Exception as e:
+            print(f"Note index listener not started: {e}")
+    if not note_watching:
+        background_tasks.append(asyncio.create_task(note_index.load()))
+    if settings.LEADERBOARD_WATCH:
+        try:
+            leaderboard.start_watch(asyncio.get_running_loop())
+        except Exception as e:
+            print(f"Leaderboard listener not started: {e}")
+    yield
+    ngo_index.stop_watch()
+    book_catalog.stop_watch()
+    note_index.stop_watch()
+    leaderboard.stop_watch()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # Don't lose notifications still waiting for their coalescing window
+    await notification_outbox.flush(final=True)
+    await close_http_client()
+
 
 app = FastAPI(
+    lifespan=lifespan,
     title="EduCycle Backend",
     version="1.0.0",
     description="Backend APIs for EduCycle platform",
@@ -28,6 +101,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# One identity map per request: each users/{uid} doc is read from Firestore at most once
+@app.middleware("http")
+async def request_scope_middleware(request: Request, call_next):
+    with request_scope() as scope:
+        response = await call_next(request)
+
+    route = request.scope.get("route")
+    endpoint = f"{request.method} {route.path if route else 'unmatched'}"
+    record_endpoint(endpoint, scope)
+    response.headers["X-User-Doc-Reads"] = str(scope.user_doc_reads)
+    return response
+
 from fastapi.staticfiles import StaticFiles
 import os
 
@@ -55,3 +141,5 @@ app.include_router(notifications.router, prefix="/notifications", tags=["Notific
 app.include_router(credits.router, prefix="/credits", tags=["Credits"])
 app.include_router(location.router, prefix="/location", tags=["Location"])
 app.include_router(distribution.router, prefix="/distribution", tags=["Distribution"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
+app.include_router(realtime.router, prefix="/realtime", tags=["Realtime"])
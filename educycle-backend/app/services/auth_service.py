@@ -1,6 +1,7 @@
-from app.services.location_service import geocode_address
+from app.services.location_service import geocode_address, ngo_location_fields
 from datetime import datetime
-from app.db.firestore import create_user_if_not_exists
+from app.db.firestore import create_user_if_not_exists, get_user_by_uid
+from app.services.ngo_index import ngo_index
 
 
 async def bootstrap_user(uid: str, email: str, role: str, display_name: str | None = None, extra: dict | None = None):
@@ -24,11 +25,18 @@ async def bootstrap_user(uid: str, email: str, role: str, display_name: str | No
         
         # We try to get coordinates. It's okay if it fails initially, 
         # they can update profile later (though profile update logic needs to handle this too).
+        # Without coordinates the NGO has no geohash; the pickup-point index queues it for geocoding.
         try:
             lat, lon = await geocode_address(addr_string)
             if lat and lon:
-                data["coordinates"] = {"lat": lat, "lon": lon}
+                data.update(ngo_location_fields(lat, lon))
         except Exception as e:
             print(f"Geocoding failed for {addr_string}: {e}")
 
     await create_user_if_not_exists(uid, data)
+
+    if role == "ngo":
+        # Keep this worker's pickup-point index current without waiting for the listener
+        profile = await get_user_by_uid(uid)
+        if profile:
+            ngo_index.upsert(uid, profile)
@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from app.core.config import settings
+from app.core.firebase import get_firestore
+from app.db.firestore import db
+from app.services.book_columns import BookColumns, FACET_FIELDS
+from app.services.search_index import book_index
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        # Local writes hold naive UTC datetimes, Firestore returns aware ones
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+    return str(value)
+
+
+def _fingerprint(book: dict):
+    """Hash of every field of a book document, for comparing the view with Firestore."""
+    encoded = json.dumps(book, sort_keys=True, default=_json_default)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+class BookCatalog:
+    """Process-resident view of every available book, kept in search order.
+
+    Loaded once at startup (from the listener's first snapshot when watching), then
+    kept current by book_service's change hooks and a Firestore listener (for writes
+    made by other workers). Documents are kept in a
+    dict; facet fields, donor and visibility score are mirrored into BookColumns so
+    filters run as vectorized masks. Each change is forwarded to the full-text book
+    index. A periodic check compares the view with Firestore and repairs any drift.
+    """
+
+    def __init__(self):
+        self._books = {}  # book id -> document
+        self._columns = BookColumns()
+        self._watch = None
+        self.loaded = False
+        self.loaded_at = None
+        self.last_change_at = None
+        self.last_watch_event_at = None
+        self.watch_lag_seconds = None
+        self.changes = 0
+        self.last_check = None
+        self.repairs = 0
+
+    async def load(self):
+        """Full load of available books; run once at startup when there is no listener."""
+        docs = db.collection("books").where(filter=FieldFilter("available", "==", True)).stream()
+        async for doc in docs:
+            self.upsert(doc.id, doc.to_dict())
+        self._mark_loaded()
+
+    def _mark_loaded(self):
+        self.loaded = True
+        self.loaded_at = time.time()
+        book_index.mark_loaded()
+        print(f"Book catalog loaded: {len(self._books)} available books")
+
+    def start_watch(self, loop: asyncio.AbstractEventLoop):
+        """Load and then follow available books, including other workers' writes, via a Firestore listener.
+
+        The listener's first snapshot delivers every available book as ADDED, so it
+        doubles as the initial load; don't also run load(). Callbacks run on the SDK's
+        thread, so changes are handed to the event loop. A book leaving the query
+        (taken, or deleted) arrives as REMOVED.
+        """
+        first_snapshot = True
+
+        def on_snapshot(_docs, changes, read_time):
+            nonlocal first_snapshot
+            loop.call_soon_threadsafe(self._note_watch_event, read_time.timestamp() if read_time else None)
+            for change in changes:
+                book_id = change.document.id
+                if change.type.name == "REMOVED":
+                    loop.call_soon_threadsafe(self.remove, book_id)
+                else:
+                    loop.call_soon_threadsafe(self.upsert, book_id, change.document.to_dict())
+            if first_snapshot:
+                first_snapshot = False
+                loop.call_soon_threadsafe(self._mark_loaded)
+
+        query = get_firestore().collection("books").where(filter=FieldFilter("available", "==", True))
+        self._watch = query.on_snapshot(on_snapshot)
+
+    def stop_watch(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _note_watch_event(self, read_time: float | None):
+        self.last_watch_event_at = time.time()
+        if read_time is not None:
+            self.watch_lag_seconds = round(self.last_watch_event_at - read_time, 3)
+
+    def upsert(self, book_id: str, book: dict):
+        if not book.get("available"):
+            self.remove(book_id)
+            return
+        stored = {**book, "id": book_id}
+        if self._books.get(book_id) == stored:
+            return  # e.g. the listener echoing a write this worker already applied
+        self._books[book_id] = stored
+        self._columns.set(book_id, book)
+        book_index.upsert(book_id, book)
+        self._changed()
+
+    def patch(self, book_id: str, fields: dict):
+        """Apply a partial update (e.g. a donor's new visibility_score) to a book already in view."""
+        book = self._books.get(book_id)
+        if book is not None:
+            self.upsert(book_id, {**book, **fields})
+
+    def remove(self, book_id: str):
+        if self._books.pop(book_id, None) is not None:
+            self._columns.delete(book_id)
+            book_index.remove(book_id)
+            self._changed()
+
+    def _changed(self):
+        self.changes += 1
+        self.last_change_at = time.time()
+
+    def query(self, equality: dict, exclude_uids=(), min_score: float | None = None,
+              after: tuple | None = None, limit: int | None = None, with_facets: bool = False):
+        """(books, facet counts) in search order (visibility_score desc, id).
+
+        `equality` maps field -> required value. Facet fields are matched by the
+        column masks; any other field is checked on the matching documents.
+        `after` = (score, id) starts just past that position and `limit` caps the
+        books returned. Facet counts (None unless asked for) span every page and
+        reflect the facet filters only.
+        """
+        facet_filters = {k: v for k, v in equality.items() if k in FACET_FIELDS}
+        other_filters = {k: v for k, v in equality.items() if k not in FACET_FIELDS}
+        book_ids, facets = self._columns.match(facet_filters, exclude_uids, min_score, after, with_facets)
+
+        results = []
+        for book_id in book_ids:
+            book = self._books[book_id]
+            if all(book.get(k) == v for k, v in other_filters.items()):
+                results.append(dict(book))
+                if limit and len(results) >= limit:
+                    break
+        return results, facets
+
+    async def check_consistency(self):
+        """Compare the view with Firestore and repair drift.
+
+        Every available book is read in full and compared by fingerprint, so a change
+        to any field the catalog serves (status, quantity, donor fields, search text)
+        is caught, not only visibility_score. Reads cost the same per document either
+        way; differing books are replaced with the copy just read.
+        """
+        started = time.time()
+        docs = db.collection("books")\
+                 .where(filter=FieldFilter("available", "==", True))\
+                 .stream()
+        remote = {doc.id: doc.to_dict() async for doc in docs}
+
+        missing = [book_id for book_id in remote if book_id not in self._books]
+        extra = [book_id for book_id in self._books if book_id not in remote]
+        mismatched = [
+            book_id for book_id, book in remote.items()
+            if book_id in self._books and _fingerprint({**book, "id": book_id}) != _fingerprint(self._books[book_id])
+        ]
+
+        for book_id in extra:
+            self.remove(book_id)
+        for book_id in missing + mismatched:
+            self.upsert(book_id, remote[book_id])
+
+        drift = len(missing) + len(extra) + len(mismatched)
+        self.repairs += drift
+        self.last_check = {
+            "at": started,
+            "duration_ms": round((time.time() - started) * 1000, 1),
+            "missing": len(missing),
+            "extra": len(extra),
+            "mismatched": len(mismatched),
+        }
+        if drift:
+            print(f"Book catalog drift repaired: {self.last_check}")
+        return self.last_check
+
+    async def run_consistency_checks(self):
+        while True:
+            await asyncio.sleep(settings.BOOK_CATALOG_CHECK_INTERVAL)
+            if not self.loaded:
+                continue
+            try:
+                await self.check_consistency()
+            except Exception as e:
+                print(f"Book catalog consistency check failed: {e}")
+
+    def stats(self):
+        now = time.time()
+
+        def age(ts):
+            return round(now - ts, 1) if ts else None
+
+        return {
+            "loaded": self.loaded,
+            "books": len(self._books),
+            "columns": self._columns.stats(),
+            "changes": self.changes,
+            "watching": self._watch is not None,
+            "age_seconds": age(self.loaded_at),
+            "seconds_since_change": age(self.last_change_at),
+            "seconds_since_watch_event": age(self.last_watch_event_at),
+            "watch_lag_seconds": self.watch_lag_seconds,
+            "seconds_since_check": age(self.last_check["at"]) if self.last_check else None,
+            "last_check": self.last_check,
+            "repairs": self.repairs,
+        }
+
+
+book_catalog = BookCatalog()
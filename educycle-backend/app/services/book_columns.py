@@ -0,0 +1,149 @@
+import numpy as np
+
+# Fields the search sidebar filters on; each becomes a dictionary-encoded column
+FACET_FIELDS = ("city", "area", "subject", "class_level", "board", "condition", "is_set")
+
+_MISSING = -1
+_INITIAL_CAPACITY = 1024
+
+
+def _facet_key(value):
+    # JSON object keys are strings; booleans use the same "true"/"false" the search params take
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class BookColumns:
+    """Columnar, dictionary-encoded copy of the catalog for vectorized filtering.
+
+    Every book owns a slot; slots of removed books are reused. Each facet field is an
+    int32 array of codes into that field's value list (-1 when the book lacks the
+    field), so a filter is one array comparison and facet counts are one bincount.
+    Book ids live in a NumPy unicode array, which lets matches be ordered by
+    (visibility_score desc, id) with a single lexsort.
+    """
+
+    def __init__(self, fields: tuple = FACET_FIELDS):
+        self.fields = fields
+        self._columns = fields + ("donor_uid",)  # donor_uid is encoded for own/blocked exclusion
+        self._slot_of = {}  # book id -> slot
+        self._free = []
+        self._size = 0  # slots handed out so far; arrays beyond this are unused
+        self._vocab = {field: {} for field in self._columns}  # value -> code
+        self._values = {field: [] for field in self._columns}  # code -> value
+        self._live = np.zeros(0, dtype=bool)
+        self._score = np.zeros(0)
+        self._ids = np.zeros(0, dtype="<U20")
+        self._codes = {field: np.zeros(0, dtype=np.int32) for field in self._columns}
+        self._resize(_INITIAL_CAPACITY, id_width=20)
+
+    def _resize(self, capacity: int, id_width: int):
+        def grow(old, fill, dtype):
+            new = np.full(capacity, fill, dtype=dtype)
+            new[:len(old)] = old
+            return new
+
+        self._live = grow(self._live, False, bool)
+        self._score = grow(self._score, 0.0, np.float64)
+        self._ids = grow(self._ids, "", f"<U{id_width}")
+        self._codes = {field: grow(codes, _MISSING, np.int32) for field, codes in self._codes.items()}
+        self._id_width = id_width
+
+    def _encode(self, field: str, value):
+        if value is None or isinstance(value, (list, dict)):
+            return _MISSING
+        vocab = self._vocab[field]
+        code = vocab.get(value)
+        if code is None:
+            code = vocab[value] = len(self._values[field])
+            self._values[field].append(value)
+        return code
+
+    def set(self, book_id: str, book: dict):
+        slot = self._slot_of.get(book_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = self._size
+                self._size += 1
+            self._slot_of[book_id] = slot
+
+        capacity = len(self._live) * 2 if slot >= len(self._live) else len(self._live)
+        id_width = max(self._id_width, len(book_id))
+        if capacity != len(self._live) or id_width != self._id_width:
+            self._resize(capacity, id_width)
+
+        self._live[slot] = True
+        self._score[slot] = book.get("visibility_score") or 0.0
+        self._ids[slot] = book_id
+        for field in self._columns:
+            self._codes[field][slot] = self._encode(field, book.get(field))
+
+    def delete(self, book_id: str):
+        slot = self._slot_of.pop(book_id, None)
+        if slot is not None:
+            self._live[slot] = False
+            self._free.append(slot)
+
+    def _field_mask(self, field: str, value):
+        code = self._vocab[field].get(value) if not isinstance(value, (list, dict)) else None
+        if code is None:
+            return np.zeros(self._size, dtype=bool)
+        return self._codes[field][:self._size] == code
+
+    def _facet_counts(self, field: str, mask):
+        """{value: number of masked books with it} for one facet field."""
+        values = self._values[field]
+        # Shift codes by one so "missing" (-1) lands in bin 0 and is dropped
+        bins = np.bincount(self._codes[field][:self._size][mask] + 1, minlength=len(values) + 1)[1:]
+        return {_facet_key(values[code]): int(bins[code]) for code in np.flatnonzero(bins)}
+
+    def match(self, equality: dict, exclude_uids=(), min_score: float | None = None,
+              after: tuple | None = None, with_facets: bool = False):
+        """Book ids matching every facet filter, in (visibility_score desc, id) order.
+
+        `equality` holds facet field -> value; callers apply any non-facet filters to
+        the returned ids. With `with_facets`, also returns per-field value counts where
+        each field's counts ignore that field's own filter (so the sidebar can offer
+        alternatives) but honour all the others.
+        """
+        n = self._size
+        base = self._live[:n].copy()
+        if min_score is not None:
+            base &= self._score[:n] >= min_score
+        donor_codes = [self._vocab["donor_uid"][uid] for uid in exclude_uids if uid in self._vocab["donor_uid"]]
+        if donor_codes:
+            base &= ~np.isin(self._codes["donor_uid"][:n], donor_codes)
+
+        field_masks = {field: self._field_mask(field, value) for field, value in equality.items()}
+        mask = base.copy()
+        for field_mask in field_masks.values():
+            mask &= field_mask
+
+        facets = None
+        if with_facets:
+            facets = {}
+            for field in self.fields:
+                facet_mask = base.copy()
+                for other, field_mask in field_masks.items():
+                    if other != field:
+                        facet_mask &= field_mask
+                facets[field] = self._facet_counts(field, facet_mask)
+
+        if after is not None:
+            after_score, after_id = after
+            score = self._score[:n]
+            mask &= (score < after_score) | ((score == after_score) & (self._ids[:n] > after_id))
+
+        slots = np.flatnonzero(mask)
+        order = np.lexsort((self._ids[slots], -self._score[slots]))
+        return self._ids[slots[order]].tolist(), facets
+
+    def stats(self):
+        return {
+            "rows": len(self._slot_of),
+            "capacity": len(self._live),
+            "distinct_values": {field: len(self._values[field]) for field in self.fields},
+        }
@@ -1,7 +1,50 @@
+import base64
+import binascii
+import json
 from datetime import datetime
-from app.db.firestore import db, get_user_display_info
+from app.db.firestore import db, get_user_by_uid, get_user_display_info
 from google.cloud.firestore_v1.base_query import FieldFilter
+from firebase_admin import firestore
 from app.services.credits_service import add_edu_credits
+from app.db.bulk import bulk_update
+from app.db.query_planner import QueryPlan, QueryPlanner
+from app.services.book_catalog import book_catalog
+from app.services.book_columns import FACET_FIELDS
+from app.services.search_index import TextIndex, book_index
+
+# Firestore caps a write batch at 500 operations
+BOOK_BATCH_SIZE = 500
+
+
+def donor_visibility_fields(donor: dict | None):
+    """Donor standing copied onto each of their books so search can filter and sort on it."""
+    donor = donor or {}
+    reputation = donor.get("reputation", 5.0)
+    mismatch_count = donor.get("mismatch_count", 0)
+    return {
+        "donor_reputation": reputation,
+        "visibility_score": reputation - (mismatch_count * 0.5),
+    }
+
+
+async def refresh_donor_visibility(uid: str, donor: dict | None):
+    """Rewrite the denormalized donor fields on every available book of this donor."""
+    fields = donor_visibility_fields(donor)
+    docs = db.collection("books")\
+             .where(filter=FieldFilter("donor_uid", "==", uid))\
+             .where(filter=FieldFilter("available", "==", True))\
+             .stream()
+    refs = [doc.reference async for doc in docs]
+
+    def patch_catalog(chunk):
+        # Only books whose batch committed; the rest keep matching Firestore
+        for ref, _ in chunk:
+            book_catalog.patch(ref.id, fields)
+
+    counts = await bulk_update([(ref, fields) for ref in refs], on_commit=patch_catalog)
+    if counts["failed"]:
+        print(f"Donor visibility refresh for {uid} left {counts['failed']} of {len(refs)} books unchanged")
+    return counts["updated"]
 
 
 async def donate_book(uid: str, payload: dict, image_urls: list[str]):
@@ -13,93 +56,266 @@ async def donate_book(uid: str, payload: dict, image_urls: list[str]):
         **payload,
         "donor_uid": uid,
         "donor_name": user_info["name"],
+        **donor_visibility_fields(await get_user_by_uid(uid)),
         "image_urls": image_urls,
         "status": "available",
         "available": True,
         "created_at": datetime.utcnow(),
     }
 
-    ref.set(data)
+    await ref.set(data)
+    book_catalog.upsert(ref.id, data)
     
     # Award credits immediately upon listing
     is_set = payload.get("is_set", False)
     points = 200 if is_set else 50
     reason = f"Listed {'a book set' if is_set else 'a book'} for donation: {payload.get('title', 'Unknown')}"
-    await add_edu_credits(uid, points, reason)
+    await add_edu_credits(uid, points, reason, idempotency_key=f"book-listed-{ref.id}")
 
     return ref.id
 
 
 async def update_book_status(book_id: str, status: str):
     available = (status == "available")
-    db.collection("books").document(book_id).update({
+    updates = {
         "status": status,
         "available": available
-    })
+    }
+    doc = None
+    if available:
+        # Reputation fan-out skips unavailable books, so refresh the copy when one is relisted
+        doc = await db.collection("books").document(book_id).get()
+        if doc.exists:
+            updates.update(donor_visibility_fields(await get_user_by_uid(doc.get("donor_uid"))))
+    await db.collection("books").document(book_id).update(updates)
+
+    if doc is not None and doc.exists:
+        book_catalog.upsert(book_id, {**doc.to_dict(), **updates})
+    elif not available:
+        book_catalog.remove(book_id)
+
+
+# Query parameters that control paging or debugging rather than filtering books
+SEARCH_CONTROL_PARAMS = ("page_size", "cursor", "explain")
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+# Books from donors scoring below this are hidden from search
+MIN_VISIBILITY_SCORE = 1.0
+
+
+class InvalidSearchCursor(ValueError):
+    pass
 
 
-async def search_books(filters: dict, exclude_uid: str = None, blocked_uids: list[str] = None):
+def encode_search_cursor(score: float, book_id: str) -> str:
+    """Opaque cursor for the position right after (score, book_id) in search order."""
+    raw = json.dumps([score, book_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str):
+    """(score, book_id) from a cursor made by encode_search_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, book_id = json.loads(raw)
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not isinstance(book_id, str):
+            raise ValueError
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidSearchCursor("Invalid search cursor")
+    return float(score), book_id
+
+
+# Search order: visibility score, ties broken by document id
+book_query_planner = QueryPlanner(
+    "books", FACET_FIELDS, fixed_equality=("available",),
+    order=(("visibility_score", firestore.Query.DESCENDING), ("__name__", firestore.Query.ASCENDING)),
+)
+
+
+def _search_query(plan: QueryPlan):
     query = db.collection("books").where(filter=FieldFilter("available", "==", True))
 
-    for key, value in filters.items():
-        if value:
-            # Handle boolean strings from frontend
-            if value.lower() == 'true':
-                query = query.where(filter=FieldFilter(key, "==", True))
-            elif value.lower() == 'false':
-                query = query.where(filter=FieldFilter(key, "==", False))
-            else:
-                query = query.where(filter=FieldFilter(key, "==", value))
-
-    docs = query.stream()
-    results = []
-    user_cache = {}
+    # Only filters the planner matched to a declared composite index go to Firestore
+    for key, value in plan.pushed.items():
+        query = query.where(filter=FieldFilter(key, "==", value))
+
+    # Visibility comes from the donor fields stored on each book, so filtering and
+    # ordering happen in Firestore without reading any donor profile.
+    # Hide if extremely poor reputation; ties are broken by document id, ascending.
+    # Firestore's implicit __name__ order would follow visibility_score (descending),
+    # so every books index in firestore.indexes.json ends with __name__ ASCENDING.
+    query = query.where(filter=FieldFilter("visibility_score", ">=", MIN_VISIBILITY_SCORE))
+    for field, direction in book_query_planner.order:
+        query = query.order_by(field, direction=direction)
+    return query
+
+
+def _is_excluded(donor_uid: str, exclude_uid: str | None, blocked_uids: list[str]):
+    # Own books and books from blocked donors never show up in search
+    return (exclude_uid and donor_uid == exclude_uid) or (donor_uid in blocked_uids)
+
+
+def _equality_filters(filters: dict):
+    """Query params as field -> value; "true"/"false" match booleans.
+
+    Raises UnknownFilterField for params that are not searchable book fields.
+    """
+    book_query_planner.validate(filters)
+    return {key: {"true": True, "false": False}.get(value.lower(), value)
+            for key, value in filters.items() if value}
+
+
+def _excluded_donors(exclude_uid: str | None, blocked_uids: list[str]):
+    return [exclude_uid, *blocked_uids] if exclude_uid else list(blocked_uids)
+
+
+def _book_filter(equality: dict, exclude_uid: str | None, blocked_uids: list[str]):
+    """In-memory equality filters plus own/blocked exclusion."""
+    blocked = set(blocked_uids)
+
+    def keep(book):
+        if _is_excluded(book.get("donor_uid"), exclude_uid, blocked):
+            return False
+        return all(book.get(key) == expected for key, expected in equality.items())
+    return keep
+
+
+def _explain_memory(explain: dict | None, source: str, returned: int):
+    if explain is not None:
+        explain.update(source=source, documents_scanned=0, returned=returned)
+
+
+async def _firestore_search(equality: dict, exclude_uid: str | None, blocked_uids: list[str],
+                            after: tuple | None = None, chunk_size: int | None = None,
+                            explain: dict | None = None):
+    """Matching books from Firestore, in search order, following the query plan.
+
+    Pushed filters run in Firestore and the rest, with own/blocked exclusion, on the
+    streamed documents. With `chunk_size`, documents are read in chunks (doubling up
+    to BOOK_BATCH_SIZE) only as the caller keeps consuming.
+    """
+    plan = book_query_planner.plan(equality)
+    keep = _book_filter(plan.residual, exclude_uid, blocked_uids)
+    if explain is not None:
+        explain.update(source="firestore", **plan.explain(), documents_scanned=0)
+
+    query = _search_query(plan)
+    if after:
+        query = query.start_after({"visibility_score": after[0], "__name__": after[1]})
+
+    while True:
+        fetched = 0
+        last = None
+        async for doc in (query.limit(chunk_size) if chunk_size else query).stream():
+            fetched += 1
+            last = doc
+            if explain is not None:
+                explain["documents_scanned"] += 1
+            item = doc.to_dict()
+            if keep(item):
+                item["id"] = doc.id
+                yield item
+        if not chunk_size or fetched < chunk_size:
+            return
+        query = query.start_after({"visibility_score": last.get("visibility_score"), "__name__": last.id})
+        chunk_size = min(chunk_size * 2, BOOK_BATCH_SIZE)
+
+
+async def search_books_page(filters: dict, exclude_uid: str = None, blocked_uids: list[str] = None,
+                            page_size: int = DEFAULT_SEARCH_PAGE_SIZE, cursor: str | None = None,
+                            explain: dict | None = None):
+    """One page of search results plus the cursor for the next page (None on the last page).
+
+    Results are ordered by visibility score descending, then book id, so a cursor
+    holding the last (score, id) seen resumes exactly where the page ended. Served
+    from the in-memory catalog once loaded, with facet counts for the filter sidebar
+    computed in the same pass. Before that, Firestore is read in chunks until the page
+    is full and `facets` is None.
+    """
+    page_size = max(1, min(page_size, MAX_SEARCH_PAGE_SIZE))
+    equality = _equality_filters(filters)
     blocked_uids = blocked_uids or []
+    after = decode_search_cursor(cursor) if cursor else None
+
+    if book_catalog.loaded:
+        items, facets = book_catalog.query(equality, _excluded_donors(exclude_uid, blocked_uids),
+                                           min_score=MIN_VISIBILITY_SCORE, after=after, limit=page_size + 1,
+                                           with_facets=True)
+        _explain_memory(explain, "catalog", min(len(items), page_size))
+        return {**_page(items, page_size), "facets": facets}
+
+    items = []
+    results = _firestore_search(equality, exclude_uid, blocked_uids, after=after,
+                                chunk_size=page_size + 1, explain=explain)
+    async for item in results:
+        items.append(item)
+        if len(items) > page_size:
+            break
+    await results.aclose()
+
+    page = _page(items, page_size)
+    if explain is not None:
+        explain["returned"] = len(page["items"])
+    return {**page, "facets": None}
+
+
+def _page(items: list, page_size: int):
+    """Page response from up to page_size + 1 books in search order."""
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_search_cursor(items[-1]["visibility_score"], items[-1]["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def search_books_text(q: str, filters: dict, exclude_uid: str = None, blocked_uids: list[str] = None,
+                            page_size: int = DEFAULT_SEARCH_PAGE_SIZE, cursor: str | None = None,
+                            explain: dict | None = None):
+    """Full-text search over title, subject, board, class_level and description.
+
+    Answers from the in-process index, best BM25 match first; remaining query params
+    still act as equality filters. Until the index has loaded at startup, the
+    filtered books are read from Firestore and indexed for this one query.
+    Returns a page dict like search_books_page, without facets.
+    """
+    equality = _equality_filters(filters)
+    blocked_uids = blocked_uids or []
+    matches_filters = _book_filter(equality, exclude_uid, blocked_uids)
+
+    def keep(book):
+        return book.get("visibility_score", 0) >= MIN_VISIBILITY_SCORE and matches_filters(book)
+
+    index = book_index
+    if not index.loaded:
+        index = TextIndex("books")
+        async for item in _firestore_search(equality, exclude_uid, blocked_uids, explain=explain):
+            index.upsert(item["id"], item)
+
+    # Rounded relevance is what clients (and cursors) see, so order by exactly that
+    hits = [(round(score, 4), book) for score, book in index.search(q, predicate=keep)]
+    hits.sort(key=lambda hit: (-hit[0], hit[1]["id"]))
+    if index is book_index:
+        _explain_memory(explain, "search_index", len(hits))
+    elif explain is not None:
+        explain["returned"] = len(hits)
+
+    page_size = max(1, min(page_size, MAX_SEARCH_PAGE_SIZE))
+    if cursor:
+        after_score, after_id = decode_search_cursor(cursor)
+        hits = [(score, book) for score, book in hits
+                if (-score, book["id"]) > (-after_score, after_id)]
 
-    for doc in docs:
-        item = doc.to_dict()
-        donor_uid = item.get("donor_uid")
-        
-        # Filter out own books or blocked donors
-        if (exclude_uid and donor_uid == exclude_uid) or (donor_uid in blocked_uids):
-            continue
-            
-        if donor_uid not in user_cache:
-            user_doc = db.collection("users").document(donor_uid).get()
-            if user_doc.exists:
-                user_data = user_doc.to_dict()
-                user_cache[donor_uid] = {
-                    "name": user_data.get("organization_name") or user_data.get("display_name") or "Anonymous",
-                    "reputation": user_data.get("reputation", 5.0),
-                    "mismatch_count": user_data.get("mismatch_count", 0)
-                }
-            else:
-                user_cache[donor_uid] = {"name": "Unknown", "reputation": 5.0, "mismatch_count": 0}
-
-        donor_info = user_cache[donor_uid]
-        
-        # Visibility logic
-        item["id"] = doc.id
-        item["donor_name"] = donor_info["name"]
-        item["donor_reputation"] = donor_info["reputation"]
-        
-        visibility_score = donor_info["reputation"] - (donor_info["mismatch_count"] * 0.5)
-        item["visibility_score"] = visibility_score
-        
-        # Hide if extremely poor reputation (unless specifically allowed/different for NGOs)
-        if visibility_score < 1.0:
-            continue
-            
-        results.append(item)
-
-    # Sort results by visibility score descending
-    results.sort(key=lambda x: x.get("visibility_score", 5.0), reverse=True)
-
-    return results
+    items = [{**book, "relevance": score} for score, book in hits[:page_size]]
+    next_cursor = None
+    if len(hits) > page_size:
+        next_cursor = encode_search_cursor(items[-1]["relevance"], items[-1]["id"])
+    if explain is not None:
+        explain["returned"] = len(items)
+    return {"items": items, "next_cursor": next_cursor}
 
 
 async def get_book(book_id: str):
-    doc = db.collection("books").document(book_id).get()
+    doc = await db.collection("books").document(book_id).get()
     if doc.exists:
         item = {**doc.to_dict(), "id": doc.id}
         if "donor_name" not in item:
@@ -110,17 +326,18 @@ async def get_book(book_id: str):
 
 
 async def mark_book_unavailable(book_id: str):
-    db.collection("books").document(book_id).update({"available": False})
+    await db.collection("books").document(book_id).update({"available": False})
+    book_catalog.remove(book_id)
 
 
 async def get_my_books(uid: str):
     docs = db.collection("books").where(filter=FieldFilter("donor_uid", "==", uid)).stream()
-    return [{**doc.to_dict(), "id": doc.id} for doc in docs]
+    return [{**doc.to_dict(), "id": doc.id} async for doc in docs]
 
 
 async def delete_book(book_id: str, uid: str):
     ref = db.collection("books").document(book_id)
-    doc = ref.get()
+    doc = await ref.get()
 
     if not doc.exists:
         return False
@@ -128,5 +345,6 @@ async def delete_book(book_id: str, uid: str):
     if doc.to_dict().get("donor_uid") != uid:
         return False
 
-    ref.delete()
+    await ref.delete()
+    book_catalog.remove(book_id)
     return True
@@ -1,96 +1,158 @@
 from datetime import datetime
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from app.core.config import settings
+from app.db.cache import TTLCache
 from app.db.firestore import db
+from app.services.notification_service import notification_outbox
+from app.services.realtime import realtime_hub
+
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+# Chat documents by id. Membership never changes and the title is set once; writes
+# made here update or drop the entry, and the TTL bounds staleness otherwise.
+chat_cache = TTLCache(maxsize=settings.CHAT_CACHE_SIZE, ttl=settings.CHAT_CACHE_TTL)
+
+
+class InvalidMessageCursor(ValueError):
+    pass
 
 
 async def create_chat(request_id: str, users: list[str], book_title: str = "Book Chat"):
     ref = db.collection("chats").document(request_id)
-
-    ref.set({
+    chat = {
         "request_id": request_id,
         "users": users,
         "book_title": book_title,
         "active": True,
         "created_at": datetime.utcnow(),
-    })
+    }
+    await ref.set(chat)
+    chat_cache.set(request_id, {**chat, "id": request_id})
+
+
+async def _legacy_chat_title(chat_id: str):
+    """Title of the book behind a chat created before chats stored `book_title`.
+
+    Reads the request and book documents directly; backfill_chat_titles.py stores the
+    result on every legacy chat, so this only runs for chats it hasn't reached.
+    """
+    req = await db.collection("requests").document(chat_id).get()
+    book_id = req.to_dict().get("book_id") if req.exists else None
+    if not book_id:
+        return None
+    book = await db.collection("books").document(book_id).get()
+    return book.to_dict().get("title") if book.exists else None
 
 
 async def send_message(chat_id: str, sender_uid: str, message: str):
     # Add message
-    msg_ref = db.collection("messages").add({
+    message_data = {
         "chat_id": chat_id,
         "sender_uid": sender_uid,
         "message": message,
         "timestamp": datetime.utcnow(),
-    })
+    }
+    _, msg_ref = await db.collection("messages").add(message_data)
 
     try:
-        # Create notification for the other user(s)
+        # Membership and title come from the chat cache, so a send normally costs one write
         chat = await get_chat(chat_id)
         if chat and "users" in chat:
+            # Push to every participant's open sockets, the sender's other tabs included
+            realtime_hub.publish(chat["users"], "message", {**message_data, "id": msg_ref.id})
+
             # Fallback for older chats that don't have book_title
             title = chat.get("book_title")
             if not title:
                 try:
-                    from app.services.request_service import get_request
-                    from app.services.book_service import get_book
-                    req = await get_request(chat_id)
-                    if req:
-                        book = await get_book(req.get("book_id"))
-                        if book:
-                            title = book.get("title")
-                            # Update chat doc for next time
-                            if title:
-                                db.collection("chats").document(chat_id).update({"book_title": title})
+                    title = await _legacy_chat_title(chat_id)
+                    if title:
+                        # Update chat doc for next time
+                        await db.collection("chats").document(chat_id).update({"book_title": title})
+                        chat_cache.set(chat_id, {**chat, "book_title": title})
                 except Exception as e:
                     print(f"Error fetching title for legacy chat: {e}")
-            
+
             if not title:
                 title = "Book Chat" # Generic fallback instead of ID
 
+            # Written by the outbox; a burst of messages becomes one "N new messages" notification
             for user_uid in chat["users"]:
                 if user_uid != sender_uid:
-                    # Create notification
-                    db.collection("notifications").add({
+                    notification_outbox.enqueue({
                         "user_uid": user_uid,
                         "type": "chat",
                         "related_id": chat_id,
                         "message": f"New message in {title}",
                         "read": False,
                         "timestamp": datetime.utcnow()
-                    })
+                    }, summary={"message": "{count} new messages in " + title})
     except Exception as e:
         print(f"Error creating notification: {e}")
 
 
 async def get_chat(chat_id: str):
-    doc = db.collection("chats").document(chat_id).get()
+    cached = chat_cache.get(chat_id)
+    if cached is not None:
+        return dict(cached)
+
+    doc = await db.collection("chats").document(chat_id).get()
     if doc.exists:
-        return {**doc.to_dict(), "id": doc.id}
+        chat = {**doc.to_dict(), "id": doc.id}
+        chat_cache.set(chat_id, chat)
+        return dict(chat)
     return None
 
 
-async def get_chat_messages(chat_id: str):
-    """Get all messages for a chat"""
-    try:
-        # Remove order_by to avoid index requirement, sort in memory instead
-        docs = db.collection("messages").where("chat_id", "==", chat_id).stream()
-        results = []
-        for doc in docs:
-            data = doc.to_dict()
-            # Ensure timestamp is converted to ISO string for JSON serialization if it's a datetime
-            timestamp = data.get("timestamp")
-            if isinstance(timestamp, datetime):
-                data["timestamp"] = timestamp.isoformat()
-            
-            results.append({**data, "id": doc.id})
-        
-        # Sort by timestamp
-        results.sort(key=lambda x: x.get("timestamp", ""))
-        return results
-    except Exception as e:
-        print(f"Error getting messages: {e}")
-        return []
+def _serialize_message(doc):
+    data = doc.to_dict()
+    # Ensure timestamp is converted to ISO string for JSON serialization if it's a datetime
+    timestamp = data.get("timestamp")
+    if isinstance(timestamp, datetime):
+        data["timestamp"] = timestamp.isoformat()
+    return {**data, "id": doc.id}
+
+
+async def _message_cursor(chat_id: str, message_id: str):
+    doc = await db.collection("messages").document(message_id).get()
+    if not doc.exists or doc.get("chat_id") != chat_id:
+        raise InvalidMessageCursor(f"Unknown message {message_id!r} for this chat")
+    return doc
+
+
+async def get_chat_messages(chat_id: str, since: str | None = None, before: str | None = None,
+                            page_size: int = DEFAULT_MESSAGE_PAGE_SIZE):
+    """Messages of a chat, oldest first, at most `page_size` of them.
+
+    With no cursor, returns the newest messages. `since` (a message id) returns the
+    messages after it, for polling; `before` returns the page preceding it, for
+    scrolling back. Served by the (chat_id, timestamp) composite indexes.
+    """
+    if since and before:
+        raise InvalidMessageCursor("Pass either since or before, not both")
+    page_size = max(1, min(page_size, MAX_MESSAGE_PAGE_SIZE))
+    cursor = await _message_cursor(chat_id, since or before) if (since or before) else None
+
+    query = db.collection("messages").where(filter=FieldFilter("chat_id", "==", chat_id))
+    if since:
+        query = query.order_by("timestamp").order_by("__name__").start_after(cursor)
+    else:
+        # Newest first so the limit keeps the latest page; flipped back below
+        query = query.order_by("timestamp", direction=firestore.Query.DESCENDING)\
+                     .order_by("__name__", direction=firestore.Query.DESCENDING)
+        if cursor is not None:
+            query = query.start_after(cursor)
+
+    results = [_serialize_message(doc) async for doc in query.limit(page_size).stream()]
+    if not since:
+        results.reverse()
+    return results
 
 
 async def close_chat(chat_id: str):
-    db.collection("chats").document(chat_id).update({"active": False})
+    await db.collection("chats").document(chat_id).update({"active": False})
+    chat_cache.invalidate(chat_id)
@@ -1,46 +1,216 @@
-from app.db.firestore import db
+import asyncio
+import random
+import time
+import uuid
 from datetime import datetime
+
+from google.api_core import exceptions as gexc
+from google.cloud.firestore_v1 import Increment
 from google.cloud.firestore_v1.base_query import FieldFilter
 
-async def add_edu_credits(uid: str, amount: int, reason: str):
-    """Add EduCredits to a user and log the transaction"""
-    user_ref = db.collection("users").document(uid)
-    doc = user_ref.get()
-    
-    if not doc.exists:
-        return False
-        
-    current_credits = doc.to_dict().get("edu_credits", 0)
-    new_credits = current_credits + amount
-    
-    user_ref.update({
-        "edu_credits": new_credits,
-        "last_credit_update": datetime.utcnow()
-    })
-    
-    # Log transaction
-    db.collection("credit_transactions").add({
-        "user_uid": uid,
-        "amount": amount,
-        "reason": reason,
-        "timestamp": datetime.utcnow()
-    })
-    
-    return True
-
-async def get_leaderboard(limit: int = 10):
-    """Get top users by EduCredits"""
-    # Only get students for the leaderboard
-    docs = db.collection("users")\
-             .where(filter=FieldFilter("role", "==", "student"))\
-             .order_by("edu_credits", direction="DESCENDING")\
-             .limit(limit)\
-             .stream()
+from app.core.config import settings
+from app.db.cache import TTLCache
+from app.db.firestore import db, get_user_by_uid, invalidate_user
+from app.services.leaderboard import leaderboard
+
+
+class CreditLedger:
+    """Applies EduCredit grants atomically and exactly once.
+
+    Each grant is one batch: the credit_transactions/{uid}:{idempotency_key} entry,
+    created (so a retried grant fails as a whole instead of crediting twice; keys are
+    scoped to the user, so reusing one for someone else still credits them), plus an
+    Increment of the balance. A user credited more than `hot_rate` times within a
+    second is treated as hot for HOT_FOR seconds: their increments go to one of
+    `shard_count` credit_shards/{uid}-{n} documents instead of the users doc, which
+    Firestore can only update about once a second. A background roll-up folds
+    shard values back into users.edu_credits with paired Increments, so it never
+    races with grants in flight; get_edu_credits() adds unrolled shards for an
+    exact balance. Those per-user shard totals are cached, and dropped whenever this
+    process grants to a shard or rolls one up, so a balance read queries the shards
+    only on a miss.
+    """
+
+    HOT_FOR = 60
+
+    def __init__(self, shard_count: int, hot_rate: int):
+        self.shard_count = shard_count
+        self.hot_rate = hot_rate
+        self._recent = {}  # uid -> (second, grants within it)
+        self._hot_until = {}  # uid -> monotonic time until which grants go to shards
+        self.shard_totals = TTLCache(maxsize=settings.CREDIT_SHARD_CACHE_SIZE, ttl=settings.CREDIT_SHARD_CACHE_TTL)
+        self._shard_writes = 0  # bumped on every shard change made here
+        self.stats_counters = {"credited": 0, "duplicates": 0, "sharded": 0, "rollups": 0, "rolled_up_shards": 0}
+
+    def _is_hot(self, uid: str):
+        now = time.monotonic()
+        second = int(now)
+        start, grants = self._recent.get(uid, (second, 0))
+        grants = grants + 1 if start == second else 1
+        self._recent[uid] = (second, grants)
+        if grants > self.hot_rate:
+            self._hot_until[uid] = now + self.HOT_FOR
+        return self._hot_until.get(uid, 0) > now
+
+    async def credit(self, uid: str, amount: int, reason: str, idempotency_key: str | None = None):
+        key = idempotency_key or uuid.uuid4().hex
+        now = datetime.utcnow()
+        batch = db.batch()
+        batch.create(db.collection("credit_transactions").document(f"{uid}:{key}"), {
+            "user_uid": uid,
+            "idempotency_key": key,
+            "amount": amount,
+            "reason": reason,
+            "timestamp": now,
+        })
+
+        sharded = self._is_hot(uid)
+        if sharded:
+            # Shard writes don't fail for a missing user, so check first (usually a cache hit)
+            if not await get_user_by_uid(uid):
+                return False
+            shard = db.collection("credit_shards").document(f"{uid}-{random.randrange(self.shard_count)}")
+            batch.set(shard, {"user_uid": uid, "edu_credits": Increment(amount)}, merge=True)
+        else:
+            batch.update(db.collection("users").document(uid), {
+                "edu_credits": Increment(amount),
+                "last_credit_update": now,
+            })
+
+        try:
+            await batch.commit()
+        except gexc.AlreadyExists:
+            # This grant was already applied (a retry); nothing was written this time
+            self.stats_counters["duplicates"] += 1
+            return True
+        except gexc.NotFound:
+            return False
+
+        self.stats_counters["credited"] += 1
+        if sharded:
+            self.stats_counters["sharded"] += 1
+            self._shard_changed(uid)
+        else:
+            invalidate_user(uid)
+        await self._update_leaderboard(f"{uid}:{key}", uid, amount)
+        return True
+
+    async def _update_leaderboard(self, ledger_id: str, uid: str, amount: int):
+        # Keyed by ledger entry, so the listener delivering the same grant doesn't count it again
+        if not leaderboard.loaded or leaderboard.apply_grant(ledger_id, uid, amount):
+            return
+        # Not on the board yet (e.g. a student who signed up after it loaded)
+        profile = await get_user_by_uid(uid)
+        if profile and profile.get("role") == "student":
+            leaderboard.upsert(uid, profile, await get_edu_credits(uid))
+
+    def _shard_changed(self, uid: str):
+        self._shard_writes += 1
+        self.shard_totals.invalidate(uid)
+
+    async def shard_total(self, uid: str):
+        cached = self.shard_totals.get(uid)
+        if cached is not None:
+            return cached
+        writes = self._shard_writes
+        docs = db.collection("credit_shards").where(filter=FieldFilter("user_uid", "==", uid)).stream()
+        total = sum([(doc.to_dict().get("edu_credits") or 0) async for doc in docs])
+        # A shard written while the query ran may be missing from it; don't cache that
+        if self._shard_writes == writes:
+            self.shard_totals.set(uid, total)
+        return total
+
+    async def roll_up_shards(self):
+        """Move credits accumulated in shards onto users.edu_credits."""
+        docs = db.collection("credit_shards").where(filter=FieldFilter("edu_credits", "!=", 0)).stream()
+        pending = {}  # uid -> [(shard ref, value)]
+        async for doc in docs:
+            data = doc.to_dict()
+            pending.setdefault(data["user_uid"], []).append((doc.reference, data["edu_credits"]))
+
+        for uid, shards in pending.items():
+            # Subtract exactly what is moved, so grants landing meanwhile stay in their shard
+            batch = db.batch()
+            batch.update(db.collection("users").document(uid), {
+                "edu_credits": Increment(sum(value for _, value in shards)),
+                "last_credit_update": datetime.utcnow(),
+            })
+            for ref, value in shards:
+                batch.update(ref, {"edu_credits": Increment(-value)})
+            try:
+                await batch.commit()
+            except Exception as e:
+                print(f"Credit shard roll-up failed for {uid}: {e}")
+                continue
+            invalidate_user(uid)
+            self._shard_changed(uid)
+            self.stats_counters["rolled_up_shards"] += len(shards)
+        self.stats_counters["rollups"] += 1
+
+        # Forget rate windows and hot marks that have lapsed
+        now = time.monotonic()
+        self._recent = {uid: v for uid, v in self._recent.items() if v[0] >= int(now) - 1}
+        self._hot_until = {uid: t for uid, t in self._hot_until.items() if t > now}
+
+    async def run_rollups(self):
+        while True:
+            await asyncio.sleep(settings.CREDIT_ROLLUP_INTERVAL)
+            try:
+                await self.roll_up_shards()
+            except Exception as e:
+                print(f"Credit shard roll-up failed: {e}")
+
+    def stats(self):
+        return {
+            **self.stats_counters,
+            "hot_users": sum(1 for t in self._hot_until.values() if t > time.monotonic()),
+            "shard_total_cache": self.shard_totals.stats(),
+        }
+
+
+credit_ledger = CreditLedger(shard_count=settings.CREDIT_SHARD_COUNT, hot_rate=settings.CREDIT_HOT_WRITES_PER_SECOND)
+
+
+async def add_edu_credits(uid: str, amount: int, reason: str, idempotency_key: str | None = None):
+    """Add EduCredits to a user and log the transaction, atomically.
+
+    Pass a key that identifies the grant (e.g. the book it rewards) so a retried
+    call can't credit twice; a key repeated for the same user is a no-op that returns True. Returns
+    False if the user doesn't exist.
+    """
+    return await credit_ledger.credit(uid, amount, reason, idempotency_key)
+
+
+async def get_edu_credits(uid: str):
+    """Exact balance: the users doc plus credits not yet rolled up from shards."""
+    profile = await get_user_by_uid(uid)
+    if not profile:
+        return 0
+    return profile.get("edu_credits", 0) + await credit_ledger.shard_total(uid)
+
+async def get_leaderboard(limit: int = 10, city: str | None = None, area: str | None = None):
+    """Get top users by EduCredits, overall or within a city / city + area"""
+    top = leaderboard.top(limit, city, area) if leaderboard.loaded else None
+    if top is not None:
+        return [
+            {"uid": e["uid"], "name": e["name"], "edu_credits": e["credits"], "area": e["area"], "city": e["city"]}
+            for e in top
+        ]
+
+    # Board not loaded yet, or only a snapshot that can't answer this: query Firestore (role + edu_credits index)
+    query = db.collection("users").where(filter=FieldFilter("role", "==", "student"))
+    if city:
+        query = query.where(filter=FieldFilter("city", "==", city))
+        if area:
+            query = query.where(filter=FieldFilter("area", "==", area))
+    docs = query.order_by("edu_credits", direction="DESCENDING")\
+                .limit(limit)\
+                .stream()
     
-    leaderboard = []
-    for doc in docs:
+    leaderboard_rows = []
+    async for doc in docs:
         data = doc.to_dict()
-        leaderboard.append({
+        leaderboard_rows.append({
             "uid": doc.id,
             "name": data.get("display_name") or data.get("email", "Anonymous"),
             "edu_credits": data.get("edu_credits", 0),
@@ -48,4 +218,28 @@ async def get_leaderboard(limit: int = 10):
             "city": data.get("city", "")
         })
         
-    return leaderboard
+    return leaderboard_rows
+
+
+async def get_rank(uid: str, scope: str = "global"):
+    """The user's rank on the overall, city or area board (ties share a rank)"""
+    profile = await get_user_by_uid(uid)
+    if not profile or profile.get("role") != "student":
+        return None
+    city = profile.get("city") if scope in ("city", "area") else None
+    area = profile.get("area") if scope == "area" else None
+
+    if leaderboard.loaded:
+        ranked = leaderboard.rank(uid, city, area)
+        if ranked is not None:
+            return {"scope": scope, "city": city, "area": area, **ranked}
+
+    # Not on the in-memory board (or only in a snapshot): count the students ahead in Firestore
+    credits = await get_edu_credits(uid)
+    query = db.collection("users").where(filter=FieldFilter("role", "==", "student"))
+    if city:
+        query = query.where(filter=FieldFilter("city", "==", city))
+        if area:
+            query = query.where(filter=FieldFilter("area", "==", area))
+    ahead = await query.where(filter=FieldFilter("edu_credits", ">", credits)).count().get()
+    return {"scope": scope, "city": city, "area": area, "rank": ahead[0][0].value + 1, "total": None, "edu_credits": credits}
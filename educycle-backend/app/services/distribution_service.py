@@ -2,6 +2,7 @@ from app.db.firestore import db
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from google.cloud.firestore_v1 import Increment
+from app.services.notification_service import notification_outbox
 
 class DistributionService:
     @staticmethod
@@ -19,14 +20,14 @@ class DistributionService:
         }
         
         doc_ref = db.collection("distributions").document()
-        doc_ref.set(event_data)
+        await doc_ref.set(event_data)
         return {"id": doc_ref.id, **event_data}
 
     @staticmethod
     async def list_events(limit: int = 20):
         docs = db.collection("distributions").order_by("timestamp", direction="DESCENDING").limit(limit).stream()
         events = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data["id"] = doc.id
             events.append(data)
@@ -35,7 +36,7 @@ class DistributionService:
     @staticmethod
     async def toggle_like(event_id: str, user_uid: str):
         doc_ref = db.collection("distributions").document(event_id)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
         if not doc.exists:
             return None
         
@@ -44,14 +45,14 @@ class DistributionService:
         
         if user_uid in liked_by:
             # Unlike
-            doc_ref.update({
+            await doc_ref.update({
                 "liked_by": [uid for uid in liked_by if uid != user_uid],
                 "likes_count": Increment(-1)
             })
             return {"liked": False}
         else:
             # Like
-            doc_ref.update({
+            await doc_ref.update({
                 "liked_by": liked_by + [user_uid],
                 "likes_count": Increment(1)
             })
@@ -67,15 +68,15 @@ class DistributionService:
         }
         
         event_ref = db.collection("distributions").document(event_id)
-        event_doc = event_ref.get()
+        event_doc = await event_ref.get()
         if not event_doc.exists:
             return None
             
         event_data = event_doc.to_dict()
         ngo_uid = event_data.get("ngo_uid")
         
-        event_ref.collection("comments").add(comment_data)
-        event_ref.update({"comments_count": Increment(1)})
+        await event_ref.collection("comments").add(comment_data)
+        await event_ref.update({"comments_count": Increment(1)})
         
         # Notify NGO if the commenter is not the NGO itself
         if ngo_uid and ngo_uid != user_uid:
@@ -88,7 +89,7 @@ class DistributionService:
                 "read": False,
                 "timestamp": datetime.utcnow()
             }
-            db.collection("notifications").add(notification_data)
+            notification_outbox.enqueue(notification_data, summary={"title": "{count} new comments on your post"})
             
         return comment_data
 
@@ -96,7 +97,7 @@ class DistributionService:
     async def get_comments(event_id: str):
         docs = db.collection("distributions").document(event_id).collection("comments").order_by("timestamp", direction="ASCENDING").stream()
         comments = []
-        for doc in docs:
+        async for doc in docs:
             data = doc.to_dict()
             data["id"] = doc.id
             comments.append(data)
@@ -105,7 +106,7 @@ class DistributionService:
     @staticmethod
     async def delete_event(event_id: str, user_uid: str):
         doc_ref = db.collection("distributions").document(event_id)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
         if not doc.exists:
             return {"error": "not_found", "message": "Event not found"}
         
@@ -113,7 +114,7 @@ class DistributionService:
         if data.get("ngo_uid") != user_uid:
             return {"error": "permission_denied", "message": "You can only delete your own posts"}
             
-        doc_ref.delete()
+        await doc_ref.delete()
         return {"status": "success"}
 
 distribution_service = DistributionService()
@@ -1,3 +1,4 @@
+import os
 import random
 import string
 import logging
@@ -6,6 +7,7 @@ import aiosmtplib
 from email.message import EmailMessage
 from app.db.firestore import db
 from app.core.config import settings
+from app.core.http import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +31,7 @@ async def send_otp_email(email: str):
     log_debug(f"SENDING OTP: email=[{email}], otp=[{otp}]")
     
     # Save to Firestore
-    db.collection("otps").document(email).set({
+    await db.collection("otps").document(email).set({
         "otp": otp,
         "expires_at": expires_at,
         "created_at": datetime.utcnow()
@@ -64,27 +66,25 @@ async def send_otp_email(email: str):
     resend_key = os.getenv("RESEND_API_KEY")
     if resend_key:
         try:
-            import httpx
-            async with httpx.AsyncClient() as client:
-                res = await client.post(
-                    "https://api.resend.com/emails",
-                    headers={
-                        "Authorization": f"Bearer {resend_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "from": f"{settings.EMAILS_FROM_NAME} <onboarding@resend.dev>", # Use their default for testing
-                        "to": [email],
-                        "subject": f"{otp} is your EduCycle verification code",
-                        "html": content,
-                    },
-                    timeout=10.0
-                )
-                if res.status_code in [200, 201]:
-                    logger.info(f"OTP email sent via RESEND API to {email}")
-                    return True
-                else:
-                    logger.error(f"Resend API failed: {res.text}")
+            res = await get_http_client().post(
+                "https://api.resend.com/emails",
+                headers={
+                    "Authorization": f"Bearer {resend_key}",
+                    "Content-Type": "application/json",
+                },
+                json={
+                    "from": f"{settings.EMAILS_FROM_NAME} <onboarding@resend.dev>", # Use their default for testing
+                    "to": [email],
+                    "subject": f"{otp} is your EduCycle verification code",
+                    "html": content,
+                },
+                timeout=10.0
+            )
+            if res.status_code in [200, 201]:
+                logger.info(f"OTP email sent via RESEND API to {email}")
+                return True
+            else:
+                logger.error(f"Resend API failed: {res.text}")
         except Exception as e:
             logger.error(f"Failed to send via Resend API: {e}")
 
@@ -131,7 +131,7 @@ async def verify_otp(email: str, otp: str, delete_on_success: bool = True):
     
     logger.info(f"Verifying OTP for email: [{email}]")
     doc_ref = db.collection("otps").document(email)
-    doc = doc_ref.get()
+    doc = await doc_ref.get()
     
     if not doc.exists:
         log_debug(f"FAILED: doc not found for [{email}]")
@@ -155,7 +155,7 @@ async def verify_otp(email: str, otp: str, delete_on_success: bool = True):
     # Check expiry
     if now > expires_at:
         logger.warning(f"OTP EXPIRED for {email}. Now: {now}, Expires: {expires_at}")
-        doc_ref.delete()
+        await doc_ref.delete()
         return False, "OTP has expired"
     
     # Check match
@@ -164,7 +164,7 @@ async def verify_otp(email: str, otp: str, delete_on_success: bool = True):
         logger.info(f"OTP match successful for {email}")
         # Delete after successful verification if requested
         if delete_on_success:
-            doc_ref.delete()
+            await doc_ref.delete()
         return True, "Verification successful"
     
     log_debug(f"MISMATCH: stored=[{stored_otp}], input=[{otp}]")
@@ -173,5 +173,5 @@ async def verify_otp(email: str, otp: str, delete_on_success: bool = True):
 
 async def delete_otp(email: str):
     email = email.strip().lower()
-    db.collection("otps").document(email).delete()
+    await db.collection("otps").document(email).delete()
     log_debug(f"DELETED OTP for [{email}]")
@@ -1,12 +1,13 @@
 from datetime import datetime
-from app.db.firestore import db
+from app.db.firestore import db, invalidate_user
+from app.services.book_service import refresh_donor_visibility
 from firebase_admin import firestore
 
 
 async def submit_feedback(from_uid: str, to_uid: str, payload: dict):
     ref = db.collection("feedback").document()
 
-    ref.set({
+    await ref.set({
         "from_uid": from_uid,
         "to_uid": to_uid,
         **payload,
@@ -23,7 +24,7 @@ async def update_reputation(uid: str):
     count = 0
     mismatch_count = 0
     
-    for doc in docs:
+    async for doc in docs:
         data = doc.to_dict()
         rating = data.get("rating", 5)
         
@@ -39,8 +40,13 @@ async def update_reputation(uid: str):
         return
 
     avg = total_rating / count
-
-    db.collection("users").document(uid).update({
+    standing = {
         "reputation": round(avg, 2),
         "mismatch_count": mismatch_count
-    })
+    }
+
+    await db.collection("users").document(uid).update(standing)
+    invalidate_user(uid)
+
+    # Books carry a copy of the donor's visibility score for search
+    await refresh_donor_visibility(uid, standing)
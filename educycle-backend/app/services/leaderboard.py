@@ -0,0 +1,381 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from app.core.config import settings
+from app.core.firebase import get_firestore
+from app.db.cache import TTLCache
+from app.db.firestore import db
+
+SNAPSHOT_DOC = ("leaderboards", "students")
+GLOBAL_BOARD = ("all",)
+# Firestore documents are capped at 1 MiB; leave room for the other snapshot fields
+SNAPSHOT_MAX_BYTES = 900_000
+# The ledger listener is re-anchored this long before each reload started, covering
+# clock skew between workers (ledger timestamps are written by each worker's clock)
+WATCH_OVERLAP = timedelta(seconds=60)
+# How long a reload waits for the re-anchored listener's first snapshot
+WATCH_CATCH_UP_TIMEOUT = 30
+
+
+def _board_keys(entry: dict):
+    keys = [GLOBAL_BOARD]
+    if entry["city"]:
+        keys.append(("city", entry["city"]))
+        if entry["area"]:
+            keys.append(("area", entry["city"], entry["area"]))
+    return keys
+
+
+def _snapshot_entry_size(entry: dict):
+    # Firestore's storage size: each string is its UTF-8 length + 1, an integer 8,
+    # a field name its length + 1; the map itself adds a little
+    strings = (entry["uid"], entry["name"], entry["city"], entry["area"])
+    return 64 + sum(len(value.encode("utf-8")) + 1 for value in strings)
+
+
+def _entry(profile: dict, credits: int):
+    return {
+        "credits": credits,
+        "name": profile.get("display_name") or profile.get("email", "Anonymous"),
+        "city": profile.get("city", ""),
+        "area": profile.get("area", ""),
+    }
+
+
+class Leaderboard:
+    """Materialized student leaderboard, kept in memory and updated on every credit.
+
+    Each board (everyone, per city, per city + area) is a list of (-credits, uid)
+    kept sorted with bisect, so top-N is a slice and a user's rank is one binary
+    search. Users with equal credits share a rank. On a cold start the board is
+    served from a snapshot document until the full load of student profiles
+    replaces it; it is re-snapshotted when it has changed, and reloaded every
+    LEADERBOARD_RELOAD_INTERVAL seconds to pick up profile edits (name, city, role).
+
+    Every worker holds its own board. Grants made here are applied as they commit;
+    with a listener on new credit_transactions entries, grants made by other workers
+    are applied too (each ledger entry once), so boards don't drift apart between
+    reloads. Each reload moves the listener's window up to when it started, so the
+    listener only holds the entries since the previous reload. A snapshot only
+    holds the top students, so until the full load it serves the overall board
+    within those and nothing per city or area.
+    """
+
+    def __init__(self, snapshot_size: int):
+        self.snapshot_size = snapshot_size
+        self._entries = {}  # uid -> {"credits", "name", "city", "area"}
+        self._boards = {}  # board key -> sorted [(-credits, uid)]
+        self._applied_grants = TTLCache(maxsize=100000, ttl=3600)  # ledger entry ids already applied
+        self._reloading = False
+        self._touched = set()  # uids changed while a reload was reading
+        self._watch = None
+        self._watch_loop = None
+        self.loaded = False
+        self.source = None
+        self.loaded_at = None
+        self.snapshot_students = None  # student count recorded with the snapshot being served
+        self.changes = 0
+        self._snapshot_changes = 0
+        self.snapshots = 0
+
+    def _insert(self, uid: str, entry: dict):
+        self._entries[uid] = entry
+        for key in _board_keys(entry):
+            insort(self._boards.setdefault(key, []), (-entry["credits"], uid))
+
+    def _delete(self, uid: str):
+        entry = self._entries.pop(uid, None)
+        if entry is None:
+            return None
+        for key in _board_keys(entry):
+            board = self._boards[key]
+            del board[bisect_left(board, (-entry["credits"], uid))]
+            if not board:
+                del self._boards[key]
+        return entry
+
+    def _changed(self, uid: str):
+        self.changes += 1
+        if self._reloading:
+            self._touched.add(uid)
+
+    def _place(self, uid: str, profile: dict | None, credits: int | None = None):
+        if not profile or profile.get("role") != "student":
+            return self._delete(uid) is not None
+        entry = _entry(profile, profile.get("edu_credits", 0) if credits is None else credits)
+        if self._entries.get(uid) == entry:
+            return False
+        self._delete(uid)
+        self._insert(uid, entry)
+        return True
+
+    def upsert(self, uid: str, profile: dict, credits: int | None = None):
+        """Place a student (profile fields, and credits unless given) on the boards."""
+        if self._place(uid, profile, credits):
+            self._changed(uid)
+
+    def adjust(self, uid: str, amount: int):
+        """Apply a credit to a student on the board; False if they aren't on it."""
+        entry = self._delete(uid)
+        if entry is None:
+            if self._reloading:
+                self._touched.add(uid)
+            return False
+        self._insert(uid, {**entry, "credits": entry["credits"] + amount})
+        self._changed(uid)
+        return True
+
+    def apply_grant(self, ledger_id: str, uid: str, amount: int):
+        """adjust() for one credit_transactions entry, at most once however often it arrives.
+
+        Returns False if the student isn't on the board; the caller then re-reads their
+        committed credits, which include this entry, so it is recorded as applied either way.
+        """
+        if ledger_id in self._applied_grants:
+            return True
+        self._applied_grants.set(ledger_id, True)
+        return self.adjust(uid, amount)
+
+    def remove(self, uid: str):
+        if self._delete(uid) is not None:
+            self._changed(uid)
+
+    @staticmethod
+    def board_key(city: str | None = None, area: str | None = None):
+        if city and area:
+            return ("area", city, area)
+        if city:
+            return ("city", city)
+        return GLOBAL_BOARD
+
+    @property
+    def complete(self):
+        """True once every student is on the board (a full load, not a snapshot)."""
+        return self.source == "firestore"
+
+    def top(self, limit: int = 10, city: str | None = None, area: str | None = None):
+        """Top `limit` entries of a board, or None if the board held can't answer exactly."""
+        board = self._boards.get(self.board_key(city, area), [])
+        if not self.complete and (city or (limit > len(board) and self.snapshot_students != len(board))):
+            return None
+        return [{"uid": uid, **self._entries[uid]} for _, uid in board[:limit]]
+
+    def rank(self, uid: str, city: str | None = None, area: str | None = None):
+        """{rank, total, edu_credits} of `uid` on a board, or None if it can't be answered here."""
+        entry = self._entries.get(uid)
+        key = self.board_key(city, area)
+        if entry is None or key not in _board_keys(entry):
+            return None
+        if not self.complete and key != GLOBAL_BOARD:
+            return None
+        board = self._boards[key]
+        # Everyone with strictly more credits ranks ahead; a snapshot holds all of them
+        return {
+            "rank": bisect_left(board, (-entry["credits"], "")) + 1,
+            "total": len(board) if self.complete else self.snapshot_students,
+            "edu_credits": entry["credits"],
+        }
+
+    def _replace(self, entries: dict, source: str):
+        self._entries = {}
+        self._boards = {}
+        for uid, entry in entries.items():
+            self._insert(uid, entry)
+        self.loaded = True
+        self.source = source
+        self.loaded_at = time.time()
+        self.changes += 1
+
+    async def load_snapshot(self):
+        doc = await db.collection(SNAPSHOT_DOC[0]).document(SNAPSHOT_DOC[1]).get()
+        if not doc.exists:
+            return False
+        snapshot = doc.to_dict()
+        entries = {
+            row["uid"]: {"credits": row["credits"], "name": row["name"], "city": row["city"], "area": row["area"]}
+            for row in snapshot.get("entries", [])
+        }
+        self._replace(entries, "snapshot")
+        self.snapshot_students = snapshot.get("students", len(entries))
+        print(f"Leaderboard served from snapshot: {len(entries)} students")
+        return True
+
+    async def load(self):
+        """Full load of student profiles, plus credits still held in shards.
+
+        A grant or profile change applied while the load is reading may or may not be
+        in what it read, so the users it touched are re-read once the board has been
+        replaced (repeating for any touched meanwhile) instead of being lost or
+        counted twice. When watching, the ledger listener is re-anchored at the start
+        of the load before those re-reads; see _rewatch().
+        """
+        started = datetime.now(timezone.utc)
+        self._reloading = True
+        self._touched = set()
+        try:
+            entries = {}
+            docs = db.collection("users").where(filter=FieldFilter("role", "==", "student")).stream()
+            async for doc in docs:
+                profile = doc.to_dict()
+                entries[doc.id] = _entry(profile, profile.get("edu_credits", 0))
+            shards = db.collection("credit_shards").where(filter=FieldFilter("edu_credits", "!=", 0)).stream()
+            async for doc in shards:
+                shard = doc.to_dict()
+                if shard["user_uid"] in entries:
+                    entries[shard["user_uid"]]["credits"] += shard["edu_credits"]
+            self._replace(entries, "firestore")
+            self.snapshot_students = None
+            if self._watch_loop is not None:
+                await self._rewatch(started - WATCH_OVERLAP)
+
+            while self._touched:
+                touched, self._touched = self._touched, set()
+                await asyncio.gather(*(self.refresh(uid) for uid in touched))
+        finally:
+            self._reloading = False
+        print(f"Leaderboard loaded: {len(self._entries)} students")
+
+    async def refresh(self, uid: str):
+        """Re-read one user's profile and unrolled shards and place them on the board."""
+        doc = await db.collection("users").document(uid).get()
+        profile = doc.to_dict() if doc.exists else None
+        credits = None
+        if profile:
+            shards = db.collection("credit_shards").where(filter=FieldFilter("user_uid", "==", uid)).stream()
+            credits = profile.get("edu_credits", 0) + sum([(s.to_dict().get("edu_credits") or 0) async for s in shards])
+        if self._place(uid, profile, credits):
+            self.changes += 1
+
+    def start_watch(self, loop: asyncio.AbstractEventLoop, since: datetime | None = None):
+        """Apply grants made by any worker via a listener on credit_transactions entries from `since` (now).
+
+        Callbacks run on the SDK's thread, so entries are handed to the event loop.
+        Returns an event set once the listener's first snapshot has been handled.
+        """
+        since = since or datetime.now(timezone.utc)
+        caught_up = asyncio.Event()
+        first_snapshot = True
+
+        def on_snapshot(_docs, changes, _read_time):
+            nonlocal first_snapshot
+            for change in changes:
+                if change.type.name == "ADDED":
+                    loop.call_soon_threadsafe(self._on_ledger_entry, change.document.id,
+                                              change.document.to_dict(), first_snapshot)
+            if first_snapshot:
+                first_snapshot = False
+                loop.call_soon_threadsafe(caught_up.set)
+
+        query = get_firestore().collection("credit_transactions").where(filter=FieldFilter("timestamp", ">=", since))
+        self._watch = query.on_snapshot(on_snapshot)
+        self._watch_loop = loop
+        return caught_up
+
+    def stop_watch(self):
+        self._unsubscribe()
+        self._watch_loop = None
+
+    def _unsubscribe(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    async def _rewatch(self, since: datetime):
+        """Replace the ledger listener with one from `since`, so its result set doesn't grow for good.
+
+        A watch keeps every matching document, so one anchored at startup would hold
+        every grant made since. Entries in the new listener's first snapshot may or may
+        not be in what the reload read, so they aren't added; their users are re-read
+        instead, like any user touched during the reload. If the listener can't be
+        restarted, the next reload tries again.
+        """
+        self._unsubscribe()
+        try:
+            caught_up = self.start_watch(self._watch_loop, since)
+        except Exception as e:
+            print(f"Leaderboard listener not restarted: {e}")
+            return
+        try:
+            await asyncio.wait_for(caught_up.wait(), timeout=WATCH_CATCH_UP_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("Leaderboard listener hasn't caught up; its first entries will be re-read as they arrive")
+
+    def _on_ledger_entry(self, ledger_id: str, grant: dict, catch_up: bool = False):
+        if not self.loaded:
+            return
+        uid = grant["user_uid"]
+        if catch_up:
+            # From a first snapshot: possibly counted already, so re-read the user rather than add it
+            self._applied_grants.set(ledger_id, True)
+            if self._reloading:
+                self._touched.add(uid)
+            else:
+                asyncio.ensure_future(self.refresh(uid))
+            return
+        if not self.apply_grant(ledger_id, uid, grant["amount"]):
+            # Not on the board yet (e.g. a student who signed up after it loaded)
+            asyncio.ensure_future(self.refresh(uid))
+
+    async def save_snapshot(self):
+        """Write the top entries to one document: at most `snapshot_size`, and SNAPSHOT_MAX_BYTES.
+
+        Each entry is a map; Firestore rejects arrays nested directly in arrays.
+        """
+        changes = self.changes
+        entries = []
+        size = 0
+        for _, uid in self._boards.get(GLOBAL_BOARD, [])[:self.snapshot_size]:
+            entry = {"uid": uid, **self._entries[uid]}
+            size += _snapshot_entry_size(entry)
+            if size > SNAPSHOT_MAX_BYTES:
+                break
+            entries.append(entry)
+        await db.collection(SNAPSHOT_DOC[0]).document(SNAPSHOT_DOC[1]).set({
+            "entries": entries,
+            "students": len(self._entries),
+            "saved_at": time.time(),
+        })
+        self._snapshot_changes = changes
+        self.snapshots += 1
+
+    async def run(self):
+        """Cold start from the snapshot, then keep the board loaded and snapshotted."""
+        try:
+            await self.load_snapshot()
+        except Exception as e:
+            print(f"Leaderboard snapshot not loaded: {e}")
+
+        last_load = None
+        while True:
+            try:
+                if last_load is None or time.monotonic() - last_load >= settings.LEADERBOARD_RELOAD_INTERVAL:
+                    await self.load()
+                    last_load = time.monotonic()
+                if self.changes != self._snapshot_changes:
+                    await self.save_snapshot()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Leaderboard refresh failed: {e}")
+            await asyncio.sleep(settings.LEADERBOARD_SNAPSHOT_INTERVAL)
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "source": self.source,
+            "complete": self.complete,
+            "watching": self._watch is not None,
+            "students": len(self._entries),
+            "boards": len(self._boards),
+            "changes": self.changes,
+            "snapshots": self.snapshots,
+            "snapshot_stale": self.changes != self._snapshot_changes,
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+        }
+
+
+leaderboard = Leaderboard(snapshot_size=settings.LEADERBOARD_SNAPSHOT_SIZE)
@@ -1,81 +1,176 @@
-import httpx
+import asyncio
+import hashlib
 import math
 import re
-from app.db.firestore import db
-from datetime import datetime
+import time
+from app.core.config import settings
+from app.core.http import get_http_client
+from app.db.cache import TTLCache
+from app.db.firestore import db, invalidate_user
+from app.services.ngo_index import ngo_index
+from app.utils import geohash
+from app.utils.ratelimit import RateLimiter
+from datetime import datetime, timedelta, timezone
+from google.cloud.firestore_v1.base_query import FieldFilter
 
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_URL = f"{settings.NOMINATIM_BASE_URL}/search"
+NOMINATIM_REVERSE_URL = f"{settings.NOMINATIM_BASE_URL}/reverse"
 USER_AGENT = "EduCycle/1.0"
 
-async def verify_pickup_location(name: str, city: str):
-    params = {"q": f"{name}, {city}", "format": "json", "limit": 1}
-    async with httpx.AsyncClient() as client:
-        res = await client.get(NOMINATIM_URL, params=params, headers={"User-Agent": USER_AGENT})
-    data = res.json()
-    return len(data) > 0
+# Geocoding results are cached in two tiers: this in-process LRU, then the
+# `geocode_cache` Firestore collection shared by every worker.
+geocode_cache = TTLCache(maxsize=settings.GEOCODE_CACHE_SIZE, ttl=settings.GEOCODE_CACHE_TTL)
+# "No match" answers (including Nominatim's {"error": ...} replies, which are often
+# transient) are kept for a shorter time, in memory only; failed calls aren't cached
+NEGATIVE_GEOCODE_TTL = 3600
+# Reverse lookups are keyed on coordinates rounded to ~11m
+REVERSE_GEOCODE_DECIMALS = 4
+
+nominatim_limiter = RateLimiter(settings.NOMINATIM_RATE_PER_SECOND)
+_inflight_lookups = {}  # cache key -> task, so concurrent identical lookups share one upstream call
+geocode_stats = {"upstream_calls": 0, "durable_hits": 0, "coalesced": 0}
+_NOT_CACHED = object()
+
+
+async def _nominatim_get(url: str, params: dict):
+    """Rate-limited Nominatim call. Returns parsed JSON, or raises on HTTP errors."""
+    await nominatim_limiter.acquire()
+    geocode_stats["upstream_calls"] += 1
+    res = await get_http_client().get(url, params=params, headers={"User-Agent": USER_AGENT})
+    res.raise_for_status()
+    return res.json()
+
+
+async def _load_geocode(key: str, fetch):
+    doc_ref = db.collection("geocode_cache").document(hashlib.sha1(key.encode("utf-8")).hexdigest())
+    try:
+        doc = await doc_ref.get()
+        if doc.exists:
+            data = doc.to_dict()
+            expires_at = data.get("expires_at")
+            if expires_at and expires_at > datetime.now(timezone.utc):
+                geocode_stats["durable_hits"] += 1
+                geocode_cache.set(key, data["value"])
+                return data["value"]
+    except Exception as e:
+        print(f"Geocode cache read failed: {e}")
+
+    value = await fetch()
+
+    if value is None:
+        geocode_cache.set(key, None, ttl=NEGATIVE_GEOCODE_TTL)
+        return None
+
+    geocode_cache.set(key, value)
+    try:
+        now = datetime.now(timezone.utc)
+        await doc_ref.set({
+            "key": key,
+            "value": value,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=settings.GEOCODE_CACHE_TTL),
+        })
+    except Exception as e:
+        print(f"Geocode cache write failed: {e}")
+    return value
+
+
+async def _cached_geocode(key: str, fetch):
+    """Memory cache -> in-flight lookup -> Firestore cache -> Nominatim."""
+    cached = geocode_cache.get(key, _NOT_CACHED)
+    if cached is not _NOT_CACHED:
+        return cached
+
+    task = _inflight_lookups.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_load_geocode(key, fetch))
+        _inflight_lookups[key] = task
+        task.add_done_callback(lambda _t: _inflight_lookups.pop(key, None))
+    else:
+        geocode_stats["coalesced"] += 1
+
+    # Shield so one caller giving up doesn't cancel the lookup for the others
+    return await asyncio.shield(task)
 
 
-NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+def _normalize_address(address: str):
+    return " ".join(address.lower().split())
+
+
+async def verify_pickup_location(name: str, city: str):
+    lat, _lon = await geocode_address(f"{name}, {city}")
+    return lat is not None
+
 
 async def geocode_address(address: str):
     """Convert an address string to lat/lon"""
-    params = {"q": address, "format": "json", "limit": 1}
-    async with httpx.AsyncClient() as client:
-        res = await client.get(NOMINATIM_URL, params=params, headers={"User-Agent": USER_AGENT})
-    
-    data = res.json()
-    if data:
-        return float(data[0]["lat"]), float(data[0]["lon"])
+    async def fetch():
+        data = await _nominatim_get(NOMINATIM_URL, {"q": address, "format": "json", "limit": 1})
+        if data:
+            return {"lat": float(data[0]["lat"]), "lon": float(data[0]["lon"])}
+        return None
+
+    result = await _cached_geocode(f"search:{_normalize_address(address)}", fetch)
+    if result:
+        return result["lat"], result["lon"]
     return None, None
 
+def _parse_reverse_result(data: dict):
+    address = data.get("address", {})
+    
+    # Clean up city names
+    city = address.get("city") or address.get("town") or address.get("village") or address.get("county") or address.get("state_district") or ""
+    
+    # For area, we try suburb first, but if it has "Zone", we might prefer county if suburb is just a number
+    area = address.get("suburb") or address.get("neighbourhood") or address.get("road") or address.get("residential") or ""
+    
+    # If county is available and suburb seems like a generic zone name, use county as fallback for area
+    county = address.get("county", "")
+    if county and ("Zone" in area or "Ward" in area or not area):
+         # Only swap if area is messy or empty
+         if not area or "Zone" in area:
+             area = county
+
+    # General cleaning for both city and area
+    def clean_name(name):
+        # Remove common Indian administrative suffixes/prefixes
+        name = re.sub(r"(?i)\s+(District|Corporation|City|Municipal Corporation|Taluk)$", "", name)
+        name = re.sub(r"(?i)^(Zone|Ward|Division)\s+\d+\s*", "", name)
+        name = re.sub(r"(?i)^CMWSSB\s+Division\s+\d+\s*", "", name)
+        # Handle cases like "Zone 3 Madhavaram" -> "Madhavaram"
+        name = re.sub(r"(?i)Zone\s+\d+\s+", "", name)
+        name = re.sub(r"(?i)Ward\s+\d+\s+", "", name)
+        return name.strip()
+
+    city = clean_name(city)
+    area = clean_name(area)
+    
+    # If they ended up being the same, keep area as is but don't duplicate in full string
+    display_name = f"{area}, {city}" if area and city and area.lower() != city.lower() else (area or city)
+
+    return {
+        "city": city, 
+        "area": area, 
+        "display_name": display_name,
+        "raw_display_name": data.get("display_name") # Keep original just in case
+    }
+
+
 async def reverse_geocode_coordinates(lat: float, lon: float):
     """Convert lat/lon to address details (City, Area)"""
-    params = {"lat": lat, "lon": lon, "format": "json"}
-    
+    # Nearby GPS fixes share one cache entry
+    lat = round(lat, REVERSE_GEOCODE_DECIMALS)
+    lon = round(lon, REVERSE_GEOCODE_DECIMALS)
+
+    async def fetch():
+        data = await _nominatim_get(NOMINATIM_REVERSE_URL, {"lat": lat, "lon": lon, "format": "json"})
+        if not data or data.get("error"):
+            return None
+        result = _parse_reverse_result(data)
+        return result if result["city"] or result["area"] else None
+
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.get(NOMINATIM_REVERSE_URL, params=params, headers={"User-Agent": USER_AGENT})
-            
-        if res.status_code == 200:
-            data = res.json()
-            address = data.get("address", {})
-            
-            # Clean up city names
-            city = address.get("city") or address.get("town") or address.get("village") or address.get("county") or address.get("state_district") or ""
-            
-            # For area, we try suburb first, but if it has "Zone", we might prefer county if suburb is just a number
-            area = address.get("suburb") or address.get("neighbourhood") or address.get("road") or address.get("residential") or ""
-            
-            # If county is available and suburb seems like a generic zone name, use county as fallback for area
-            county = address.get("county", "")
-            if county and ("Zone" in area or "Ward" in area or not area):
-                 # Only swap if area is messy or empty
-                 if not area or "Zone" in area:
-                     area = county
-
-            # General cleaning for both city and area
-            def clean_name(name):
-                # Remove common Indian administrative suffixes/prefixes
-                name = re.sub(r"(?i)\s+(District|Corporation|City|Municipal Corporation|Taluk)$", "", name)
-                name = re.sub(r"(?i)^(Zone|Ward|Division)\s+\d+\s*", "", name)
-                name = re.sub(r"(?i)^CMWSSB\s+Division\s+\d+\s*", "", name)
-                # Handle cases like "Zone 3 Madhavaram" -> "Madhavaram"
-                name = re.sub(r"(?i)Zone\s+\d+\s+", "", name)
-                name = re.sub(r"(?i)Ward\s+\d+\s+", "", name)
-                return name.strip()
-
-            city = clean_name(city)
-            area = clean_name(area)
-            
-            # If they ended up being the same, keep area as is but don't duplicate in full string
-            display_name = f"{area}, {city}" if area and city and area.lower() != city.lower() else (area or city)
-
-            return {
-                "city": city, 
-                "area": area, 
-                "display_name": display_name,
-                "raw_display_name": data.get("display_name") # Keep original just in case
-            }
+        return await _cached_geocode(f"reverse:{lat:.4f},{lon:.4f}", fetch)
     except Exception as e:
         print(f"Reverse geocode failed: {e}")
         
@@ -94,33 +189,153 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     return R * c
 
 
-async def find_nearby_ngos(lat: float, lon: float, radius_km: float = 10.0):
-    """Find verified NGOs within radius"""
-    # Note: Firestore doesn't support native geo queries easily without Geohash/external lib.
-    # For MVP (small dataset), we fetch all verified NGOs and filter in memory.
-    # A production app would use Geohashes.
-    
-    docs = db.collection("users").where("role", "==", "ngo").stream()
-    
-    results = []
-    for doc in docs:
-        ngo = doc.to_dict()
-        
-        # Fallback: if coordinates missing, try to geocode now (and save for later)
-        if not ngo.get("coordinates"):
-            city = ngo.get("city", "")
-            area = ngo.get("area", "")
-            if city and area:
+def ngo_location_fields(lat: float, lon: float):
+    """Fields stored on an NGO profile so it can be found by geohash range queries."""
+    return {"coordinates": {"lat": lat, "lon": lon}, "geohash": geohash.encode(lat, lon)}
+
+
+def _ngo_result(uid: str, ngo: dict, dist: float):
+    return {
+        "uid": uid,
+        "name": ngo.get("organization_name", "Unknown NGO"),
+        "area": ngo.get("area", ""),
+        "city": ngo.get("city", ""),
+        "distance_km": round(dist, 2),
+        "coordinates": ngo["coordinates"]
+    }
+
+
+class GeocodeBackfillQueue:
+    """Background geocoding for NGOs saved without coordinates.
+
+    Searches hand pending NGOs over and return straight away; one worker task geocodes
+    them through the shared rate limiter and writes the results back in batches.
+    Queued uids are deduplicated, and addresses Nominatim cannot resolve are held
+    back for RETRY_AFTER seconds before they are queued again.
+    """
+
+    BATCH_SIZE = 20
+    RETRY_AFTER = 6 * 3600
+
+    def __init__(self):
+        self._queued = {}  # uid -> profile, in arrival order
+        self._retry_at = {}  # uid -> monotonic time before which the uid is not re-queued
+        self._wakeup = asyncio.Event()
+        self.stats_counters = {"enqueued": 0, "geocoded": 0, "failed": 0, "batches": 0}
+
+    def enqueue(self, uid: str, ngo: dict):
+        if uid in self._queued or self._retry_at.get(uid, 0) > time.monotonic():
+            return False
+        if not (ngo.get("city") and ngo.get("area")):
+            return False
+        self._queued[uid] = ngo
+        self.stats_counters["enqueued"] += 1
+        self._wakeup.set()
+        return True
+
+    def enqueue_many(self, pending: dict):
+        for uid, ngo in pending.items():
+            self.enqueue(uid, ngo)
+
+    async def run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queued:
                 try:
-                    q_lat, q_lon = await geocode_address(f"{area}, {city}")
-                    if q_lat and q_lon:
-                        ngo["coordinates"] = {"lat": q_lat, "lon": q_lon}
-                        # Async update to avoid blocking too much? 
-                        # For now, just fire and forget or await if critical.
-                        db.collection("users").document(doc.id).update({"coordinates": ngo["coordinates"]})
-                except:
-                    pass
-        
+                    await self._process_batch(list(self._queued)[:self.BATCH_SIZE])
+                except Exception as e:
+                    print(f"Geocode backfill batch failed: {e}")
+
+    async def _geocode(self, uid: str, ngo: dict):
+        try:
+            lat, lon = await geocode_address(f"{ngo['area']}, {ngo['city']}")
+        except Exception:
+            return uid, None
+        return uid, ngo_location_fields(lat, lon) if lat and lon else None
+
+    async def _process_batch(self, uids: list):
+        retry_at = time.monotonic() + self.RETRY_AFTER
+        try:
+            # Calls are spaced by the Nominatim rate limiter, so gathering only queues them
+            results = await asyncio.gather(*(self._geocode(uid, self._queued[uid]) for uid in uids))
+            located = {uid: fields for uid, fields in results if fields}
+
+            if located:
+                batch = db.batch()
+                for uid, fields in located.items():
+                    batch.update(db.collection("users").document(uid), fields)
+                await batch.commit()
+                self.stats_counters["batches"] += 1
+
+            for uid in uids:
+                if uid in located:
+                    invalidate_user(uid)
+                    ngo_index.upsert(uid, {**self._queued[uid], **located[uid]})
+                    self.stats_counters["geocoded"] += 1
+                else:
+                    self._retry_at[uid] = retry_at
+                    self.stats_counters["failed"] += 1
+        except Exception:
+            for uid in uids:
+                self._retry_at[uid] = retry_at
+            raise
+        finally:
+            for uid in uids:
+                self._queued.pop(uid, None)
+
+    def stats(self):
+        return {
+            **self.stats_counters,
+            "queued": len(self._queued),
+            "waiting_retry": sum(1 for t in self._retry_at.values() if t > time.monotonic()),
+        }
+
+
+geocode_backfill = GeocodeBackfillQueue()
+
+
+def _queue_pending_ngos():
+    """Hand NGOs still lacking coordinates to the backfill worker; returns how many there are."""
+    pending = ngo_index.pending
+    geocode_backfill.enqueue_many(pending)
+    return len(pending)
+
+
+async def _ngos_within(lat: float, lon: float, radius_km: float):
+    """([(distance_km, uid, ngo)] for every located NGO within radius, nearest first, pending count).
+
+    NGOs without coordinates are skipped and queued for background geocoding.
+    """
+    if ngo_index.loaded:
+        pending = _queue_pending_ngos()
+        return ngo_index.within(lat, lon, radius_km), pending
+
+    # Cold start, before the in-memory index has loaded: ask Firestore
+    # Each NGO stores a geohash of its coordinates. Query only the geohash cells that
+    # cover the search circle, then run the exact haversine check on those candidates.
+    async def fetch_cell(prefix):
+        start, end = geohash.prefix_range(prefix)
+        docs = db.collection("users")\
+                 .where(filter=FieldFilter("role", "==", "ngo"))\
+                 .where(filter=FieldFilter("geohash", ">=", start))\
+                 .where(filter=FieldFilter("geohash", "<=", end))\
+                 .stream()
+        return {doc.id: doc.to_dict() async for doc in docs}
+
+    # NGOs without coordinates have no geohash and can't match a cell. They are found
+    # by the index's full load (every NGO, with or without the field) and queued for
+    # geocoding from there, so nothing is reported pending until it has loaded.
+    cells = await asyncio.gather(
+        *(fetch_cell(prefix) for prefix in geohash.covering_prefixes(lat, lon, radius_km))
+    )
+
+    candidates = {}
+    for cell in cells:
+        candidates.update(cell)
+
+    within = []
+    for uid, ngo in candidates.items():
         if not ngo.get("coordinates"):
             continue
             
@@ -130,15 +345,45 @@ async def find_nearby_ngos(lat: float, lon: float, radius_km: float = 10.0):
         dist = haversine_distance(lat, lon, ngo_lat, ngo_lon)
         
         if dist <= radius_km:
-            results.append({
-                "uid": doc.id,
-                "name": ngo.get("organization_name", "Unknown NGO"),
-                "area": ngo.get("area", ""),
-                "city": ngo.get("city", ""),
-                "distance_km": round(dist, 2),
-                "coordinates": ngo["coordinates"]
-            })
+            within.append((dist, uid, ngo))
             
     # Sort by distance
-    results.sort(key=lambda x: x["distance_km"])
-    return results
+    within.sort(key=lambda x: x[0])
+    return within, 0
+
+
+async def find_nearby_ngos(lat: float, lon: float, radius_km: float = 10.0):
+    """Find verified NGOs within radius"""
+    within, _ = await _ngos_within(lat, lon, radius_km)
+    return [_ngo_result(uid, ngo, dist) for dist, uid, ngo in within]
+
+
+# Radii the pickup-point search falls back to when nothing is found closer
+FALLBACK_RADII_KM = (20.0, 50.0)
+
+
+async def find_nearest_ngos(lat: float, lon: float, radius_km: float = 5.0,
+                            fallback_radii: tuple = FALLBACK_RADII_KM, limit: int | None = None):
+    """Expanding-ring search in a single pass.
+
+    Fetches and scores the NGOs within the largest tier once, then returns the
+    closest ones inside the smallest tier that has any, that tier's radius, and how
+    many NGOs were skipped because they are still waiting for geocoding.
+    """
+    tiers = [radius_km] + sorted(r for r in fallback_radii if r > radius_km)
+
+    if ngo_index.loaded:
+        pending = _queue_pending_ngos()
+        hits, tier = ngo_index.within_tiers(lat, lon, tiers, limit)
+        return [_ngo_result(uid, ngo, dist) for dist, uid, ngo in hits], tier, pending
+
+    within, pending = await _ngos_within(lat, lon, tiers[-1])
+
+    for tier in tiers:
+        hits = [(dist, uid, ngo) for dist, uid, ngo in within if dist <= tier]
+        if hits:
+            if limit:
+                hits = hits[:limit]
+            return [_ngo_result(uid, ngo, dist) for dist, uid, ngo in hits], tier, pending
+
+    return [], tiers[-1], pending
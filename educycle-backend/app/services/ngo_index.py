@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import numpy as np
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from app.core.firebase import get_firestore
+from app.db.firestore import db
+
+EARTH_RADIUS_KM = 6371.0
+
+# Profile fields the pickup-point results need
+_KEPT_FIELDS = ("organization_name", "area", "city", "coordinates", "geohash")
+
+
+class NGOIndex:
+    """Process-resident spatial index of NGO coordinates.
+
+    Coordinates live in NumPy arrays (radians) so one vectorized haversine call
+    scores every NGO. Profiles are kept in a dict and the arrays are rebuilt lazily
+    on the next query after a change.
+    """
+
+    def __init__(self):
+        self._ngos = {}  # uid -> trimmed profile, NGOs with coordinates
+        self._pending = {}  # uid -> trimmed profile, NGOs still waiting for geocoding
+        self._uids = np.empty(0, dtype=object)
+        self._lat = np.empty(0)
+        self._lon = np.empty(0)
+        self._cos_lat = np.empty(0)
+        self._dirty = False
+        self._watch = None
+        self.loaded = False
+        self.loaded_at = None
+        self.rebuilds = 0
+        self.changes = 0
+
+    async def load(self):
+        """Full load of every NGO profile; run once at startup when there is no listener."""
+        docs = db.collection("users").where(filter=FieldFilter("role", "==", "ngo")).stream()
+        async for doc in docs:
+            self.upsert(doc.id, doc.to_dict())
+        self._mark_loaded()
+
+    def _mark_loaded(self):
+        self.loaded = True
+        self.loaded_at = time.time()
+        print(f"NGO index loaded: {len(self._ngos)} located, {len(self._pending)} pending geocoding")
+
+    def start_watch(self, loop: asyncio.AbstractEventLoop):
+        """Load and then follow NGO profiles, including other workers' writes, via a Firestore listener.
+
+        The listener's first snapshot delivers every NGO as ADDED, so it doubles as the
+        initial load; don't also run load(). Callbacks run on the SDK's thread, so
+        changes are handed to the event loop.
+        """
+        first_snapshot = True
+
+        def on_snapshot(_docs, changes, _read_time):
+            nonlocal first_snapshot
+            for change in changes:
+                uid = change.document.id
+                if change.type.name == "REMOVED":
+                    loop.call_soon_threadsafe(self.remove, uid)
+                else:
+                    loop.call_soon_threadsafe(self.upsert, uid, change.document.to_dict())
+            if first_snapshot:
+                first_snapshot = False
+                loop.call_soon_threadsafe(self._mark_loaded)
+
+        query = get_firestore().collection("users").where(filter=FieldFilter("role", "==", "ngo"))
+        self._watch = query.on_snapshot(on_snapshot)
+
+    def stop_watch(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def upsert(self, uid: str, ngo: dict):
+        if ngo.get("role", "ngo") != "ngo":
+            self.remove(uid)
+            return
+
+        trimmed = {k: ngo.get(k) for k in _KEPT_FIELDS if ngo.get(k) is not None}
+        coords = trimmed.get("coordinates")
+        self.changes += 1
+        if coords and coords.get("lat") is not None and coords.get("lon") is not None:
+            self._pending.pop(uid, None)
+            if self._ngos.get(uid) != trimmed:
+                self._ngos[uid] = trimmed
+                self._dirty = True
+        else:
+            if self._ngos.pop(uid, None) is not None:
+                self._dirty = True
+            self._pending[uid] = trimmed
+
+    def remove(self, uid: str):
+        self._pending.pop(uid, None)
+        if self._ngos.pop(uid, None) is not None:
+            self._dirty = True
+            self.changes += 1
+
+    def _rebuild(self):
+        uids = list(self._ngos)
+        self._uids = np.array(uids, dtype=object)
+        self._lat = np.radians(np.array([self._ngos[u]["coordinates"]["lat"] for u in uids], dtype=np.float64))
+        self._lon = np.radians(np.array([self._ngos[u]["coordinates"]["lon"] for u in uids], dtype=np.float64))
+        self._cos_lat = np.cos(self._lat)
+        self._dirty = False
+        self.rebuilds += 1
+
+    def _distances(self, lat: float, lon: float):
+        if self._dirty:
+            self._rebuild()
+        lat_r = np.radians(lat)
+        dlat = self._lat - lat_r
+        dlon = self._lon - np.radians(lon)
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat_r) * self._cos_lat * np.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def _select(self, dist, idx, limit: int | None):
+        if limit and len(idx) > limit:
+            # Top-k without sorting the whole candidate set
+            idx = idx[np.argpartition(dist[idx], limit - 1)[:limit]]
+        idx = idx[np.argsort(dist[idx], kind="stable")]
+        return [(float(dist[i]), self._uids[i], self._ngos[self._uids[i]]) for i in idx]
+
+    def within(self, lat: float, lon: float, radius_km: float, limit: int | None = None):
+        """[(distance_km, uid, ngo)] within radius, nearest first (at most `limit`)."""
+        dist = self._distances(lat, lon)
+        return self._select(dist, np.flatnonzero(dist <= radius_km), limit)
+
+    def within_tiers(self, lat: float, lon: float, tiers: list, limit: int | None = None):
+        """Like `within` for the smallest radius in `tiers` that has any NGO; distances are computed once."""
+        dist = self._distances(lat, lon)
+        for tier in tiers:
+            idx = np.flatnonzero(dist <= tier)
+            if len(idx):
+                return self._select(dist, idx, limit), tier
+        return [], tiers[-1]
+
+    @property
+    def pending(self):
+        """NGOs without coordinates: {uid: trimmed profile}."""
+        return dict(self._pending)
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "located": len(self._ngos),
+            "pending_geocode": len(self._pending),
+            "rebuilds": self.rebuilds,
+            "changes": self.changes,
+            "watching": self._watch is not None,
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+        }
+
+
+ngo_index = NGOIndex()
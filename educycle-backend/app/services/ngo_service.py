@@ -1,12 +1,12 @@
 from datetime import datetime
-from app.db.firestore import db
+from app.db.firestore import db, invalidate_user
 from firebase_admin import firestore
 
 
 async def create_bulk_request(ngo_uid: str, payload: dict):
     ref = db.collection("ngo_requests").document()
 
-    ref.set({
+    await ref.set({
         **payload,
         "ngo_uid": ngo_uid,
         "fulfilled": 0,
@@ -19,7 +19,7 @@ async def create_bulk_request(ngo_uid: str, payload: dict):
 
 async def fulfill_bulk_request(request_id: str, count: int):
     ref = db.collection("ngo_requests").document(request_id)
-    doc = ref.get()
+    doc = await ref.get()
 
     if not doc.exists:
         return
@@ -29,7 +29,7 @@ async def fulfill_bulk_request(request_id: str, count: int):
 
     status = "completed" if new_count >= data["quantity"] else "open"
 
-    ref.update({
+    await ref.update({
         "fulfilled": new_count,
         "status": status,
     })
@@ -37,15 +37,16 @@ async def fulfill_bulk_request(request_id: str, count: int):
 
 async def block_donor(ngo_uid: str, donor_uid: str):
     """Add a donor to the NGO's blocked list"""
-    db.collection("users").document(ngo_uid).update({
+    await db.collection("users").document(ngo_uid).update({
         "blocked_uids": firestore.ArrayUnion([donor_uid])
     })
+    invalidate_user(ngo_uid)
 
 
 async def list_ngo_requests(ngo_uid: str):
     """List all bulk requests for an NGO"""
     docs = db.collection("ngo_requests").where("ngo_uid", "==", ngo_uid).stream()
     results = []
-    for doc in docs:
+    async for doc in docs:
         results.append({**doc.to_dict(), "id": doc.id})
     return results
\ No newline at end of file
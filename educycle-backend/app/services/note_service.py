@@ -1,21 +1,27 @@
 from datetime import datetime
 from app.db.firestore import db
+from app.services.search_index import TextIndex, note_index
 
 
 async def upload_note(uid: str, payload: dict, file_url: str):
     ref = db.collection("notes").document()
 
-    ref.set({
+    data = {
         **payload,
         "file_url": file_url,
         "owner_uid": uid,
         "created_at": datetime.utcnow(),
-    })
+    }
+    await ref.set(data)
+    note_index.upsert(ref.id, data)
 
     return ref.id
 
 
-async def list_notes(filters: dict):
+async def list_notes(filters: dict, q: str | None = None):
+    if q:
+        return await search_notes(q, filters)
+
     query = db.collection("notes")
 
     for key, value in filters.items():
@@ -23,12 +29,12 @@ async def list_notes(filters: dict):
             query = query.where(key, "==", value)
 
     docs = query.stream()
-    return [{**doc.to_dict(), "id": doc.id} for doc in docs]
+    return [{**doc.to_dict(), "id": doc.id} async for doc in docs]
 
 
 async def delete_note(note_id: str, uid: str):
     ref = db.collection("notes").document(note_id)
-    doc = ref.get()
+    doc = await ref.get()
 
     if not doc.exists:
         return False
@@ -36,6 +42,24 @@ async def delete_note(note_id: str, uid: str):
     if doc.to_dict().get("owner_uid") != uid:
         return False
 
-    ref.delete()
+    await ref.delete()
+    note_index.remove(note_id)
     return True
 
+
+async def search_notes(q: str, filters: dict):
+    """Free-text note search from the in-process index, best match first."""
+    filters = {key: value for key, value in filters.items() if value}
+    index = note_index
+    if not index.loaded:
+        # Startup, before the index has loaded: index the filtered notes for this query
+        index = TextIndex("notes")
+        query = db.collection("notes")
+        for key, value in filters.items():
+            query = query.where(key, "==", value)
+        async for doc in query.stream():
+            index.upsert(doc.id, doc.to_dict())
+
+    hits = index.search(q, predicate=lambda note: all(note.get(k) == v for k, v in filters.items()))
+    return [{**note, "relevance": round(score, 4)} for score, note in hits]
+
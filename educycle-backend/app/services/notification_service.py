@@ -0,0 +1,272 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1 import Increment
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from app.core.config import settings
+from app.db.bulk import bulk_update
+from app.db.cache import TTLCache
+from app.db.firestore import db
+from app.services.realtime import realtime_hub
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NOTIFICATION_PAGE_SIZE = 20
+MAX_NOTIFICATION_PAGE_SIZE = 100
+# Rounds of mark-read for notifications whose batch lost a race or failed
+MARK_READ_ATTEMPTS = 3
+
+# notification_counters/{uid}.unread_count is kept in step with the user's unread
+# notifications: every write that creates or reads notifications adjusts it in the
+# same batch. Cached per uid and dropped on each such write made here.
+unread_count_cache = TTLCache(maxsize=settings.NOTIFICATION_COUNT_CACHE_SIZE, ttl=settings.NOTIFICATION_COUNT_CACHE_TTL)
+
+
+class InvalidNotificationCursor(ValueError):
+    pass
+
+
+def _counter_ref(uid: str):
+    return db.collection("notification_counters").document(uid)
+
+
+def _adjust_unread(batch, counts: Counter):
+    for uid, delta in counts.items():
+        if delta:
+            batch.set(_counter_ref(uid), {"unread_count": Increment(delta)}, merge=True)
+
+
+async def _commit(batch, counts: Counter):
+    _adjust_unread(batch, counts)
+    await batch.commit()
+    for uid in counts:
+        unread_count_cache.invalidate(uid)
+
+
+async def add_notifications(notifications: list[dict]):
+    """Store several notifications in one batched write, then push each to its recipient.
+
+    Frequent notifications that benefit from coalescing go through notification_outbox.
+    """
+    if not notifications:
+        return []
+    batch = db.batch()
+    refs = []
+    for data in notifications:
+        ref = db.collection("notifications").document()
+        batch.set(ref, data)
+        refs.append(ref)
+    await _commit(batch, Counter(data["user_uid"] for data in notifications if not data.get("read")))
+
+    for data, ref in zip(notifications, refs):
+        realtime_hub.publish([data["user_uid"]], "notification", {**data, "id": ref.id})
+    return [ref.id for ref in refs]
+
+
+class NotificationOutbox:
+    """Queue between the code that raises notifications and the notifications collection.
+
+    enqueue() returns immediately; one worker task writes what has accumulated every
+    `window` seconds through add_notifications, in batched commits. Notifications
+    for the same (user, related_id, type) that arrive within one window are merged
+    into one: the latest wins, with `count` recording how many it stands for and
+    the enqueuer's `summary` templates (e.g. {"message": "{count} new messages in X"})
+    rewriting its text. Failed writes are re-queued up to MAX_ATTEMPTS times, then
+    written one at a time; a notification that still can't be written is logged in
+    full at error level.
+
+    The queue lives in process memory: a crash or kill -9 loses what was enqueued in
+    the last `window` seconds (longer while Firestore writes are failing). A normal
+    shutdown flushes it. Only high-volume notifications that gain from coalescing
+    (chat messages, distribution comments) go through here; callers that need the
+    write to have happened call add_notifications directly.
+    """
+
+    FLUSH_BATCH_SIZE = 200  # notifications per commit; each may add a counter write
+    MAX_PENDING = 5000  # flush early past this many
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending = {}  # (user_uid, related_id, type) -> entry, in arrival order
+        self._wakeup = asyncio.Event()
+        self.stats_counters = {"enqueued": 0, "coalesced": 0, "written": 0, "flushes": 0, "retried": 0, "dropped": 0}
+
+    def enqueue(self, data: dict, summary: dict | None = None):
+        key = (data["user_uid"], data.get("related_id"), data.get("type"))
+        self.stats_counters["enqueued"] += 1
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = {"data": data, "count": 1, "summary": summary, "attempts": 0}
+            if len(self._pending) >= self.MAX_PENDING:
+                self._wakeup.set()
+            return
+
+        entry["count"] += 1
+        entry["data"] = data
+        entry["summary"] = summary or entry["summary"]
+        self.stats_counters["coalesced"] += 1
+
+    @staticmethod
+    def _render(entry):
+        data = entry["data"]
+        if entry["count"] == 1:
+            return data
+        rendered = {**data, "count": entry["count"]}
+        for field, template in (entry["summary"] or {}).items():
+            rendered[field] = template.replace("{count}", str(entry["count"]))
+        return rendered
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.window)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self, final: bool = False):
+        """Write everything queued so far; at shutdown pass final=True, which skips re-queueing."""
+        while self._pending:
+            entries = list(self._pending.items())[:self.FLUSH_BATCH_SIZE]
+            for key, _ in entries:
+                del self._pending[key]
+            try:
+                await add_notifications([self._render(entry) for _, entry in entries])
+                self.stats_counters["written"] += len(entries)
+                self.stats_counters["flushes"] += 1
+            except Exception as e:
+                logger.warning(f"Notification flush of {len(entries)} failed: {e}")
+                if final:
+                    await self._write_each([entry for _, entry in entries])
+                    continue
+                await self._write_each(self._requeue(entries))
+                return
+
+    async def _write_each(self, entries):
+        # Last resort: one write per notification, so one bad document can't sink the rest
+        for entry in entries:
+            data = self._render(entry)
+            try:
+                await add_notifications([data])
+                self.stats_counters["written"] += 1
+            except Exception as e:
+                self.stats_counters["dropped"] += 1
+                logger.error(f"Notification dropped after {entry['attempts'] + 1} attempts: {e}; {data!r}")
+
+    def _requeue(self, entries):
+        """Put failed entries back for the next flush; returns those out of attempts."""
+        exhausted = []
+        for key, entry in entries:
+            entry["attempts"] += 1
+            if entry["attempts"] >= self.MAX_ATTEMPTS:
+                exhausted.append(entry)
+                continue
+            self.stats_counters["retried"] += 1
+            newer = self._pending.get(key)
+            if newer is not None:
+                # Events that arrived meanwhile fold into the entry being retried
+                newer["count"] += entry["count"]
+                newer["attempts"] = entry["attempts"]
+            else:
+                self._pending[key] = entry
+        return exhausted
+
+    def stats(self):
+        return {**self.stats_counters, "pending": len(self._pending), "window_seconds": self.window}
+
+
+notification_outbox = NotificationOutbox(window=settings.NOTIFICATION_COALESCE_WINDOW)
+
+
+async def mark_notifications_read(uid: str, docs: list):
+    """Mark the given unread notification snapshots of `uid` as read.
+
+    Any number of docs: written in chunked, concurrent batches, each carrying the
+    counter decrement for its own notifications. Every update is conditional on the
+    snapshot's update_time, so when two requests race to read the same notification
+    only the first decrements; the other's batch is rejected, its notifications are
+    re-read and those still unread are tried again, up to MARK_READ_ATTEMPTS rounds.
+    A batch that timed out goes the same way, since it may have landed: the re-read
+    tells, and the preconditions stop it from landing twice.
+    Returns {"updated", "failed"} counts.
+    """
+    def decrement_unread(batch, chunk):
+        _adjust_unread(batch, Counter({uid: -len(chunk)}))
+
+    pending = {doc.reference.path: doc for doc in docs}
+    total = len(pending)
+    for attempt in range(MARK_READ_ATTEMPTS):
+        if attempt:
+            refs = [doc.reference for doc in pending.values()]
+            pending = {doc.reference.path: doc async for doc in db.get_all(refs)
+                       if doc.exists and not doc.to_dict().get("read")}
+        if not pending:
+            break
+
+        committed = []
+        await bulk_update(
+            [(doc.reference, {"read": True}, db.write_option(last_update_time=doc.update_time))
+             for doc in pending.values()],
+            per_batch=decrement_unread,
+            extra_writes_per_batch=1,
+            on_commit=lambda chunk: committed.extend(ref.path for ref, *_ in chunk),
+        )
+        for path in committed:
+            del pending[path]
+
+    unread_count_cache.invalidate(uid)
+    # Notifications found read on a re-read count as done, whichever write landed
+    return {"updated": total - len(pending), "failed": len(pending)}
+
+
+def unread_notifications(uid: str, related_id: str | None = None):
+    """Query for `uid`'s unread notifications, optionally only those about `related_id`."""
+    query = db.collection("notifications")\
+              .where(filter=FieldFilter("user_uid", "==", uid))
+    if related_id is not None:
+        query = query.where(filter=FieldFilter("related_id", "==", related_id))
+    return query.where(filter=FieldFilter("read", "==", False))
+
+
+async def get_unread_count(uid: str):
+    cached = unread_count_cache.get(uid)
+    if cached is not None:
+        return cached
+    doc = await _counter_ref(uid).get()
+    # Never show a negative badge if a duplicate mark-read slipped through
+    count = max(0, doc.to_dict().get("unread_count") or 0) if doc.exists else 0
+    unread_count_cache.set(uid, count)
+    return count
+
+
+async def list_notifications(uid: str, before: str | None = None,
+                             page_size: int = DEFAULT_NOTIFICATION_PAGE_SIZE):
+    """Unread notifications of `uid`, newest first, `page_size` at a time.
+
+    Pass the id of the last notification of a page as `before` for the next one.
+    Served by the (user_uid, read, timestamp desc) composite index.
+    """
+    page_size = max(1, min(page_size, MAX_NOTIFICATION_PAGE_SIZE))
+    query = unread_notifications(uid)\
+              .order_by("timestamp", direction=firestore.Query.DESCENDING)\
+              .order_by("__name__", direction=firestore.Query.DESCENDING)
+    if before:
+        cursor = await db.collection("notifications").document(before).get()
+        if not cursor.exists or cursor.get("user_uid") != uid:
+            raise InvalidNotificationCursor(f"Unknown notification {before!r}")
+        query = query.start_after(cursor)
+
+    results = []
+    async for doc in query.limit(page_size).stream():
+        data = doc.to_dict()
+        # Convert timestamp to ISO string
+        if isinstance(data.get("timestamp"), datetime):
+            data["timestamp"] = data["timestamp"].isoformat()
+        results.append({**data, "id": doc.id})
+    return results
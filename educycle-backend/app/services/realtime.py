@@ -0,0 +1,81 @@
+import asyncio
+import time
+from datetime import datetime
+
+from app.core.config import settings
+
+
+def _jsonable(data: dict):
+    # Firestore timestamps become ISO strings, as in the REST responses
+    return {k: v.isoformat() if isinstance(v, datetime) else v for k, v in data.items()}
+
+
+class RealtimeHub:
+    """In-process pub/sub that pushes new messages and notifications to open sockets.
+
+    Each connection gets a bounded queue keyed by the user's uid; publish() drops
+    events into every queue of the recipient without waiting. A connection that
+    falls `REALTIME_QUEUE_SIZE` events behind is disconnected so the client
+    reconnects and resyncs over REST, rather than the hub buffering without limit.
+
+    The hub is per process: publish() reaches only sockets connected to this worker.
+    A message or notification written on another worker is not pushed at all; the
+    client picks it up through its slow catch-up poll of the REST endpoints, which it
+    keeps running while the socket is open, or on its next reconnect.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers = {}  # uid -> set of queues, one per open connection
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.connections_opened = 0
+        self.last_publish_at = None
+
+    def subscribe(self, uid: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(uid, set()).add(queue)
+        self.connections_opened += 1
+        return queue
+
+    def unsubscribe(self, uid: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(uid)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[uid]
+
+    def is_connected(self, uid: str):
+        return uid in self._subscribers
+
+    def publish(self, uids, event_type: str, data: dict):
+        """Queue {"type": event_type, "data": data} for every connection of each uid."""
+        event = {"type": event_type, "data": _jsonable(data)}
+        self.published += 1
+        self.last_publish_at = time.time()
+        for uid in set(uids):
+            for queue in list(self._subscribers.get(uid, ())):
+                try:
+                    queue.put_nowait(event)
+                    self.delivered += 1
+                except asyncio.QueueFull:
+                    # Slow consumer: the socket handler sees None and closes the connection
+                    self.overflows += 1
+                    self.unsubscribe(uid, queue)
+                    queue.get_nowait()
+                    queue.put_nowait(None)
+
+    def stats(self):
+        return {
+            "connected_users": len(self._subscribers),
+            "connections": sum(len(queues) for queues in self._subscribers.values()),
+            "connections_opened": self.connections_opened,
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "seconds_since_publish": round(time.time() - self.last_publish_at, 1) if self.last_publish_at else None,
+        }
+
+
+realtime_hub = RealtimeHub(queue_size=settings.REALTIME_QUEUE_SIZE)
@@ -1,5 +1,6 @@
 from datetime import datetime
 from app.db.firestore import db, get_user_display_info
+from app.services.notification_service import add_notifications
 
 
 async def create_request(book_id: str, requester_uid: str, donor_uid: str, pickup_location: str, reason: str, quantity: int = 1):
@@ -8,7 +9,7 @@ async def create_request(book_id: str, requester_uid: str, donor_uid: str, picku
     requester_info = await get_user_display_info(requester_uid)
     donor_info = await get_user_display_info(donor_uid)
 
-    ref.set({
+    await ref.set({
         "book_id": book_id,
         "requester_uid": requester_uid,
         "requester_name": requester_info["name"],
@@ -37,7 +38,7 @@ async def create_request(book_id: str, requester_uid: str, donor_uid: str, picku
             "read": False,
             "timestamp": datetime.utcnow()
         }
-        db.collection("notifications").add(notification_data)
+        await add_notifications([notification_data])
     except Exception as e:
         print(f"Failed to send donor notification: {e}")
 
@@ -46,12 +47,12 @@ async def create_request(book_id: str, requester_uid: str, donor_uid: str, picku
 
 async def update_request_status(request_id: str, status: str):
     doc_ref = db.collection("requests").document(request_id)
-    doc = doc_ref.get()
+    doc = await doc_ref.get()
     if not doc.exists:
         return
         
     data = doc.to_dict()
-    doc_ref.update({
+    await doc_ref.update({
         "status": status
     })
     
@@ -69,7 +70,7 @@ async def update_request_status(request_id: str, status: str):
             "read": False,
             "timestamp": datetime.utcnow()
         }
-        db.collection("notifications").add(notification_data)
+        await add_notifications([notification_data])
     elif status == "rejected":
          donor_name = data.get('donor_name') or "The donor"
          notification_data = {
@@ -82,11 +83,11 @@ async def update_request_status(request_id: str, status: str):
             "read": False,
             "timestamp": datetime.utcnow()
         }
-         db.collection("notifications").add(notification_data)
+         await add_notifications([notification_data])
 
 
 async def get_request(request_id: str):
-    doc = db.collection("requests").document(request_id).get()
+    doc = await db.collection("requests").document(request_id).get()
     if doc.exists:
         item = {**doc.to_dict(), "id": doc.id}
         
@@ -102,7 +103,7 @@ async def get_request(request_id: str):
             
         # Fetch Book Info
         try:
-            book_doc = db.collection("books").document(item["book_id"]).get()
+            book_doc = await db.collection("books").document(item["book_id"]).get()
             if book_doc.exists:
                 book_data = book_doc.to_dict()
                 item["book_title"] = book_data.get("title", "Unknown Book")
@@ -140,10 +141,10 @@ async def list_user_requests(uid: str):
                 item[loc_key] = user_cache[target_uid]["location"]
         return item
     
-    for doc in requester_docs:
+    async for doc in requester_docs:
         results[doc.id] = await populate_item(doc)
         
-    for doc in donor_docs:
+    async for doc in donor_docs:
         results[doc.id] = await populate_item(doc)
         
     return list(results.values())
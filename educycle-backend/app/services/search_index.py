@@ -0,0 +1,217 @@
+import asyncio
+import bisect
+import math
+import re
+import time
+from collections import Counter
+
+from app.core.firebase import get_firestore
+from app.db.firestore import db
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Text fields indexed for books and notes, with how much a hit in each counts
+INDEXED_FIELDS = {"title": 3, "subject": 2, "board": 1, "class_level": 1, "description": 1}
+# A query token that only matches as a prefix ("phys" -> "physics") scores a bit below an exact hit
+PREFIX_MATCH_WEIGHT = 0.8
+
+
+def tokenize(text) -> list[str]:
+    return _TOKEN_RE.findall(str(text).lower()) if text is not None else []
+
+
+class TextIndex:
+    """In-process inverted index with BM25 ranking and prefix matching.
+
+    Postings map each term to {doc_id: weighted term frequency}; a sorted term list
+    lets a query token expand to every term starting with it via bisect. Documents
+    are stored alongside so search results need no Firestore reads. Every query token
+    must match (exact or prefix) for a document to be returned.
+    """
+
+    def __init__(self, collection: str, fields: dict = INDEXED_FIELDS, k1: float = 1.2, b: float = 0.75):
+        self.collection = collection
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # term -> {doc_id: tf}
+        self._terms = []  # sorted keys of _postings, for prefix lookups
+        self._doc_tf = {}  # doc_id -> Counter(term -> tf), to undo postings on update/remove
+        self._doc_len = {}
+        self._total_len = 0
+        self._docs = {}  # doc_id -> stored document
+        self._watch = None
+        self.loaded = False
+        self.loaded_at = None
+        self.queries = 0
+        self.total_query_ms = 0.0
+
+    async def load(self, include=None):
+        """Full load of the collection; run once at startup. `include(doc)` picks which documents to index."""
+        async for doc in db.collection(self.collection).stream():
+            data = doc.to_dict()
+            if include is None or include(data):
+                self.upsert(doc.id, data)
+        self.mark_loaded()
+        print(f"Search index '{self.collection}' loaded: {len(self._docs)} documents, {len(self._terms)} terms")
+
+    def mark_loaded(self):
+        """Flag the index complete; for indexes filled by another loader (the book catalog)."""
+        self.loaded = True
+        self.loaded_at = time.time()
+
+    def start_watch(self, loop: asyncio.AbstractEventLoop):
+        """Load and then follow the collection, including other workers' writes, via a Firestore listener.
+
+        The listener's first snapshot delivers every document as ADDED, so it doubles
+        as the initial load; don't also run load(). Callbacks run on the SDK's thread,
+        so changes are handed to the event loop.
+        """
+        first_snapshot = True
+
+        def on_snapshot(_docs, changes, _read_time):
+            nonlocal first_snapshot
+            for change in changes:
+                doc_id = change.document.id
+                if change.type.name == "REMOVED":
+                    loop.call_soon_threadsafe(self.remove, doc_id)
+                else:
+                    loop.call_soon_threadsafe(self.upsert, doc_id, change.document.to_dict())
+            if first_snapshot:
+                first_snapshot = False
+                loop.call_soon_threadsafe(self._watch_loaded)
+
+        self._watch = get_firestore().collection(self.collection).on_snapshot(on_snapshot)
+
+    def stop_watch(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _watch_loaded(self):
+        self.mark_loaded()
+        print(f"Search index '{self.collection}' loaded: {len(self._docs)} documents, {len(self._terms)} terms")
+
+    def _term_frequencies(self, doc: dict):
+        tf = Counter()
+        for field, weight in self.fields.items():
+            for token in tokenize(doc.get(field)):
+                tf[token] += weight
+        return tf
+
+    def upsert(self, doc_id: str, doc: dict):
+        self._unindex(doc_id)
+        tf = self._term_frequencies(doc)
+        for term, count in tf.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._terms, term)
+            postings[doc_id] = count
+        length = sum(tf.values())
+        self._doc_tf[doc_id] = tf
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        self._docs[doc_id] = {**doc, "id": doc_id}
+
+    def remove(self, doc_id: str):
+        self._unindex(doc_id)
+        self._docs.pop(doc_id, None)
+
+    def _unindex(self, doc_id: str):
+        tf = self._doc_tf.pop(doc_id, None)
+        if tf is None:
+            return
+        for term in tf:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                self._terms.pop(bisect.bisect_left(self._terms, term))
+        self._total_len -= self._doc_len.pop(doc_id)
+
+    def _expand(self, token: str):
+        """Indexed terms equal to or starting with the token."""
+        start = bisect.bisect_left(self._terms, token)
+        end = bisect.bisect_left(self._terms, token + "\uffff", start)
+        return self._terms[start:end]
+
+    def _expansions(self, token: str, n_docs: int):
+        """[(postings, weight * idf)] for every indexed term the token matches."""
+        expansions = []
+        for term in self._expand(token):
+            postings = self._postings[term]
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            expansions.append((postings, idf * (1.0 if term == token else PREFIX_MATCH_WEIGHT)))
+        return expansions
+
+    def search(self, query: str, predicate=None):
+        """[(score, doc)] for documents matching every query token, best first.
+
+        `predicate(doc)` drops documents after matching (filters, exclusions).
+        """
+        start = time.perf_counter()
+        tokens = list(dict.fromkeys(tokenize(query)))
+        results = []
+        if tokens and self._docs:
+            n_docs = len(self._docs)
+            avg_len = self._total_len / n_docs or 1.0
+            per_token = [self._expansions(token, n_docs) for token in tokens]
+            # Start from the token with the fewest postings; the others only score those candidates.
+            # A document's score for a token is its best-scoring matching term.
+            per_token.sort(key=lambda expansions: sum(len(postings) for postings, _ in expansions))
+
+            # BM25 length normalisation: k1 * (1 - b + b * len / avg_len) = norm_base + norm_per_len * len
+            k1_plus_1 = self.k1 + 1
+            norm_base = self.k1 * (1 - self.b)
+            norm_per_len = self.k1 * self.b / avg_len
+            doc_len = self._doc_len
+
+            totals = {}
+            for postings, weight in per_token[0]:
+                for doc_id, tf in postings.items():
+                    score = weight * tf * k1_plus_1 / (tf + norm_base + norm_per_len * doc_len[doc_id])
+                    if score > totals.get(doc_id, 0.0):
+                        totals[doc_id] = score
+
+            for expansions in per_token[1:]:
+                narrowed = {}
+                for doc_id, total in totals.items():
+                    best = 0.0
+                    for postings, weight in expansions:
+                        tf = postings.get(doc_id)
+                        if tf is not None:
+                            score = weight * tf * k1_plus_1 / (tf + norm_base + norm_per_len * doc_len[doc_id])
+                            if score > best:
+                                best = score
+                    if best:
+                        narrowed[doc_id] = total + best
+                totals = narrowed
+                if not totals:
+                    break
+
+            for doc_id, score in totals.items():
+                doc = self._docs[doc_id]
+                if predicate is None or predicate(doc):
+                    results.append((score, doc))
+            results.sort(key=lambda r: (-r[0], r[1]["id"]))
+
+        self.queries += 1
+        self.total_query_ms += (time.perf_counter() - start) * 1000
+        return results
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "watching": self._watch is not None,
+            "documents": len(self._docs),
+            "terms": len(self._terms),
+            "queries": self.queries,
+            "avg_query_ms": round(self.total_query_ms / self.queries, 3) if self.queries else 0.0,
+        }
+
+
+# Only available books are searchable; the book catalog fills and maintains this index
+book_index = TextIndex("books")
+# Every note is searchable; kept current by a listener (NOTE_INDEX_WATCH) or loaded once
+note_index = TextIndex("notes")
@@ -0,0 +1,83 @@
+import math
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Precision used for the `geohash` stored on NGO profiles (~4.8m x 4.8m cells)
+STORED_PRECISION = 9
+
+
+def encode(lat: float, lon: float, precision: int = STORED_PRECISION) -> str:
+    """Standard base32 geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash interleaves bits starting with longitude
+
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def cell_size(precision: int):
+    """(lat_degrees, lon_degrees) covered by one cell at this precision."""
+    total_bits = precision * 5
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def _radius_in_degrees(lat: float, radius_km: float):
+    lat_deg = radius_km / 110.574
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    lon_deg = radius_km / (111.320 * cos_lat)
+    return lat_deg, lon_deg
+
+
+def covering_prefixes(lat: float, lon: float, radius_km: float):
+    """Geohash prefixes whose cells together cover the circle around (lat, lon).
+
+    Picks the finest precision whose cells are at least as large as the radius, then
+    returns the centre cell plus its 8 neighbours, so any point within the radius
+    shares one of these prefixes.
+    """
+    lat_deg, lon_deg = _radius_in_degrees(lat, radius_km)
+
+    precision = 1
+    for p in range(STORED_PRECISION, 0, -1):
+        cell_lat, cell_lon = cell_size(p)
+        if cell_lat >= lat_deg and cell_lon >= lon_deg:
+            precision = p
+            break
+
+    cell_lat, cell_lon = cell_size(precision)
+    prefixes = []
+    for dlat in (-cell_lat, 0.0, cell_lat):
+        for dlon in (-cell_lon, 0.0, cell_lon):
+            n_lat = min(max(lat + dlat, -90.0), 90.0)
+            n_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+            prefix = encode(n_lat, n_lon, precision)
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+    return prefixes
+
+
+def prefix_range(prefix: str):
+    """Inclusive (start, end) bounds for a Firestore range query matching a prefix."""
+    return prefix, prefix + "~"
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart. Bursts queue in FIFO order instead of failing."""
+
+    def __init__(self, rate_per_second: float = 1.0):
+        self.interval = 1.0 / rate_per_second
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+        self.calls = 0
+        self.delayed_calls = 0
+        self.total_wait_seconds = 0.0
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            if wait > 0:
+                self.delayed_calls += 1
+                self.total_wait_seconds += wait
+                await asyncio.sleep(wait)
+                now = time.monotonic()
+            self._next_slot = now + self.interval
+            self.calls += 1
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "delayed_calls": self.delayed_calls,
+            "total_wait_seconds": round(self.total_wait_seconds, 3),
+        }
@@ -0,0 +1,36 @@
+import asyncio
+import sys
+import os
+
+# Add current directory to path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.db.firestore import db, get_users_by_uids
+from app.services.book_service import donor_visibility_fields, BOOK_BATCH_SIZE
+
+# Search filters and orders on `visibility_score` stored on each book. Books listed
+# before that field existed are invisible to search until this script has run.
+
+async def backfill_books():
+    print("Fetching books...")
+    books = [(doc.reference, doc.to_dict()) async for doc in db.collection("books").stream()]
+
+    donors = await get_users_by_uids(book.get("donor_uid") for _, book in books)
+
+    updates = []
+    for ref, book in books:
+        fields = donor_visibility_fields(donors.get(book.get("donor_uid")))
+        if any(book.get(k) != v for k, v in fields.items()):
+            updates.append((ref, fields))
+
+    for i in range(0, len(updates), BOOK_BATCH_SIZE):
+        batch = db.batch()
+        for ref, fields in updates[i:i + BOOK_BATCH_SIZE]:
+            batch.update(ref, fields)
+        await batch.commit()
+        print(f"  committed {min(i + BOOK_BATCH_SIZE, len(updates))}/{len(updates)}")
+
+    print(f"\nDone! Processed {len(books)} books, updated {len(updates)}.")
+
+if __name__ == "__main__":
+    asyncio.run(backfill_books())
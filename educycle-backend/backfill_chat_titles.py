@@ -0,0 +1,52 @@
+import asyncio
+import sys
+import os
+
+# Add current directory to path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.db.firestore import db
+
+# Chats created before `book_title` was stored make send_message look the title up
+# through the request and book on every message. This stores it once on each of them.
+
+BATCH_SIZE = 500  # Firestore's limit on writes per batch
+DEFAULT_TITLE = "Book Chat"
+
+
+async def get_docs(collection: str, ids):
+    refs = [db.collection(collection).document(doc_id) for doc_id in set(ids) if doc_id]
+    docs = {}
+    for i in range(0, len(refs), BATCH_SIZE):
+        async for doc in db.get_all(refs[i:i + BATCH_SIZE]):
+            if doc.exists:
+                docs[doc.id] = doc.to_dict()
+    return docs
+
+
+async def backfill_chats():
+    print("Fetching chats...")
+    chats = [doc async for doc in db.collection("chats").stream()]
+    legacy = [doc for doc in chats if not doc.to_dict().get("book_title")]
+    print(f"  {len(legacy)} of {len(chats)} chats have no book_title")
+
+    requests = await get_docs("requests", [doc.id for doc in legacy])
+    books = await get_docs("books", [req.get("book_id") for req in requests.values()])
+
+    updates = []
+    for doc in legacy:
+        book = books.get(requests.get(doc.id, {}).get("book_id"), {})
+        updates.append((doc.reference, book.get("title") or DEFAULT_TITLE))
+
+    for i in range(0, len(updates), BATCH_SIZE):
+        batch = db.batch()
+        for ref, title in updates[i:i + BATCH_SIZE]:
+            batch.update(ref, {"book_title": title})
+        await batch.commit()
+        print(f"  committed {min(i + BATCH_SIZE, len(updates))}/{len(updates)}")
+
+    untitled = sum(1 for _, title in updates if title == DEFAULT_TITLE)
+    print(f"\nDone! Updated {len(updates)} chats ({untitled} without a resolvable book got '{DEFAULT_TITLE}').")
+
+if __name__ == "__main__":
+    asyncio.run(backfill_chats())
@@ -6,7 +6,7 @@ import os
 sys.path.append(os.getcwd())
 
 from app.db.firestore import db
-from app.services.location_service import geocode_address
+from app.services.location_service import geocode_address, ngo_location_fields
 
 async def fix_ngos():
     print("Fetching NGOs...")
@@ -15,14 +15,21 @@ async def fix_ngos():
     count = 0
     updated = 0
     
-    for doc in docs:
+    async for doc in docs:
         count += 1
         ngo = doc.to_dict()
         uid = doc.id
         name = ngo.get("organization_name", "Unknown")
         
         if ngo.get("coordinates"):
-            print(f"✅ {name} ({uid}) already has coordinates.")
+            if ngo.get("geohash"):
+                print(f"✅ {name} ({uid}) already has coordinates.")
+            else:
+                # Older profiles have coordinates but no geohash, so geohash range queries can't find them
+                coords = ngo["coordinates"]
+                await db.collection("users").document(uid).update(ngo_location_fields(coords["lat"], coords["lon"]))
+                print(f"🧭 {name} ({uid}) geohash added.")
+                updated += 1
             continue
             
         city = ngo.get("city", "")
@@ -39,12 +46,7 @@ async def fix_ngos():
             lat, lon = await geocode_address(address)
             if lat and lon:
                 print(f"   -> Found: {lat}, {lon}")
-                db.collection("users").document(uid).update({
-                    "coordinates": {
-                        "lat": lat,
-                        "lon": lon
-                    }
-                })
+                await db.collection("users").document(uid).update(ngo_location_fields(lat, lon))
                 updated += 1
             else:
                 print(f"   ❌ Could not geocode address: {address}")
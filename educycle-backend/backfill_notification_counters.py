@@ -0,0 +1,40 @@
+import asyncio
+import sys
+import os
+from collections import Counter
+
+# Add current directory to path so we can import app modules
+sys.path.append(os.getcwd())
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+from app.db.firestore import db
+
+# The unread badge reads notification_counters/{uid}.unread_count, which is adjusted
+# on every notification write. This recounts it from the notifications themselves:
+# run once to seed counters for existing notifications, and again to repair drift.
+
+BATCH_SIZE = 500  # Firestore's limit on writes per batch
+
+
+async def backfill_counters():
+    print("Counting unread notifications...")
+    docs = db.collection("notifications").where(filter=FieldFilter("read", "==", False)).stream()
+    counts = Counter([doc.get("user_uid") async for doc in docs])
+
+    # Users whose counter is set but who have nothing unread anymore go back to zero
+    async for doc in db.collection("notification_counters").stream():
+        if doc.id not in counts and doc.to_dict().get("unread_count"):
+            counts[doc.id] = 0
+
+    updates = [(uid, count) for uid, count in counts.items() if uid]
+    for i in range(0, len(updates), BATCH_SIZE):
+        batch = db.batch()
+        for uid, count in updates[i:i + BATCH_SIZE]:
+            batch.set(db.collection("notification_counters").document(uid), {"unread_count": count})
+        await batch.commit()
+        print(f"  committed {min(i + BATCH_SIZE, len(updates))}/{len(updates)}")
+
+    print(f"\nDone! Set counters for {len(updates)} users ({sum(counts.values())} unread notifications).")
+
+if __name__ == "__main__":
+    asyncio.run(backfill_counters())
@@ -0,0 +1,78 @@
+import argparse
+import bisect
+import random
+import time
+
+from app.utils import geohash
+from app.services.location_service import haversine_distance
+
+# Compares the old full scan (haversine on every NGO) with geohash range lookups
+# over synthetic NGOs. The sorted geohash list stands in for Firestore's index on
+# `geohash`: each covering prefix becomes one range scan.
+
+INDIA_BOUNDS = (8.0, 33.0, 69.0, 89.0)  # lat_min, lat_max, lon_min, lon_max
+
+
+def make_ngos(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    lat_min, lat_max, lon_min, lon_max = INDIA_BOUNDS
+    ngos = []
+    for i in range(count):
+        lat = rng.uniform(lat_min, lat_max)
+        lon = rng.uniform(lon_min, lon_max)
+        ngos.append((geohash.encode(lat, lon), f"ngo{i}", lat, lon))
+    ngos.sort()
+    return ngos
+
+
+def full_scan(ngos, lat, lon, radius_km):
+    hits = [uid for _, uid, n_lat, n_lon in ngos if haversine_distance(lat, lon, n_lat, n_lon) <= radius_km]
+    return hits, len(ngos)
+
+
+def geohash_scan(ngos, keys, lat, lon, radius_km):
+    hits = []
+    scanned = 0
+    for prefix in geohash.covering_prefixes(lat, lon, radius_km):
+        start, end = geohash.prefix_range(prefix)
+        lo = bisect.bisect_left(keys, start)
+        hi = bisect.bisect_right(keys, end)
+        scanned += hi - lo
+        for _, uid, n_lat, n_lon in ngos[lo:hi]:
+            if haversine_distance(lat, lon, n_lat, n_lon) <= radius_km:
+                hits.append(uid)
+    return hits, scanned
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geohash vs full-scan NGO lookup benchmark")
+    parser.add_argument("--ngos", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    ngos = make_ngos(args.ngos)
+    keys = [n[0] for n in ngos]
+    rng = random.Random(11)
+    lat_min, lat_max, lon_min, lon_max = INDIA_BOUNDS
+    points = [(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)) for _ in range(args.queries)]
+
+    print(f"{args.ngos} synthetic NGOs, {args.queries} queries per radius")
+    for radius in (5.0, 20.0, 50.0):
+        totals = {}
+        for name, fn in (("full scan", lambda la, lo: full_scan(ngos, la, lo, radius)),
+                         ("geohash", lambda la, lo: geohash_scan(ngos, keys, la, lo, radius))):
+            scanned = 0
+            start = time.perf_counter()
+            results = []
+            for la, lo in points:
+                hits, n = fn(la, lo)
+                scanned += n
+                results.append(sorted(hits))
+            elapsed = (time.perf_counter() - start) / len(points) * 1000
+            totals[name] = results
+            print(f"  {radius:>4.0f} km  {name:<9}  {elapsed:8.3f} ms/query  {scanned / len(points):9.1f} docs scanned/query")
+        assert totals["full scan"] == totals["geohash"], "geohash lookup missed NGOs"
+
+
+if __name__ == "__main__":
+    main()
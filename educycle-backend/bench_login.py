@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Measures /auth/login latency against a local stub of the identity toolkit endpoint,
+# comparing a fresh httpx client per call (old behaviour) with the shared pooled client.
+# Needs the usual FIREBASE_* env vars (create_custom_token signs with the service account):
+#   python bench_login.py --calls 500 --concurrency 20
+
+
+async def sign_in(request):
+    body = await request.json()
+    return JSONResponse({"localId": "bench-" + body["email"].split("@")[0], "idToken": "stub"})
+
+
+def start_identity_stub(port: int):
+    app = Starlette(routes=[Route("/v1/accounts:signInWithPassword", sign_in, methods=["POST"])])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class PerCallClient:
+    """Reproduces the old `async with httpx.AsyncClient()` around every outbound request."""
+
+    async def post(self, url, **kwargs):
+        async with httpx.AsyncClient() as client:
+            return await client.post(url, **kwargs)
+
+
+async def run(mode: str, calls: int, concurrency: int):
+    from app.main import app
+    from app.core import http as http_module
+
+    if mode == "per-call":
+        http_module.get_http_client = PerCallClient
+
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one_call(i):
+            async with semaphore:
+                start = time.perf_counter()
+                res = await client.post("/auth/login", json={"email": f"user{i}@bench.test", "password": "x"})
+                return (time.perf_counter() - start) * 1000, res.status_code
+
+        await one_call(-1)  # warm up
+        wall_start = time.perf_counter()
+        results = await asyncio.gather(*(one_call(i) for i in range(calls)))
+        wall = time.perf_counter() - wall_start
+
+    latencies = [r[0] for r in results]
+    errors = sum(1 for r in results if r[1] != 200)
+    stats = http_module.http_client_stats() if mode == "pooled" else None
+    await http_module.close_http_client()
+    return latencies, errors, wall, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/auth/login latency: per-call vs pooled HTTP client")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--stub-port", type=int, default=8799)
+    parser.add_argument("--mode", choices=["per-call", "pooled"], default="pooled")
+    args = parser.parse_args()
+
+    # Must be set before app settings are imported
+    os.environ["IDENTITY_TOOLKIT_URL"] = f"http://127.0.0.1:{args.stub_port}"
+    start_identity_stub(args.stub_port)
+
+    latencies, errors, wall, stats = asyncio.run(run(args.mode, args.calls, args.concurrency))
+    print(
+        f"[{args.mode}] {args.calls} logins, concurrency {args.concurrency}: "
+        f"p50 {percentile(latencies, 50):.1f} ms  p99 {percentile(latencies, 99):.1f} ms  "
+        f"mean {statistics.mean(latencies):.1f} ms  wall {wall:.2f}s  errors {errors}"
+    )
+    if stats:
+        print(f"  outbound requests {stats['requests']}, new connections {stats['new_connections']}, "
+              f"reuse rate {stats['reuse_rate']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
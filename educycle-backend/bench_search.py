@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+# Fires N concurrent /books/search calls at a running server and reports latency percentiles.
+# Run it against the server before and after a change (same data, single uvicorn worker):
+#   uvicorn app.main:app --workers 1
+#   BENCH_TOKEN=<firebase id token> python bench_search.py --label after
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(base_url: str, token: str, concurrency: int, query: str):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60.0) as client:
+        # Warm up connections and server-side caches
+        await client.get(f"/books/search/?{query}")
+
+        async def one_call():
+            start = time.perf_counter()
+            res = await client.get(f"/books/search/?{query}")
+            return time.perf_counter() - start, res.status_code
+
+        wall_start = time.perf_counter()
+        results = await asyncio.gather(*(one_call() for _ in range(concurrency)))
+        wall = time.perf_counter() - wall_start
+
+    latencies = [r[0] * 1000 for r in results]
+    errors = sum(1 for r in results if r[1] != 200)
+    return latencies, errors, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /books/search latency benchmark")
+    parser.add_argument("--url", default=os.getenv("BENCH_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--token", default=os.getenv("BENCH_TOKEN", ""))
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--query", default="city=Chennai")
+    parser.add_argument("--label", default="run")
+    args = parser.parse_args()
+
+    latencies, errors, wall = asyncio.run(run(args.url, args.token, args.concurrency, args.query))
+
+    print(f"[{args.label}] {args.concurrency} concurrent /books/search calls in {wall:.2f}s")
+    print(f"  p50: {percentile(latencies, 50):.1f} ms")
+    print(f"  p99: {percentile(latencies, 99):.1f} ms")
+    print(f"  mean: {statistics.mean(latencies):.1f} ms, errors: {errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import random
+import statistics
+import time
+
+from app.services.search_index import TextIndex, tokenize
+
+# Builds the book search index over synthetic books and times free-text queries,
+# against a naive scan that checks every book for every query token.
+#   python bench_text_search.py --books 100000
+
+SUBJECTS = ["Physics", "Chemistry", "Biology", "Mathematics", "English", "History", "Geography",
+            "Economics", "Computer Science", "Accountancy", "Hindi", "Tamil"]
+PUBLISHERS = ["NCERT", "RD Sharma", "HC Verma", "S Chand", "Arihant", "Oswaal", "Pradeep", "Xam Idea"]
+BOARDS = ["CBSE", "ICSE", "State Board"]
+WORDS = ["guide", "workbook", "textbook", "solutions", "practice", "sample papers", "part 1", "part 2",
+         "revised", "edition", "lab manual", "question bank", "notes", "objective", "concepts"]
+QUERIES = ["NCERT physics", "ncert phys", "hc verma", "rd sharma maths", "chem lab", "cbse 12 bio",
+           "sample papers", "computer sci", "economics part 2", "tamil"]
+
+
+def make_books(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    books = {}
+    for i in range(count):
+        subject = rng.choice(SUBJECTS)
+        publisher = rng.choice(PUBLISHERS)
+        books[f"book{i}"] = {
+            "title": f"{publisher} {subject} {rng.choice(WORDS)}",
+            "subject": subject,
+            "board": rng.choice(BOARDS),
+            "class_level": str(rng.randint(6, 12)),
+            "description": " ".join(rng.sample(WORDS, 3)),
+            "available": True,
+            "visibility_score": 5.0,
+        }
+    return books
+
+
+def naive_search(books, query):
+    tokens = tokenize(query)
+    hits = []
+    for book_id, book in books.items():
+        text = " ".join(str(book.get(f, "")) for f in ("title", "subject", "board", "class_level", "description")).lower()
+        words = tokenize(text)
+        if all(any(w.startswith(t) for w in words) for t in tokens):
+            hits.append(book_id)
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process book search index benchmark")
+    parser.add_argument("--books", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    books = make_books(args.books)
+    index = TextIndex("books")
+    start = time.perf_counter()
+    for book_id, book in books.items():
+        index.upsert(book_id, book)
+    print(f"Indexed {args.books} books in {time.perf_counter() - start:.2f}s ({index.stats()['terms']} terms)")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.upsert(f"book{i}", {**books[f"book{i}"], "title": "NCERT Physics revised"})
+    print(f"1000 incremental updates: {(time.perf_counter() - start) * 1000 / 1000:.3f} ms each")
+    for i in range(1000):
+        index.upsert(f"book{i}", books[f"book{i}"])
+
+    print(f"{'query':<20} {'hits':>7} {'index p50':>10} {'index p99':>10} {'naive scan':>11}")
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            hits = index.search(query)
+            timings.append((time.perf_counter() - t) * 1000)
+        t = time.perf_counter()
+        naive = naive_search(books, query)
+        naive_ms = (time.perf_counter() - t) * 1000
+        assert sorted(b["id"] for _, b in hits) == sorted(naive), f"index and scan disagree on {query!r}"
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, round(0.99 * len(timings)) - 1)]
+        print(f"{query:<20} {len(hits):>7} {statistics.median(timings):>8.2f}ms {p99:>8.2f}ms {naive_ms:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
-from app.db.firestore import db
+from app.core.firebase import get_firestore
+
+db = get_firestore()
 
 print("Checking 'otps' collection...")
 docs = db.collection("otps").stream()
@@ -1,6 +1,7 @@
 import firebase_admin
 from firebase_admin import credentials, auth, firestore
 import os
+from app.utils import geohash
 
 # 1. Initialize Firebase
 cred = credentials.Certificate("serviceAccountKey.json")
@@ -124,7 +125,8 @@ for ngo in mock_ngos:
             "is_verified": True, # <--- VERIFIED STATUS
             "created_at": firestore.SERVER_TIMESTAMP,
             "edu_credits": 100, # Give them some starting credits
-            "coordinates": {"lat": ngo["lat"], "lon": ngo["lon"]} if "lat" in ngo else None
+            "coordinates": {"lat": ngo["lat"], "lon": ngo["lon"]} if "lat" in ngo else None,
+            "geohash": geohash.encode(ngo["lat"], ngo["lon"]) if "lat" in ngo else None
         }
         
         # Merge ensures we don't overwrite existing fields if we just want to update verified status
@@ -12,7 +12,7 @@ async def test_flow():
     
     # 2. Check Firestore manually
     from app.db.firestore import db
-    doc = db.collection("otps").document(email).get()
+    doc = await db.collection("otps").document(email).get()
     if doc.exists:
         data = doc.to_dict()
         otp = data["otp"]
@@ -23,7 +23,7 @@ async def test_flow():
         print(f"Verification result: success={success}, message={message}")
         
         # 4. Check Firestore again (should be deleted)
-        doc_after = db.collection("otps").document(email).get()
+        doc_after = await db.collection("otps").document(email).get()
         print(f"Still in Firestore? {doc_after.exists}")
     else:
         print("❌ FAILED: OTP not found in Firestore after sending.")
@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+# Add current directory to path so we can import app modules
+sys.path.append(os.getcwd())
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from app.db.firestore import db
+from app.services.credits_service import add_edu_credits, credit_ledger, get_edu_credits
+
+# Fires concurrent EduCredit grants at one user, retrying some of them with the same
+# idempotency key, and checks that every grant landed exactly once. tests/test_credits.py
+# covers the same against an in-memory fake; this script runs it against the Firestore
+# emulator (never a real project), e.g. to check the real backend's contention behaviour:
+#   firebase emulators:start --only firestore
+#   FIRESTORE_EMULATOR_HOST=localhost:8080 python test_credits_concurrency.py --credits 1000
+
+
+async def run(credits: int, retried: int, amount: int):
+    uid = f"credit-test-{uuid.uuid4().hex[:8]}"
+    await db.collection("users").document(uid).set({"role": "student", "edu_credits": 0})
+
+    keys = [f"{uid}-grant-{i}" for i in range(credits)]
+    # Every grant once, plus a second attempt for the first `retried` of them
+    calls = [add_edu_credits(uid, amount, "concurrency test", idempotency_key=key) for key in keys + keys[:retried]]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    before_rollup = await get_edu_credits(uid)
+    await credit_ledger.roll_up_shards()
+    profile = (await db.collection("users").document(uid).get()).to_dict()
+    ledger = await db.collection("credit_transactions")\
+                     .where(filter=FieldFilter("user_uid", "==", uid))\
+                     .count()\
+                     .get()
+    ledger_entries = ledger[0][0].value
+
+    expected = credits * amount
+    print(f"{len(calls)} grants ({retried} retries) in {elapsed:.2f}s, {len(errors)} errors")
+    print(f"  balance before roll-up: {before_rollup}  users.edu_credits after roll-up: {profile['edu_credits']}")
+    print(f"  ledger entries: {ledger_entries}  ledger stats: {credit_ledger.stats()}")
+    for e in errors[:5]:
+        print(f"  error: {e!r}")
+
+    ok = not errors and before_rollup == expected and profile["edu_credits"] == expected and ledger_entries == credits
+    print("OK" if ok else f"FAILED: expected a balance of {expected} and {credits} ledger entries")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent EduCredits grants against one user")
+    parser.add_argument("--credits", type=int, default=1000)
+    parser.add_argument("--retried", type=int, default=100, help="grants sent a second time with the same key")
+    parser.add_argument("--amount", type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("Set FIRESTORE_EMULATOR_HOST; this writes test users and ledger entries.")
+    sys.exit(0 if asyncio.run(run(args.credits, args.retried, args.amount)) else 1)
+
+
+if __name__ == "__main__":
+    main()
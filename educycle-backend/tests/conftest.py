@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# Settings are read at import time; tests never talk to a real Firebase project
+os.environ.setdefault("FIREBASE_PROJECT_ID", "educycle-test")
+os.environ.setdefault("FIREBASE_STORAGE_BUCKET", "educycle-test.appspot.com")
+os.environ.setdefault("FIREBASE_SERVICE_ACCOUNT", "{}")
+os.environ.setdefault("FIREBASE_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app.core.firebase as firebase  # noqa: E402
+from tests.fake_firestore import FakeFirestore  # noqa: E402
+
+# app.db.firestore.db is created from this on first import
+fake_db = FakeFirestore()
+firebase.get_async_firestore = lambda: fake_db
+
+
+@pytest.fixture
+def db():
+    """The fake Firestore behind app.db.firestore.db, emptied for each test."""
+    from app.db.firestore import user_cache
+
+    fake_db.docs.clear()
+    user_cache.clear()
+    return fake_db
@@ -0,0 +1,170 @@
+"""In-memory stand-in for the async Firestore client, covering what the services under test use.
+
+Batches commit atomically and yield to the event loop first, so concurrent grants
+interleave the way they would against a real backend.
+"""
+import asyncio
+import copy
+import uuid
+
+from google.api_core import exceptions as gexc
+from google.cloud.firestore_v1 import Increment
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def _check_value(value, in_array=False):
+    if isinstance(value, (list, tuple)):
+        if in_array:
+            raise gexc.InvalidArgument("Cannot convert an array value in an array value.")
+        for item in value:
+            _check_value(item, in_array=True)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _check_value(item)
+
+
+def _apply(doc: dict, fields: dict):
+    for key, value in fields.items():
+        if isinstance(value, Increment):
+            doc[key] = (doc.get(key) or 0) + value.value
+        else:
+            doc[key] = copy.deepcopy(value)
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = copy.deepcopy(data)
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+    def get(self, field):
+        if field not in (self._data or {}):
+            raise KeyError(field)
+        return copy.deepcopy(self._data[field])
+
+
+class FakeDocument:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    async def get(self):
+        await asyncio.sleep(0)
+        return FakeSnapshot(self, self._client.docs.get(self.path))
+
+    async def set(self, data, merge=False):
+        batch = self._client.batch()
+        batch.set(self, data, merge=merge)
+        await batch.commit()
+
+    async def update(self, data):
+        batch = self._client.batch()
+        batch.update(self, data)
+        await batch.commit()
+
+    async def create(self, data):
+        batch = self._client.batch()
+        batch.create(self, data)
+        await batch.commit()
+
+
+class FakeQuery:
+    def __init__(self, client, collection, filters=(), orders=(), limit=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)  # (field, op, value)
+        self._orders = tuple(orders)  # (field, direction); "__name__" is the document id
+        self._limit = limit
+
+    def where(self, filter):
+        return FakeQuery(self._client, self._collection,
+                         self._filters + ((filter.field_path, filter.op_string, filter.value),),
+                         self._orders, self._limit)
+
+    def order_by(self, field, direction="ASCENDING"):
+        return FakeQuery(self._client, self._collection, self._filters,
+                         self._orders + ((field, direction),), self._limit)
+
+    def limit(self, count):
+        return FakeQuery(self._client, self._collection, self._filters, self._orders, count)
+
+    def _matches(self, doc):
+        # Like Firestore, a filter or ordering on a field excludes documents without it
+        fields = [field for field, _, _ in self._filters] + [field for field, _ in self._orders]
+        if any(field not in doc for field in fields if field != "__name__"):
+            return False
+        return all(_OPS[op](doc[field], value) for field, op, value in self._filters)
+
+    async def stream(self):
+        await asyncio.sleep(0)
+        prefix = self._collection + "/"
+        rows = [(path, doc) for path, doc in self._client.docs.items()
+                if path.startswith(prefix) and "/" not in path[len(prefix):] and self._matches(doc)]
+        # Stable sorts, last order first
+        for field, direction in reversed(self._orders):
+            rows.sort(key=lambda row: row[0].rsplit("/", 1)[-1] if field == "__name__" else row[1][field],
+                      reverse=direction == "DESCENDING")
+        for path, doc in rows[:self._limit]:
+            yield FakeSnapshot(FakeDocument(self._client, path), doc)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._client, f"{self._collection}/{doc_id or uuid.uuid4().hex}")
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def create(self, ref, data):
+        self._writes.append(("create", ref, data, False))
+
+    def set(self, ref, data, merge=False):
+        self._writes.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self._writes.append(("update", ref, data, False))
+
+    async def commit(self):
+        await asyncio.sleep(0)
+        docs = self._client.docs
+        for _, _, data, _ in self._writes:
+            _check_value(data)
+        for kind, ref, _, _ in self._writes:
+            if kind == "create" and ref.path in docs:
+                raise gexc.AlreadyExists(ref.path)
+            if kind == "update" and ref.path not in docs:
+                raise gexc.NotFound(ref.path)
+        for kind, ref, data, merge in self._writes:
+            doc = docs[ref.path] if (kind == "update" or merge) and ref.path in docs else {}
+            _apply(doc, data)
+            docs[ref.path] = doc
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.docs = {}  # "collection/id" -> fields
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.services.credits_service import CreditLedger
+
+AMOUNT = 5
+
+
+@pytest.fixture
+def ledger():
+    return CreditLedger(shard_count=4, hot_rate=5)
+
+
+def add_student(db, uid: str, credits: int = 0):
+    db.docs[f"users/{uid}"] = {"role": "student", "edu_credits": credits}
+
+
+def ledger_entries(db, uid: str):
+    return [doc for path, doc in db.docs.items()
+            if path.startswith("credit_transactions/") and doc["user_uid"] == uid]
+
+
+async def balance(db, ledger, uid: str):
+    return db.docs[f"users/{uid}"]["edu_credits"] + await ledger.shard_total(uid)
+
+
+def test_concurrent_grants_land_exactly_once(db, ledger):
+    add_student(db, "student-1")
+    keys = [f"grant-{i}" for i in range(200)]
+
+    async def run():
+        # Every grant once, plus a concurrent retry of the first 50
+        results = await asyncio.gather(*(
+            ledger.credit("student-1", AMOUNT, "test", idempotency_key=key) for key in keys + keys[:50]
+        ))
+        return results, await balance(db, ledger, "student-1")
+
+    results, before_rollup = asyncio.run(run())
+
+    assert all(results)
+    assert before_rollup == 200 * AMOUNT
+    assert len(ledger_entries(db, "student-1")) == 200
+    assert ledger.stats_counters["duplicates"] == 50
+    # Past hot_rate grants a second, increments went to shards
+    assert ledger.stats_counters["sharded"] > 0
+
+    asyncio.run(ledger.roll_up_shards())
+    assert db.docs["users/student-1"]["edu_credits"] == 200 * AMOUNT
+    assert asyncio.run(balance(db, ledger, "student-1")) == 200 * AMOUNT
+
+
+def test_same_key_concurrently_credits_once(db, ledger):
+    add_student(db, "student-1", credits=10)
+
+    async def run():
+        return await asyncio.gather(*(
+            ledger.credit("student-1", AMOUNT, "test", idempotency_key="book-listed-1") for _ in range(20)
+        ))
+
+    assert all(asyncio.run(run()))
+    assert asyncio.run(balance(db, ledger, "student-1")) == 10 + AMOUNT
+    assert len(ledger_entries(db, "student-1")) == 1
+
+
+def test_key_reused_for_another_user_still_credits(db, ledger):
+    add_student(db, "student-1")
+    add_student(db, "student-2")
+
+    async def run():
+        await asyncio.gather(
+            ledger.credit("student-1", AMOUNT, "test", idempotency_key="shared"),
+            ledger.credit("student-2", AMOUNT, "test", idempotency_key="shared"),
+        )
+
+    asyncio.run(run())
+    assert db.docs["users/student-1"]["edu_credits"] == AMOUNT
+    assert db.docs["users/student-2"]["edu_credits"] == AMOUNT
+
+
+def test_missing_user_is_not_credited(db, ledger):
+    assert asyncio.run(ledger.credit("nobody", AMOUNT, "test", idempotency_key="k")) is False
+    assert ledger_entries(db, "nobody") == []
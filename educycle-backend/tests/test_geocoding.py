@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services import location_service
+from app.utils.ratelimit import RateLimiter
+
+INTERVAL = 0.05
+
+
+@pytest.fixture
+def nominatim(db, monkeypatch):
+    """A stub Nominatim behind httpx.MockTransport; set `.reply` (status, body) to change its answer."""
+
+    class Stub:
+        calls = []  # (monotonic time, path)
+        reply = (200, [{"lat": "13.08", "lon": "80.27"}])
+
+    Stub.calls = []
+
+    async def handler(request):
+        Stub.calls.append((time.monotonic(), request.url.path))
+        # Slow enough that concurrent lookups overlap
+        await asyncio.sleep(0.01)
+        status, body = Stub.reply
+        return httpx.Response(status, json=body)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(location_service, "get_http_client", lambda: client)
+    monkeypatch.setattr(location_service, "nominatim_limiter", RateLimiter(1 / INTERVAL))
+    location_service.geocode_cache.clear()
+    location_service._inflight_lookups.clear()
+    return Stub
+
+
+def test_concurrent_identical_lookups_share_one_call(nominatim):
+    async def run():
+        return await asyncio.gather(*(location_service.geocode_address("Anna Nagar,  Chennai") for _ in range(20)))
+
+    results = asyncio.run(run())
+    assert results == [(13.08, 80.27)] * 20
+    assert len(nominatim.calls) == 1
+    # Later lookups are served from the cache
+    assert asyncio.run(location_service.geocode_address("anna nagar, chennai")) == (13.08, 80.27)
+    assert len(nominatim.calls) == 1
+
+
+def test_upstream_calls_are_rate_limited(nominatim):
+    async def run():
+        await asyncio.gather(*(location_service.geocode_address(f"Area {i}, Chennai") for i in range(5)))
+
+    asyncio.run(run())
+    times = [t for t, _ in nominatim.calls]
+    assert len(times) == 5
+    # Allow for timer granularity
+    assert all(b - a >= INTERVAL * 0.9 for a, b in zip(times, times[1:]))
+
+
+@pytest.mark.parametrize("body", [
+    [],  # search miss
+    {"error": "Unable to geocode"},  # Nominatim's error reply, often transient
+])
+def test_misses_are_cached_for_the_negative_ttl(db, nominatim, monkeypatch, body):
+    monkeypatch.setattr(location_service, "NEGATIVE_GEOCODE_TTL", 0.2)
+    nominatim.reply = (200, body)
+
+    async def lookup():
+        if isinstance(body, dict):
+            return await location_service.reverse_geocode_coordinates(13.08, 80.27)
+        return await location_service.geocode_address("Nowhere, Chennai")
+
+    async def run():
+        first, again = await lookup(), await lookup()
+        after_first = len(nominatim.calls)
+        await asyncio.sleep(0.25)
+        await lookup()
+        return first, again, after_first
+
+    first, again, after_first = asyncio.run(run())
+    assert first in (None, (None, None)) and again == first
+    assert after_first == 1
+    # Asked again once the negative entry expired, and never stored in Firestore
+    assert len(nominatim.calls) == 2
+    assert not any(path.startswith("geocode_cache/") for path in db.docs)
+
+
+def test_failed_calls_are_not_cached(nominatim):
+    nominatim.reply = (503, None)
+
+    async def run():
+        await location_service.reverse_geocode_coordinates(13.08, 80.27)
+        await location_service.reverse_geocode_coordinates(13.08, 80.27)
+
+    asyncio.run(run())
+    assert len(nominatim.calls) == 2
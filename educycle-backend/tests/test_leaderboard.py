@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.services import leaderboard as leaderboard_module
+from app.services.leaderboard import Leaderboard, SNAPSHOT_DOC
+
+
+def add_student(db, uid: str, credits: int, city: str = "Chennai", area: str = "Adyar"):
+    db.docs[f"users/{uid}"] = {
+        "role": "student",
+        "display_name": uid.title(),
+        "edu_credits": credits,
+        "city": city,
+        "area": area,
+    }
+
+
+def test_snapshot_round_trip(db):
+    for i in range(30):
+        add_student(db, f"student-{i:02d}", credits=i * 10, city="Chennai" if i % 2 else "Pune")
+    board = Leaderboard(snapshot_size=10)
+    asyncio.run(board.load())
+    asyncio.run(board.save_snapshot())
+
+    restored = Leaderboard(snapshot_size=10)
+    assert asyncio.run(restored.load_snapshot())
+    assert restored.source == "snapshot"
+    assert restored.top(10) == board.top(10)
+    # Totals count every student, not only those in the snapshot
+    assert restored.rank("student-29") == {"rank": 1, "total": 30, "edu_credits": 290}
+    assert db.docs["/".join(SNAPSHOT_DOC)]["students"] == 30
+
+
+def test_snapshot_is_capped_by_size(db, monkeypatch):
+    for i in range(30):
+        add_student(db, f"student-{i:02d}", credits=i)
+    board = Leaderboard(snapshot_size=1000)
+    asyncio.run(board.load())
+    monkeypatch.setattr(leaderboard_module, "SNAPSHOT_MAX_BYTES", 1000)
+    asyncio.run(board.save_snapshot())
+
+    entries = db.docs["/".join(SNAPSHOT_DOC)]["entries"]
+    assert 0 < len(entries) < 30
+    # The highest-ranked students are the ones kept
+    assert [e["uid"] for e in entries] == [row["uid"] for row in board.top(len(entries))]
+
+
+def test_grant_during_reload_is_not_lost(db):
+    for i in range(5):
+        add_student(db, f"student-{i}", credits=100)
+    board = Leaderboard(snapshot_size=10)
+    asyncio.run(board.load())
+
+    async def grant():
+        # Lands after the reload has read users, before it replaces the board
+        await asyncio.sleep(0)
+        db.docs["users/student-0"]["edu_credits"] += 50
+        board.apply_grant("student-0:late", "student-0", 50)
+
+    async def run():
+        await asyncio.gather(board.load(), grant())
+
+    asyncio.run(run())
+    assert board.rank("student-0") == {"rank": 1, "total": 5, "edu_credits": 150}
+
+
+def test_ledger_entries_apply_once(db):
+    add_student(db, "student-1", credits=10)
+    board = Leaderboard(snapshot_size=10)
+
+    async def run():
+        await board.load()
+        board.apply_grant("student-1:k1", "student-1", 5)
+        # The listener delivering the same grant, then another worker's grant
+        board._on_ledger_entry("student-1:k1", {"user_uid": "student-1", "amount": 5})
+        board._on_ledger_entry("student-1:k2", {"user_uid": "student-1", "amount": 7})
+        # A student who signed up after the load is read in when credited
+        add_student(db, "student-2", credits=3)
+        board._on_ledger_entry("student-2:k1", {"user_uid": "student-2", "amount": 3})
+        await asyncio.sleep(0.01)
+        # Their credits were read with that grant in, so it isn't added again
+        board._on_ledger_entry("student-2:k1", {"user_uid": "student-2", "amount": 3})
+
+    asyncio.run(run())
+    assert board.rank("student-1")["edu_credits"] == 22
+    assert board.rank("student-2") == {"rank": 2, "total": 2, "edu_credits": 3}
+
+
+def test_snapshot_does_not_serve_local_boards(db, monkeypatch):
+    from app.services import credits_service
+
+    for i in range(30):
+        add_student(db, f"student-{i:02d}", credits=i * 10, city="Chennai" if i % 2 else "Pune")
+    board = Leaderboard(snapshot_size=10)
+    asyncio.run(board.load())
+    asyncio.run(board.save_snapshot())
+    restored = Leaderboard(snapshot_size=10)
+    asyncio.run(restored.load_snapshot())
+    monkeypatch.setattr(credits_service, "leaderboard", restored)
+
+    assert restored.top(5, city="Chennai") is None
+    assert restored.top(20) is None  # more than the snapshot holds
+    assert restored.rank("student-29", city="Chennai") is None
+
+    # Served from Firestore instead, over every student in the city
+    rows = asyncio.run(credits_service.get_leaderboard(20, city="Pune"))
+    assert [row["uid"] for row in rows] == [row["uid"] for row in board.top(20, city="Pune")]
+
+
+def test_reload_reanchors_the_ledger_listener(db, monkeypatch):
+    add_student(db, "student-1", credits=100)
+    listeners = []  # [since, callback, subscribed]
+    first_snapshot = []  # ledger entries the next listener starts with
+
+    class Query:
+        def __init__(self, since):
+            self.since = since
+
+        def on_snapshot(self, callback):
+            listener = [self.since, callback, True]
+            listeners.append(listener)
+            changes = [SimpleNamespace(type=SimpleNamespace(name="ADDED"),
+                                       document=SimpleNamespace(id=ledger_id, to_dict=lambda grant=grant: grant))
+                       for ledger_id, grant in first_snapshot]
+            callback([], changes, None)
+            return SimpleNamespace(unsubscribe=lambda: listener.__setitem__(2, False))
+
+    collection = SimpleNamespace(where=lambda filter: Query(filter.value))
+    monkeypatch.setattr(leaderboard_module, "get_firestore", lambda: SimpleNamespace(collection=lambda name: collection))
+    board = Leaderboard(snapshot_size=10)
+
+    async def run():
+        board.start_watch(asyncio.get_running_loop())
+        await board.load()
+        # A grant already in the profile the reload reads, delivered again by the new listener
+        db.docs["users/student-1"]["edu_credits"] += 50
+        first_snapshot.append(("student-1:k1", {"user_uid": "student-1", "amount": 50}))
+        started = datetime.now(timezone.utc)
+        await board.load()
+        return started
+
+    started = asyncio.run(run())
+    assert [subscribed for _, _, subscribed in listeners] == [False, False, True]
+    # The window starts just before the latest reload, not at startup
+    assert listeners[-1][0] >= started - leaderboard_module.WATCH_OVERLAP - timedelta(seconds=1)
+    assert board.rank("student-1")["edu_credits"] == 150
+    board.stop_watch()
+    assert not listeners[-1][2]
@@ -0,0 +1,69 @@
+import itertools
+import json
+
+import pytest
+
+from app.db.query_planner import INDEXES_FILE, QueryPlanner
+from app.services.book_service import _search_query, book_query_planner
+
+ORDER = (("visibility_score", "DESCENDING"), ("__name__", "ASCENDING"))
+
+
+def declared_indexes(collection: str):
+    return [[(f["fieldPath"], f["order"]) for f in index["fields"]]
+            for index in json.loads(INDEXES_FILE.read_text())["indexes"]
+            if index["collectionGroup"] == collection]
+
+
+def write_indexes(tmp_path, *indexes):
+    path = tmp_path / "firestore.indexes.json"
+    path.write_text(json.dumps({"indexes": [
+        {"collectionGroup": "books", "fields": [{"fieldPath": name, "order": order} for name, order in fields]}
+        for fields in indexes
+    ]}))
+    return path
+
+
+@pytest.mark.parametrize("fields", [
+    combo for size in range(len(book_query_planner.filterable) + 1)
+    for combo in itertools.combinations(book_query_planner.filterable, size)
+])
+def test_search_queries_have_a_declared_index(fields):
+    plan = book_query_planner.plan({name: "x" for name in fields})
+    query = _search_query(plan)
+
+    equality = {field for field, op, _ in query._filters if op == "=="}
+    ranges = {field for field, op, _ in query._filters if op != "=="}
+    orders = list(query._orders)
+    # Firestore wants the first order_by on the range-filtered field
+    assert ranges == {orders[0][0]}
+    assert equality == {"available", *plan.pushed}
+
+    # The index the plan names, checked against the file as Firestore would
+    served_by = [index for index in declared_indexes("books")
+                 if {name for name, _ in index[:-len(orders)]} == equality and index[-len(orders):] == orders]
+    assert served_by, f"no index in firestore.indexes.json serves {sorted(equality)} ordered by {orders}"
+    assert plan.index == [name for name, _ in served_by[0]]
+
+
+def test_trailing_name_entry_is_matched_with_its_direction(tmp_path):
+    indexes = write_indexes(
+        tmp_path,
+        [("available", "ASCENDING"), ("city", "ASCENDING"), ("visibility_score", "DESCENDING"), ("__name__", "ASCENDING")],
+        # Implicit __name__ follows visibility_score, descending: doesn't serve ORDER
+        [("available", "ASCENDING"), ("subject", "ASCENDING"), ("visibility_score", "DESCENDING")],
+        # Wrong direction on the order field
+        [("available", "ASCENDING"), ("board", "ASCENDING"), ("visibility_score", "ASCENDING"), ("__name__", "ASCENDING")],
+    )
+    planner = QueryPlanner("books", ("city", "subject", "board"), fixed_equality=("available",),
+                           order=ORDER, indexes_file=indexes)
+
+    assert planner.plan({"city": "Pune"}).pushed == {"city": "Pune"}
+    assert planner.plan({"subject": "Physics"}).pushed == {}
+    assert planner.plan({"board": "CBSE"}).pushed == {}
+
+    # The same implicit-__name__ index does serve a query whose tie-break follows the score
+    descending = QueryPlanner("books", ("city", "subject", "board"), fixed_equality=("available",),
+                              order=(("visibility_score", "DESCENDING"),), indexes_file=indexes)
+    assert descending.plan({"subject": "Physics"}).pushed == {"subject": "Physics"}
+    assert descending.plan({"city": "Pune"}).pushed == {}
@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services import search_index
+from app.services.search_index import TextIndex
+
+
+def change(kind: str, doc_id: str, data: dict | None = None):
+    return SimpleNamespace(type=SimpleNamespace(name=kind),
+                           document=SimpleNamespace(id=doc_id, to_dict=lambda: data))
+
+
+def test_watched_index_follows_other_workers_writes(monkeypatch):
+    listeners = []
+
+    class Collection:
+        def on_snapshot(self, callback):
+            listeners.append(callback)
+            return SimpleNamespace(unsubscribe=lambda: listeners.remove(callback))
+
+    monkeypatch.setattr(search_index, "get_firestore", lambda: SimpleNamespace(collection=lambda name: Collection()))
+    index = TextIndex("notes")
+
+    async def run():
+        index.start_watch(asyncio.get_running_loop())
+        (on_snapshot,) = listeners
+        # The first snapshot is the initial load
+        on_snapshot([], [change("ADDED", "n1", {"title": "Physics formulae"})], None)
+        await asyncio.sleep(0)
+        assert index.loaded
+        # Notes uploaded and deleted on another worker
+        on_snapshot([], [change("ADDED", "n2", {"title": "Physics lab manual"}), change("REMOVED", "n1")], None)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert [doc["id"] for _, doc in index.search("phys")] == ["n2"]
+    index.stop_watch()
+    assert not listeners and not index.stats()["watching"]
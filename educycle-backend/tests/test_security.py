@@ -0,0 +1,123 @@
+import asyncio
+import datetime
+import time
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.security import FirebaseTokenVerifier, SigningKeysNotLoaded
+
+PROJECT_ID = "educycle-test"
+KID = "test-key"
+
+
+def _make_cert():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = x509.CertificateBuilder()\
+               .subject_name(name)\
+               .issuer_name(name)\
+               .public_key(key.public_key())\
+               .serial_number(x509.random_serial_number())\
+               .not_valid_before(now - datetime.timedelta(days=1))\
+               .not_valid_after(now + datetime.timedelta(days=1))\
+               .sign(key, hashes.SHA256())
+    return key, cert.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+
+
+SIGNING_KEY, CERT_PEM = _make_cert()
+
+
+def mint(kid: str = KID, **overrides):
+    now = int(time.time())
+    claims = {
+        "aud": PROJECT_ID,
+        "iss": security.ID_TOKEN_ISSUER_PREFIX + PROJECT_ID,
+        "sub": "student-1",
+        "iat": now - 10,
+        "auth_time": now - 10,
+        "exp": now + 3600,
+        **overrides,
+    }
+    return jwt.encode(claims, SIGNING_KEY, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def verifier():
+    verifier = FirebaseTokenVerifier(PROJECT_ID)
+    verifier.set_public_keys({KID: CERT_PEM})
+    return verifier
+
+
+def test_valid_token(verifier):
+    claims = verifier.verify(mint())
+    assert claims["uid"] == "student-1"
+    assert claims["aud"] == PROJECT_ID
+
+
+def test_expired_token(verifier):
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(mint(iat=int(time.time()) - 7200, exp=int(time.time()) - 3600))
+
+
+@pytest.mark.parametrize("claim,value", [
+    ("aud", "some-other-project"),
+    ("iss", security.ID_TOKEN_ISSUER_PREFIX + "some-other-project"),
+])
+def test_wrong_audience_or_issuer(verifier, claim, value):
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(mint(**{claim: value}))
+
+
+def test_unknown_kid(verifier):
+    with pytest.raises(SigningKeysNotLoaded):
+        verifier.verify(mint(kid="rotated-key"))
+
+
+def test_cache_hit(verifier):
+    token = mint()
+    verifier.verify(token)
+    # Without keys the token could only verify from the claims cache
+    verifier.set_public_keys({})
+    assert verifier.verify(token)["uid"] == "student-1"
+    assert verifier.cache.stats()["hits"] == 1
+
+
+def test_cache_drops_claims_at_exp(verifier):
+    token = mint()
+    claims = verifier.verify(token)
+    verifier.cache.set(verifier._cache_key(token), {**claims, "exp": time.time() - 1})
+    assert verifier.get_cached(token) is None
+
+
+def test_unknown_kid_falls_back_to_admin_sdk(monkeypatch, verifier):
+    token = mint(kid="rotated-key")
+    calls = []
+
+    def verify_id_token(t):
+        calls.append(t)
+        return {"uid": "student-1", "exp": time.time() + 3600}
+
+    monkeypatch.setattr(security, "token_verifier", verifier)
+    monkeypatch.setattr(security.auth, "verify_id_token", verify_id_token)
+
+    assert asyncio.run(security.decode_firebase_token(token))["uid"] == "student-1"
+    assert calls == [token]
+    assert verifier._refresh_requested.is_set()
+    # The SDK's answer is cached like a locally verified one
+    assert asyncio.run(security.decode_firebase_token(token))["uid"] == "student-1"
+    assert calls == [token]
+
+
+def test_invalid_token_is_401(monkeypatch, verifier):
+    monkeypatch.setattr(security, "token_verifier", verifier)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(security.decode_firebase_token(mint(aud="some-other-project")))
+    assert exc.value.status_code == 401
@@ -1,7 +1,8 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Bell, MessageCircle } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { notificationsApi } from '@/lib/api';
+import { realtime } from '@/lib/realtime';
 import { useAuth } from '@/contexts/AuthContext';
 import { useNavigate } from 'react-router-dom';
 import {
@@ -15,25 +16,62 @@ import { Badge } from '@/components/ui/badge';
 
 const NotificationBell = () => {
     const [notifications, setNotifications] = useState<any[]>([]);
+    const [unreadCount, setUnreadCount] = useState(0);
+    const unreadCountRef = useRef(0);
+    unreadCountRef.current = unreadCount;
     const { user, role } = useAuth();
     const navigate = useNavigate();
 
     useEffect(() => {
         if (user) {
+            // New notifications are pushed over the realtime socket; resync whenever it (re)connects
+            const unsubscribe = realtime.subscribe((event) => {
+                if (event.type === 'ready') {
+                    fetchNotifications();
+                } else if (event.type === 'notification') {
+                    // The open chat page marks its own chat notifications read
+                    if (event.data.type === 'chat' && window.location.pathname === `/chat/${event.data.related_id}`) return;
+                    setNotifications((prev) => [event.data, ...prev.filter((n) => n.id !== event.data.id)]);
+                    setUnreadCount((count) => count + 1);
+                }
+            });
             fetchNotifications();
-            const interval = setInterval(fetchNotifications, 10000); // Poll every 10s
-            return () => clearInterval(interval);
+            // Poll the badge count every 10s while the socket is down. While it is up, still
+            // check once a minute: the socket only carries notifications raised on the backend
+            // worker it is connected to, not those raised on other workers.
+            let ticks = 0;
+            const interval = setInterval(() => {
+                ticks += 1;
+                if (!realtime.isConnected() || ticks % 6 === 0) pollUnreadCount();
+            }, 10000);
+            return () => {
+                clearInterval(interval);
+                unsubscribe();
+            };
         }
     }, [user]);
 
     const fetchNotifications = async () => {
-        const data = await notificationsApi.list();
+        const [data, count] = await Promise.all([notificationsApi.list(), notificationsApi.unreadCount()]);
         setNotifications(data);
+        setUnreadCount(count);
+    };
+
+    const pollUnreadCount = async () => {
+        const count = await notificationsApi.unreadCount();
+        // Only reload the list when something changed
+        if (count !== unreadCountRef.current) fetchNotifications();
+    };
+
+    const handleMarkAllRead = async () => {
+        await notificationsApi.markAllRead();
+        fetchNotifications();
     };
 
     const handleNotificationClick = async (notification: any) => {
         await notificationsApi.markRead(notification.id);
         setNotifications(notifications.filter(n => n.id !== notification.id));
+        setUnreadCount((count) => Math.max(0, count - 1));
 
         const isNGO = role === 'ngo';
         const requestStatusPath = isNGO ? '/ngo-my-requests' : '/request-status';
@@ -55,7 +93,7 @@ const NotificationBell = () => {
             <DropdownMenuTrigger asChild>
                 <Button variant="ghost" size="icon" className="relative">
                     <Bell className="h-5 w-5" />
-                    {notifications.length > 0 && (
+                    {unreadCount > 0 && (
                         <span className="absolute top-1 right-1 flex h-2 w-2">
                             <span className="animate-ping absolute inline-flex h-full w-full rounded-full bg-red-400 opacity-75"></span>
                             <span className="relative inline-flex rounded-full h-2 w-2 bg-red-500"></span>
@@ -66,8 +104,13 @@ const NotificationBell = () => {
             <DropdownMenuContent align="end" className="w-[300px]">
                 <div className="flex items-center justify-between px-4 py-2 border-b">
                     <span className="font-semibold">Notifications</span>
-                    {notifications.length > 0 && (
-                        <Badge variant="secondary">{notifications.length} New</Badge>
+                    {unreadCount > 0 && (
+                        <div className="flex items-center gap-2">
+                            <Badge variant="secondary">{unreadCount} New</Badge>
+                            <Button variant="ghost" size="sm" className="h-7 px-2 text-xs" onClick={handleMarkAllRead}>
+                                Mark all read
+                            </Button>
+                        </div>
                     )}
                 </div>
                 <div className="max-h-[400px] overflow-y-auto">
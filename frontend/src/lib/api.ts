@@ -1,5 +1,6 @@
 // API utility functions for backend communication
 import { auth } from './firebase';
+import type { BookSearchPage } from '@/types/api';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || `http://${window.location.hostname}:8000`;
 
@@ -132,12 +133,15 @@ async function apiRequestMultipart<T>(
 
 // Books API
 export const booksApi = {
-  search: async (filters: Record<string, string>) => {
+  // One page of results; pass the previous page's next_cursor to get the following one
+  search: async (filters: Record<string, string>, cursor?: string | null, pageSize: number = 20) => {
     const params = new URLSearchParams();
     Object.entries(filters).forEach(([key, value]) => {
       if (value) params.append(key, value);
     });
-    return apiRequest(`/books/search/?${params.toString()}`);
+    params.append('page_size', String(pageSize));
+    if (cursor) params.append('cursor', cursor);
+    return apiRequest<BookSearchPage>(`/books/search/?${params.toString()}`);
   },
 
   getById: async (bookId: string) => {
@@ -220,8 +224,9 @@ export const chatsApi = {
     return apiRequest(`/chats/${chatId}`);
   },
 
-  getMessages: async (chatId: string) => {
-    return apiRequest(`/chats/${chatId}/messages`);
+  getMessages: async (chatId: string, since?: string) => {
+    const query = since ? `?since=${encodeURIComponent(since)}` : '';
+    return apiRequest(`/chats/${chatId}/messages${query}`);
   },
 
   sendMessage: async (chatId: string, message: string) => {
@@ -306,11 +311,22 @@ export const notificationsApi = {
       return [];
     }
   },
+  unreadCount: async () => {
+    try {
+      const data = await apiRequest<{ unread_count: number }>('/notifications/unread-count');
+      return data.unread_count;
+    } catch {
+      return 0;
+    }
+  },
   markRead: async (id: string) => {
     return apiRequest(`/notifications/${id}/read`, { method: 'POST' });
   },
   markChatRead: async (chatId: string) => {
     return apiRequest(`/notifications/read-all-chat/${chatId}`, { method: 'POST' });
+  },
+  markAllRead: async () => {
+    return apiRequest('/notifications/read-all', { method: 'POST' });
   }
 };
 
@@ -0,0 +1,82 @@
+// Push channel for new chat messages and notifications (backend: /realtime/ws).
+// Events come only from the backend worker holding the socket, so subscribers keep a slow
+// catch-up poll even while connected.
+import { auth } from './firebase';
+import { getFullApiUrl } from './api';
+
+export interface RealtimeEvent {
+  type: 'ready' | 'ping' | 'message' | 'notification';
+  data?: any;
+}
+
+type Listener = (event: RealtimeEvent) => void;
+
+const listeners = new Set<Listener>();
+let socket: WebSocket | null = null;
+let connected = false;
+let retryDelay = 1000;
+let retryTimer: ReturnType<typeof setTimeout> | null = null;
+
+const emit = (event: RealtimeEvent) => listeners.forEach((listener) => listener(event));
+
+async function connect() {
+  if (socket || !auth?.currentUser) return;
+  let token: string;
+  try {
+    token = await auth.currentUser.getIdToken();
+  } catch {
+    scheduleReconnect();
+    return;
+  }
+
+  const url = getFullApiUrl(`/realtime/ws?token=${encodeURIComponent(token)}`).replace(/^http/, 'ws');
+  const ws = new WebSocket(url);
+  socket = ws;
+
+  ws.onmessage = (msg) => {
+    const event: RealtimeEvent = JSON.parse(msg.data);
+    if (event.type === 'ready') {
+      connected = true;
+      retryDelay = 1000;
+    }
+    emit(event);
+  };
+  ws.onclose = () => {
+    socket = null;
+    if (connected) {
+      connected = false;
+      emit({ type: 'ping' }); // let subscribers notice they are disconnected
+    }
+    scheduleReconnect();
+  };
+}
+
+function scheduleReconnect() {
+  if (retryTimer || listeners.size === 0) return;
+  retryTimer = setTimeout(() => {
+    retryTimer = null;
+    connect();
+  }, retryDelay);
+  retryDelay = Math.min(retryDelay * 2, 30000);
+}
+
+export const realtime = {
+  /** Receive push events; returns an unsubscribe function. Opens the socket on first use. */
+  subscribe(listener: Listener) {
+    listeners.add(listener);
+    connect();
+    return () => {
+      listeners.delete(listener);
+      if (listeners.size === 0) {
+        if (retryTimer) clearTimeout(retryTimer);
+        retryTimer = null;
+        socket?.close();
+      }
+    };
+  },
+
+  /** True while the socket is open; callers fall back to polling otherwise. */
+  isConnected() {
+    return connected;
+  },
+};
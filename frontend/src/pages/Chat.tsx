@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useParams, Link } from 'react-router-dom';
 import Header from '@/components/layout/Header';
 import Footer from '@/components/layout/Footer';
@@ -7,6 +7,7 @@ import { Input } from '@/components/ui/input';
 import { Button } from '@/components/ui/button';
 import { ArrowLeft, Send, Shield, AlertCircle, Loader2, MessageCircle } from 'lucide-react';
 import { chatsApi, requestsApi, booksApi, notificationsApi } from '@/lib/api';
+import { realtime } from '@/lib/realtime';
 import { ChatMessage, BookRequest } from '@/types/api';
 import { useToast } from '@/hooks/use-toast';
 import { useAuth } from '@/contexts/AuthContext';
@@ -15,6 +16,8 @@ const Chat = () => {
   const { requestId } = useParams();
   const [message, setMessage] = useState('');
   const [messages, setMessages] = useState<ChatMessage[]>([]);
+  const messagesRef = useRef<ChatMessage[]>([]);
+  messagesRef.current = messages;
   const [request, setRequest] = useState<BookRequest | null>(null);
   const [bookTitle, setBookTitle] = useState('Book Request');
   const [loading, setLoading] = useState(true);
@@ -27,20 +30,48 @@ const Chat = () => {
       loadChat();
       notificationsApi.markChatRead(requestId);
 
-      // Setup polling for new messages
+      // New messages are pushed over the realtime socket; catch up whenever it (re)connects
+      const unsubscribe = realtime.subscribe((event) => {
+        if (event.type === 'ready') {
+          refreshMessages();
+        } else if (event.type === 'message' && event.data?.chat_id === requestId) {
+          appendMessages([event.data]);
+        } else if (event.type === 'notification' && event.data?.related_id === requestId) {
+          // Notifications trail their messages by a few seconds; clear them as they land
+          notificationsApi.markChatRead(requestId);
+        }
+      });
+
+      // Poll every 5s while the socket is down, and every 30s while it is up: the socket
+      // only carries messages sent through the backend worker it is connected to
+      let ticks = 0;
       const interval = setInterval(() => {
-        refreshMessages();
+        ticks += 1;
+        if (!realtime.isConnected() || ticks % 6 === 0) refreshMessages();
       }, 5000);
 
-      return () => clearInterval(interval);
+      return () => {
+        clearInterval(interval);
+        unsubscribe();
+      };
     }
   }, [requestId, user]);
 
+  const appendMessages = (newMessages: ChatMessage[]) => {
+    if (newMessages.length === 0) return;
+    setMessages((prev) => {
+      const seen = new Set(prev.map((m) => m.id));
+      return [...prev, ...newMessages.filter((m) => !seen.has(m.id))];
+    });
+  };
+
   const refreshMessages = async () => {
     if (!requestId) return;
     try {
-      const messagesData = await chatsApi.getMessages(requestId);
-      setMessages(Array.isArray(messagesData) ? messagesData : []);
+      // Only fetch messages newer than the last one shown
+      const lastId = messagesRef.current[messagesRef.current.length - 1]?.id;
+      const messagesData = await chatsApi.getMessages(requestId, lastId);
+      appendMessages(Array.isArray(messagesData) ? messagesData : []);
       // Clear notifications for this chat while we are looking at it
       notificationsApi.markChatRead(requestId);
     } catch (error) {
@@ -84,9 +115,8 @@ const Chat = () => {
       setSending(true);
       await chatsApi.sendMessage(requestId, message.trim());
       setMessage('');
-      // Reload messages
-      const messagesData = await chatsApi.getMessages(requestId);
-      setMessages(Array.isArray(messagesData) ? messagesData : []);
+      // The socket delivers the message just sent; fetch it ourselves only when offline
+      if (!realtime.isConnected()) await refreshMessages();
     } catch (error: any) {
       console.error('Error sending message:', error);
       toast({
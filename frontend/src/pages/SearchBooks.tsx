@@ -23,7 +23,9 @@ const SearchBooks = () => {
   const [selectedType, setSelectedType] = useState('');
   const [showFilters, setShowFilters] = useState(false);
   const [books, setBooks] = useState<Book[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { toast } = useToast();
   const { role, loading: authLoading } = useAuth(); // Get role from auth context
 
@@ -37,17 +39,20 @@ const SearchBooks = () => {
     loadBooks();
   }, [selectedClass, selectedBoard, selectedSubject, selectedType]);
 
-  const loadBooks = async () => {
+  const loadBooks = async (cursor: string | null = null) => {
     try {
-      setLoading(true);
+      if (cursor) setLoadingMore(true);
+      else setLoading(true);
       const filters: Record<string, string> = {};
       if (selectedClass) filters.class_level = selectedClass;
       if (selectedBoard) filters.board = selectedBoard;
       if (selectedSubject) filters.subject = selectedSubject;
       if (selectedType) filters.is_set = selectedType === 'set' ? 'true' : 'false';
 
-      const data = await booksApi.search(filters);
-      setBooks(Array.isArray(data) ? data : []);
+      const page = await booksApi.search(filters, cursor);
+      const items = Array.isArray(page?.items) ? page.items : [];
+      setBooks(prev => (cursor ? [...prev, ...items] : items));
+      setNextCursor(page?.next_cursor ?? null);
     } catch (error: any) {
       console.error('Error loading books:', error);
       toast({
@@ -57,6 +62,7 @@ const SearchBooks = () => {
       });
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -235,6 +241,15 @@ const SearchBooks = () => {
           </div>
         )}
 
+        {!loading && nextCursor && (
+          <div className="flex justify-center mt-8">
+            <Button variant="outline" onClick={() => loadBooks(nextCursor)} disabled={loadingMore}>
+              {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+              Load more
+            </Button>
+          </div>
+        )}
+
         {!loading && filteredBooks.length === 0 && (
           <div className="text-center py-12">
             <div className="w-16 h-16 rounded-full bg-muted flex items-center justify-center mx-auto mb-4">
@@ -18,6 +18,12 @@ export interface Book {
   created_at?: string;
 }
 
+export interface BookSearchPage {
+  items: Book[];
+  next_cursor: string | null;
+  facets?: Record<string, Record<string, number>> | null;
+}
+
 export interface BookRequest {
   id: string;
   book_id: string;